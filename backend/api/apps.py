@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Wires up the receivers that keep derived data (search index etc.) fresh.
+        from . import signals  # noqa: F401
+        # Register the delete_area and note_saved job types, see api/jobs.py.
+        from . import areas  # noqa: F401
+        from . import notes  # noqa: F401
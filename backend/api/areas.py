@@ -0,0 +1,211 @@
+# In backend/api/areas.py
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from .backup import ResourceIdMap
+from .cache import bump_area_version
+from .changes import record_changes
+from .jobs import JobType, enqueue, job_type, schedule_related_update
+from .models import *
+from .search import get_search_backend
+from .stats import refresh_area_stats
+
+# Whole-area clone and delete, table by table in set-based SQL: one
+# INSERT ... SELECT or DELETE per table, in one transaction, instead of a
+# query (or several) per row as the ORM's collector and bulk_create need. A
+# 100k-row area is a couple of dozen statements either way; bench_areas
+# measures both against the ORM.
+#
+# Signals do not fire, so everything they would do happens here: the search
+# index, duplicate fingerprints, related lists, stats and area versions. Rows
+# of other areas pointing at the area's resources are handled like the
+# cascade / SET NULL of their foreign keys, and their areas are told.
+#
+# Deleting an area with more than AREA_DELETE_JOB_ROWS rows is left to a
+# delete_area job; the area is flagged `deleting` and hidden until it runs.
+
+# Keyed by resource_id; copied and deleted along with their resource.
+RESOURCE_TABLES = [Course, Book, Paper, WebResource, PDFResource, ResourceFingerprint, FingerprintBand]
+# kind -> (model, columns holding a resource id, what deleting that resource does to the row)
+AREA_TABLES = {
+    'canvas_item': (CanvasItem, ['resource_id'], 'delete'),
+    'connection': (ResourceConnection, ['source_id', 'target_id'], 'delete'),
+    'note': (Note, ['resource_id'], 'null'),
+    'task': (Task, ['resource_id'], 'null'),
+}
+
+
+class AreaError(Exception):
+    pass
+
+
+def _execute(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _copy(model, overrides, source, params, skip=()):
+    # INSERT INTO <model> (...) SELECT ... FROM <source>, where the source
+    # row is aliased x and `overrides` replaces some of its columns.
+    columns = [f.column for f in model._meta.concrete_fields if f.column not in skip]
+    select = ', '.join(overrides.get(column, f'x.{column}') for column in columns)
+    return _execute(f"INSERT INTO {model._meta.db_table} ({', '.join(columns)}) SELECT {select} FROM {source}", params)
+
+
+def area_size(area_id):
+    # Rows an area holds, from its stats row (api/stats.py).
+    stats = AreaStats.objects.filter(area_id=area_id).values_list(
+        'resource_count', 'note_count', 'task_count', 'connection_count',
+    ).first()
+    return sum(stats) if stats else 0
+
+
+# --- Clone ---
+
+def clone_area(source, slug, name=None):
+    """
+    Copies an area with all its resources, details, notes, tasks, canvas
+    items and connections into a new area. Returns (area, counts).
+    """
+    if AcademicArea.objects.filter(slug=slug).exists():
+        raise AreaError(f"An area with slug '{slug}' already exists.")
+    resources = Resource._meta.db_table
+    area_id = source.pk
+    with transaction.atomic(), ResourceIdMap() as id_map:
+        area = AcademicArea.objects.create(name=name or source.name, slug=slug, description=source.description)
+        new_area = str(int(area.pk))
+
+        # New resource ids are the old ones shifted past the current maximum,
+        # so the map is one INSERT ... SELECT.
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(id) FROM {resources}')
+            highest = cursor.fetchone()[0] or 0
+            cursor.execute(f'SELECT MIN(id) FROM {resources} WHERE area_id = %s', [area_id])
+            lowest = cursor.fetchone()[0]
+        counts = {'resource': 0}
+        if lowest is not None:
+            _execute(
+                f'INSERT INTO {id_map.table} (old_id, new_id) SELECT id, id + %s FROM {resources} WHERE area_id = %s',
+                [highest - lowest + 1, area_id],
+            )
+            counts['resource'] = _copy(
+                Resource, {'id': 'm.new_id', 'area_id': new_area}, f'{resources} x JOIN {id_map.table} m ON m.old_id = x.id', [],
+            )
+            for model in RESOURCE_TABLES:
+                _copy(
+                    model, {'resource_id': 'm.new_id'},
+                    f'{model._meta.db_table} x JOIN {id_map.table} m ON m.old_id = x.resource_id', [],
+                    skip=() if model._meta.pk.column == 'resource_id' else (model._meta.pk.column,),
+                )
+            # Explicit ids do not move Postgres sequences.
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Resource]):
+                _execute(sql)
+
+        for kind, (model, columns, _) in AREA_TABLES.items():
+            # A reference to a resource outside the area is kept as it is.
+            joins = ' '.join(f'LEFT JOIN {id_map.table} m{i} ON m{i}.old_id = x.{column}' for i, column in enumerate(columns))
+            overrides = {column: f'COALESCE(m{i}.new_id, x.{column})' for i, column in enumerate(columns)}
+            counts[kind] = _copy(
+                model, {**overrides, 'area_id': new_area},
+                f'{model._meta.db_table} x {joins} WHERE x.area_id = %s ORDER BY x.id', [area_id], skip=('id',),
+            )
+
+        get_search_backend().index_area(area.pk)
+        stale = StaleRelatedResource._meta.db_table
+        _execute(
+            f'INSERT INTO {stale} (resource_id) SELECT m.new_id FROM {id_map.table} m '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {stale} s WHERE s.resource_id = m.new_id)'
+        )
+        if counts['resource']:
+            schedule_related_update()
+        refresh_area_stats(area.pk)
+        bump_area_version(area.pk)
+    return area, counts
+
+
+# --- Delete ---
+
+def delete_area(area_id):
+    """
+    Deletes an area and everything in it. Returns the number of rows
+    deleted per kind, or None if the area no longer exists.
+    """
+    resources = Resource._meta.db_table
+    in_area = f'SELECT id FROM {resources} WHERE area_id = %s'
+    with transaction.atomic():
+        if not AcademicArea.objects.filter(pk=area_id).exists():
+            return None
+
+        # Rows of other areas that point at this area's resources: deleted
+        # or unlinked below, as their foreign keys say.
+        touched = {}
+        for kind, (model, columns, _) in AREA_TABLES.items():
+            for column in columns:
+                rows = model.objects.filter(**{f'{column}__in': Resource.objects.filter(area_id=area_id).values('id')})
+                for row_id, other_area in rows.exclude(area_id=area_id).values_list('id', 'area_id'):
+                    touched.setdefault(other_area, {}).setdefault(kind, set()).add(row_id)
+
+        get_search_backend().remove_area(area_id)
+
+        # Related lists elsewhere that name one of the resources are redone.
+        related, stale = RelatedResource._meta.db_table, StaleRelatedResource._meta.db_table
+        marked = _execute(
+            f'INSERT INTO {stale} (resource_id) SELECT DISTINCT x.resource_id FROM {related} x '
+            f'WHERE x.related_id IN ({in_area}) AND x.resource_id NOT IN ({in_area}) '
+            f'AND NOT EXISTS (SELECT 1 FROM {stale} s WHERE s.resource_id = x.resource_id)',
+            [area_id, area_id],
+        )
+        _execute(f'DELETE FROM {related} WHERE resource_id IN ({in_area}) OR related_id IN ({in_area})', [area_id, area_id])
+        _execute(f'DELETE FROM {stale} WHERE resource_id IN ({in_area})', [area_id])
+        _execute(f'DELETE FROM {ResourceTerms._meta.db_table} WHERE resource_id IN ({in_area})', [area_id])
+        for model in RESOURCE_TABLES:
+            _execute(f'DELETE FROM {model._meta.db_table} WHERE resource_id IN ({in_area})', [area_id])
+
+        counts = {}
+        for kind, (model, columns, on_delete) in AREA_TABLES.items():
+            table = model._meta.db_table
+            counts[kind] = _execute(f'DELETE FROM {table} WHERE area_id = %s', [area_id])
+            for column in columns:
+                if on_delete == 'delete':
+                    _execute(f'DELETE FROM {table} WHERE {column} IN ({in_area})', [area_id])
+                else:
+                    _execute(f'UPDATE {table} SET {column} = NULL WHERE {column} IN ({in_area})', [area_id])
+        counts = {'resource': _execute(f'DELETE FROM {resources} WHERE area_id = %s', [area_id]), **counts}
+        for model in (ChangeLogEntry, AreaStats):
+            _execute(f'DELETE FROM {model._meta.db_table} WHERE area_id = %s', [area_id])
+        _execute(f'DELETE FROM {AcademicArea._meta.db_table} WHERE id = %s', [area_id])
+
+        for other_area, kinds in touched.items():
+            for kind, row_ids in kinds.items():
+                record_changes(other_area, kind, sorted(row_ids), deleted=AREA_TABLES[kind][2] == 'delete')
+            refresh_area_stats(other_area)
+            bump_area_version(other_area)
+        if marked:
+            schedule_related_update()
+    return counts
+
+
+def delete_area_later(area):
+    # Hides the area now and queues the delete_area job. Returns the job.
+    with transaction.atomic():
+        AcademicArea.objects.filter(pk=area.pk).update(deleting=True)
+        bump_area_version(area.pk)
+        return enqueue('delete_area', {'area': area.pk})
+
+
+def delete_or_queue(area):
+    # The API's choice: small areas go at once, big ones to a job. Returns
+    # the job, or None if the area was deleted right away.
+    if area_size(area.pk) > getattr(settings, 'AREA_DELETE_JOB_ROWS', 10_000):
+        return delete_area_later(area)
+    delete_area(area.pk)
+    return None
+
+
+@job_type('delete_area')
+class DeleteArea(JobType):
+    # No work(): it is a handful of statements, run in the worker's main process.
+    def prepare(self, payload):
+        return delete_area(payload['area'])
@@ -0,0 +1,161 @@
+# In backend/api/async_views.py
+
+# Async versions of the hottest read endpoints, for serving through
+# backend/asgi.py. Every query goes through Django's async ORM and all data
+# is loaded before serializing, so serialization itself never touches the
+# database and runs directly on the event loop. A request that is waiting on
+# the database therefore holds no worker thread, which is what lets one ASGI
+# process keep many slow area loads in flight at once.
+#
+# Responses are rendered with the same renderer as the synchronous endpoints
+# (api/renderers.py), so their bodies are identical.
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework.exceptions import ValidationError
+from .cache import area_cache, area_cache_key, area_etag
+from .changes import latest_seq_subquery
+from .events import encode_event, get_broker
+from .loaders import aload_resource_details
+from .models import *
+from .renderers import FastJSONRenderer
+from .search import get_search_backend
+from .serializers import *
+from .views import int_param
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status, headers=headers)
+
+
+async def aget_area_id(value):
+    # Same addressing as views.get_area: an id or a slug.
+    areas = AcademicArea.objects.filter(deleting=False)
+    queryset = areas.filter(pk=value) if value.isdigit() else areas.filter(slug=value)
+    area_id = await queryset.values_list('id', flat=True).afirst()
+    if area_id is None:
+        raise Http404
+    return area_id
+
+
+async def build_area_payload(area_id):
+    # Builds exactly what AcademicAreaDetailSerializer returns, one list at a
+    # time. Lists are in id order like fastpath.area_payload, which fills the
+    # same cache entry.
+    area = await AcademicArea.objects.aget(pk=area_id)
+    resources = [r async for r in Resource.objects.filter(area_id=area_id).order_by('id')]
+    await aload_resource_details(resources)
+    canvas_items = [c async for c in CanvasItem.objects.filter(area_id=area_id).select_related('resource').order_by('id')]
+    connections = [c async for c in ResourceConnection.objects.filter(area_id=area_id).order_by('id')]
+    tasks = [t async for t in Task.objects.filter(area_id=area_id).order_by('id')]
+    notes = [n async for n in Note.objects.filter(area_id=area_id).order_by('id')]
+    return {
+        'id': area.id,
+        'name': area.name,
+        'slug': area.slug,
+        'description': area.description,
+        'resources': ResourceSerializer(resources, many=True).data,
+        'canvas_items': CanvasItemSerializer(canvas_items, many=True).data,
+        'connections': ResourceConnectionSerializer(connections, many=True).data,
+        'tasks': TaskSerializer(tasks, many=True).data,
+        'notes': NoteSerializer(notes, many=True).data,
+    }
+
+
+async def area_detail(request, slug):
+    # GET /api/async/areas/<slug>/ - same contract as the synchronous area
+    # detail, including ETags, 304s, X-Change-Seq and the shared payload cache.
+    row = await (
+        AcademicArea.objects.filter(slug=slug, deleting=False)
+        .annotate(seq=Coalesce(Subquery(latest_seq_subquery()), 0))
+        .values('id', 'version', 'seq').afirst()
+    )
+    if row is None:
+        raise Http404
+    etag = area_etag(row['id'], row['version'])
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Change-Seq': str(row['seq'])}
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    cache = area_cache()
+    key = area_cache_key(slug, row['id'], row['version'])
+    data = await cache.aget(key)
+    if data is None:
+        data = await build_area_payload(row['id'])
+        await cache.aset(key, data)
+    return json_response(data, headers=headers)
+
+
+async def resource_list(request):
+    # GET /api/async/resources/?area=<id or slug>&after=<id>&limit=100
+    # Keyset paging by id, the same ordering as the cursor-paged list.
+    try:
+        limit = int_param(request, 'limit', 100, 1, 1000)
+        after = int_param(request, 'after', 0, 0, 2 ** 63 - 1)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    queryset = Resource.objects.filter(id__gt=after).order_by('id')
+    if request.GET.get('area'):
+        queryset = queryset.filter(area_id=await aget_area_id(request.GET['area']))
+    resources = [r async for r in queryset[:limit + 1]]
+    has_more = len(resources) > limit
+    resources = resources[:limit]
+    await aload_resource_details(resources)
+    return json_response({
+        'next': resources[-1].id if has_more else None,
+        'results': ResourceSerializer(resources, many=True).data,
+    })
+
+
+async def search(request):
+    # GET /api/async/search/ - same parameters and results as /api/search/.
+    # The FTS query is raw SQL, which Django can only run synchronously, so
+    # it is handed to a worker thread while the event loop stays free.
+    query = request.GET.get('q', '')
+    kind = request.GET.get('type')
+    if kind not in (None, 'resource', 'note'):
+        return json_response({'error': "type must be 'resource' or 'note'."}, status=400)
+    try:
+        limit = int_param(request, 'limit', 20, 1, 100)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    area_id = await aget_area_id(request.GET['area']) if request.GET.get('area') else None
+    results = await sync_to_async(get_search_backend().search)(query, area_id=area_id, kind=kind, limit=limit)
+    return json_response({'query': query, 'results': results})
+
+
+async def area_events(request, slug):
+    # GET /api/async/areas/<slug>/events/ - Server-Sent Events for live
+    # updates, see api/events.py. 'ready' is sent on every (re)connect and
+    # 'resync' after events were dropped; on both the client catches up
+    # through the changes endpoint. Needs the ASGI deployment: under WSGI the
+    # stream holds a worker thread for as long as the client stays.
+    area_id = await AcademicArea.objects.filter(slug=slug, deleting=False).values_list('id', flat=True).afirst()
+    if area_id is None:
+        raise Http404
+    keepalive = getattr(settings, 'EVENT_KEEPALIVE_SECONDS', 15)
+    subscription = get_broker().subscribe(area_id)
+
+    async def stream():
+        try:
+            yield b'retry: 3000\n' + encode_event('ready', {'area': area_id})
+            while True:
+                batch = await subscription.next_batch(keepalive)
+                # A comment line keeps proxies from closing an idle stream.
+                yield batch if batch is not None else b': keepalive\n\n'
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tells nginx not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,418 @@
+# In backend/api/backup.py
+
+import base64
+import binascii
+import datetime
+import json
+import os
+import re
+import uuid
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, router, transaction
+from .cache import bump_area_version
+from .duplicates import index_fingerprints
+from .jobs import queue_related_update
+from .stats import refresh_area_stats
+from .models import *
+from .search import get_search_backend
+from .storage import PARTIAL_DIR, UploadError, media_path, store_file
+
+# An area backup is NDJSON: a header line, the area, then one line per row,
+# grouped by type so that resources come before everything referring to them.
+#
+#   {"type": "header", "format": "academic-library-area", "version": 2}
+#   {"type": "area", "data": {"id": 1, "name": ..., "slug": ..., "description": ...}}
+#   {"type": "blob", "data": {"sha256": ..., "offset": 0, "content": <base64>}}
+#   {"type": "resource", "data": {"id": 7, "title": ..., "resource_type": "book", "details": {...}}}
+#   {"type": "note" | "task" | "canvas_item" | "connection", "data": {...}}
+#
+# PDF details name their file by content hash ("stored_file_sha256"), and the
+# file itself comes first as blob lines, BLOB_CHUNK bytes each. On import a
+# blob this instance already stores is skipped; the others are written to the
+# store and linked by hash. Version 1 backups named the file by its local
+# stored_file_id, so they restore only where that row exists.
+#
+# Both directions work in fixed-size chunks, so memory does not grow with
+# the size of the area. The export runs in one read transaction, so it is a
+# snapshot even while the area is being edited.
+
+FORMAT = 'academic-library-area'
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+CHUNK_SIZE = 2000
+BLOB_CHUNK = 768 * 1024
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+DETAIL_MODELS = {
+    'course': Course,
+    'book': Book,
+    'paper': Paper,
+    'web': WebResource,
+    'pdf': PDFResource,
+}
+
+# type -> (model, exported fields, fields that hold a resource id)
+ROW_TYPES = {
+    'note': (Note, ['id', 'resource_id', 'content', 'created_at', 'updated_at'], ['resource_id']),
+    'task': (Task, ['id', 'resource_id', 'description', 'is_completed'], ['resource_id']),
+    'canvas_item': (CanvasItem, ['id', 'resource_id', 'pos_x', 'pos_y'], ['resource_id']),
+    'connection': (ResourceConnection, ['id', 'source_id', 'target_id', 'label'], ['source_id', 'target_id']),
+}
+
+
+# Keys a row of each type must have; the rest are optional.
+REQUIRED_KEYS = {'area': [], 'blob': ['sha256', 'offset', 'content'], 'resource': ['id', 'title', 'resource_type']}
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds, a backup keeps them exact.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _line(kind, data):
+    return json.dumps({'type': kind, 'data': data}, cls=BackupEncoder, ensure_ascii=False) + '\n'
+
+
+def _detail_fields(model):
+    return [f.attname for f in model._meta.concrete_fields if f.name != 'resource']
+
+
+# --- Export ---
+
+def _export_blob(stored_file):
+    with open(media_path(stored_file.file.name), 'rb') as f:
+        offset = 0
+        for block in iter(lambda: f.read(BLOB_CHUNK), b''):
+            content = base64.b64encode(block).decode('ascii')
+            yield _line('blob', {'sha256': stored_file.sha256, 'offset': offset, 'content': content})
+            offset += len(block)
+
+
+def _export_resources(area, using):
+    # Keyset chunks of resources; each chunk fetches its details with one
+    # query per resource type present in it, and the PDFs it links to with
+    # one more. Each PDF is written once, before the first resource using it.
+    last_id = 0
+    exported_blobs = set()
+    while True:
+        chunk = list(
+            Resource.objects.using(using).filter(area=area, id__gt=last_id)
+            .order_by('id').values('id', 'title', 'resource_type')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1]['id']
+        details = {}
+        for resource_type, model in DETAIL_MODELS.items():
+            ids = [r['id'] for r in chunk if r['resource_type'] == resource_type]
+            if ids:
+                fields = _detail_fields(model)
+                for row in model.objects.using(using).filter(resource_id__in=ids).values('resource_id', *fields):
+                    details[row.pop('resource_id')] = row
+        stored_ids = {row['stored_file_id'] for row in details.values() if row.get('stored_file_id')}
+        stored_files = StoredFile.objects.using(using).in_bulk(stored_ids)
+        for stored_file in stored_files.values():
+            if stored_file.sha256 not in exported_blobs:
+                exported_blobs.add(stored_file.sha256)
+                yield from _export_blob(stored_file)
+        for resource in chunk:
+            row = details.get(resource['id'])
+            if row is not None and 'stored_file_id' in row:
+                stored_file = stored_files.get(row.pop('stored_file_id'))
+                row['stored_file_sha256'] = stored_file.sha256 if stored_file else None
+            resource['details'] = row
+            yield _line('resource', resource)
+
+
+def iter_area_export(area):
+    # The read-only connection outside a request's transaction: with SQLite
+    # in WAL mode its transaction reads one snapshot without blocking writers.
+    using = router.db_for_read(Resource)
+    with transaction.atomic(using=using):
+        yield json.dumps({'type': 'header', 'format': FORMAT, 'version': VERSION}) + '\n'
+        yield _line('area', {'id': area.id, 'name': area.name, 'slug': area.slug, 'description': area.description})
+        yield from _export_resources(area, using)
+        for kind, (model, fields, _) in ROW_TYPES.items():
+            rows = model.objects.using(using).filter(area=area).order_by('id').values(*fields)
+            for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                yield _line(kind, row)
+
+
+# --- Import ---
+
+class ResourceIdMap:
+    # old resource id -> new resource id, kept in a temporary table instead of
+    # a dict so that restoring a million resources does not need a million
+    # entries in memory.
+    table = 'backup_resource_map'
+
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+            cursor.execute(f'CREATE TEMPORARY TABLE {self.table} (old_id BIGINT PRIMARY KEY, new_id BIGINT NOT NULL)')
+        return self
+
+    def __exit__(self, *exc_info):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def add(self, pairs):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {self.table} (old_id, new_id) VALUES (%s, %s)', pairs)
+
+    def lookup(self, old_ids):
+        old_ids = list(old_ids)
+        if not old_ids:
+            return {}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT old_id, new_id FROM {self.table} WHERE old_id IN ({', '.join(['%s'] * len(old_ids))})",
+                old_ids,
+            )
+            return dict(cursor.fetchall())
+
+
+class AreaImporter:
+    def __init__(self, slug=None, name=None):
+        self.slug = slug
+        self.name = name
+        self.area = None
+        self.counts = {'resource': 0, **{kind: 0 for kind in ROW_TYPES}}
+        # sha256 -> partial file of a blob being restored, or None when this
+        # instance stores that content already.
+        self.blobs = {}
+
+    def create_area(self, data):
+        slug = self.slug or data.get('slug')
+        if not slug:
+            raise BackupError('The backup has no slug, pass one explicitly.')
+        if AcademicArea.objects.filter(slug=slug).exists():
+            raise BackupError(f"An area with slug '{slug}' already exists.")
+        self.area = AcademicArea.objects.create(
+            name=self.name or data.get('name') or slug, slug=slug, description=data.get('description'),
+        )
+
+    def write_blob(self, data, number):
+        sha256, offset, content = data['sha256'], data['offset'], data['content']
+        if not isinstance(sha256, str) or not SHA256.match(sha256):
+            raise BackupError(f'Line {number}: blob sha256 {sha256!r} is not a SHA-256 hex digest.')
+        if not _is_id(offset) or not isinstance(content, str):
+            raise BackupError(f'Line {number}: invalid blob.')
+        if sha256 not in self.blobs:
+            if StoredFile.objects.filter(sha256=sha256).exists():
+                self.blobs[sha256] = None
+            else:
+                os.makedirs(media_path(PARTIAL_DIR), exist_ok=True)
+                self.blobs[sha256] = media_path(os.path.join(PARTIAL_DIR, f'{uuid.uuid4()}.part'))
+        path = self.blobs[sha256]
+        if path is None:
+            return
+        if offset != (os.path.getsize(path) if os.path.exists(path) else 0):
+            raise BackupError(f'Line {number}: blob {sha256} continues at the wrong offset.')
+        try:
+            block = base64.b64decode(content, validate=True)
+        except binascii.Error:
+            raise BackupError(f'Line {number}: blob content is not base64.')
+        with open(path, 'ab') as out:
+            out.write(block)
+
+    def link_blob(self, details, number):
+        # Swaps a PDF's stored_file_sha256 for the id of its StoredFile here,
+        # moving a restored blob into the store on first use.
+        sha256 = details.pop('stored_file_sha256')
+        if sha256 is None:
+            return
+        stored_file = StoredFile.objects.filter(sha256=sha256).first()
+        if stored_file is None:
+            path = self.blobs.get(sha256)
+            if path is None or not os.path.exists(path):
+                raise BackupError(f'Line {number}: the PDF {sha256} is neither in the backup nor stored here.')
+            try:
+                stored_file = store_file(path)
+            except UploadError as e:
+                raise BackupError(f'Line {number}: the PDF {sha256} is invalid ({e}).')
+            if stored_file.sha256 != sha256:
+                raise BackupError(f'Line {number}: the PDF content does not match its sha256 {sha256}.')
+        details['stored_file_id'] = stored_file.pk
+        details['file'] = stored_file.file.name
+
+    def remove_partial_blobs(self):
+        for path in self.blobs.values():
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    def flush(self, kind, rows, numbers, id_map):
+        # A chunk that fails is rolled back to its savepoint, so the error
+        # can be reported (and the id map dropped) on a usable connection.
+        try:
+            with transaction.atomic():
+                if kind == 'resource':
+                    self.import_resources(rows, numbers, id_map)
+                else:
+                    self.import_rows(kind, rows, numbers, id_map)
+        except (IntegrityError, KeyError, TypeError, ValueError) as e:
+            raise BackupError(f'Lines {numbers[0]}-{numbers[-1]}: invalid {kind} rows ({e!r}).')
+        self.counts[kind] += len(rows)
+
+    def import_resources(self, rows, numbers, id_map):
+        for row, number in zip(rows, numbers):
+            if not _is_id(row['id']):
+                raise BackupError(f'Line {number}: resource id {row["id"]!r} is not a number.')
+        seen = set(id_map.lookup([row['id'] for row in rows]))
+        for row, number in zip(rows, numbers):
+            if row['id'] in seen:
+                raise BackupError(f'Line {number}: resource {row["id"]} appears twice.')
+            seen.add(row['id'])
+            if not isinstance(row.get('details') or {}, dict):
+                raise BackupError(f'Line {number}: resource details must be an object.')
+            if row.get('details') and 'stored_file_sha256' in row['details']:
+                self.link_blob(row['details'], number)
+        resources = Resource.objects.bulk_create([
+            Resource(area=self.area, title=row['title'], resource_type=row['resource_type']) for row in rows
+        ])
+        id_map.add([(row['id'], resource.id) for row, resource in zip(rows, resources)])
+        children = {}
+        for row, number, resource in zip(rows, numbers, resources):
+            model = DETAIL_MODELS.get(resource.resource_type)
+            if model is None or row.get('details') is None:
+                continue
+            fields = {k: v for k, v in row['details'].items() if k in _detail_fields(model)}
+            children.setdefault(model, []).append((model(resource_id=resource.id, **fields), number))
+        for model, pairs in children.items():
+            self.check_references(model, pairs)
+            model.objects.bulk_create([obj for obj, _ in pairs])
+        get_search_backend().index_resources([resource.id for resource in resources])
+        index_fingerprints([resource.id for resource in resources])
+        queue_related_update([resource.id for resource in resources])
+
+    def check_references(self, model, pairs):
+        # Foreign keys of the details (a PDF's stored file) are only checked
+        # at COMMIT, too late to say which line was wrong.
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or field.name == 'resource':
+                continue
+            wanted = {getattr(obj, field.attname) for obj, _ in pairs} - {None}
+            found = set(field.related_model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+            for obj, number in pairs:
+                value = getattr(obj, field.attname)
+                if value is not None and value not in found:
+                    raise BackupError(f'Line {number}: {field.attname} {value!r} does not exist here.')
+
+    def import_rows(self, kind, rows, numbers, id_map):
+        model, fields, resource_fields = ROW_TYPES[kind]
+        for row, number in zip(rows, numbers):
+            for f in resource_fields:
+                if row.get(f) is not None and not _is_id(row[f]):
+                    raise BackupError(f'Line {number}: {f} {row[f]!r} is not a number.')
+        referenced = {row[f] for row in rows for f in resource_fields if row.get(f) is not None}
+        new_ids = id_map.lookup(referenced)
+        objs = []
+        for row in rows:
+            values = {f: row.get(f) for f in fields if f != 'id'}
+            for f in resource_fields:
+                if values[f] is not None:
+                    if values[f] not in new_ids:
+                        raise BackupError(f'{kind} {row.get("id")} refers to unknown resource {values[f]}.')
+                    values[f] = new_ids[values[f]]
+            objs.append(model(area=self.area, **values))
+        objs = model.objects.bulk_create(objs)
+        if kind == 'note':
+            # bulk_create stamps auto_now fields, put the original times back.
+            for obj, row in zip(objs, rows):
+                obj.created_at = row.get('created_at') or obj.created_at
+                obj.updated_at = row.get('updated_at') or obj.updated_at
+            Note.objects.bulk_update(objs, ['created_at', 'updated_at'])
+            get_search_backend().index_notes([obj.id for obj in objs])
+
+    def run(self, lines):
+        kind, buffer, numbers = None, [], []
+        try:
+            with transaction.atomic(), ResourceIdMap() as id_map:
+                for number, line in _numbered(lines):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        raise BackupError(f'Line {number}: invalid JSON ({e}).')
+                    if not isinstance(record, dict):
+                        raise BackupError(f'Line {number}: a record must be a JSON object.')
+                    record_type = record.get('type')
+                    if record_type == 'header':
+                        if record.get('format') != FORMAT or record.get('version') not in READABLE_VERSIONS:
+                            raise BackupError(f'Line {number}: unsupported backup format.')
+                        continue
+                    if record_type not in ('area', 'blob') and record_type not in self.counts:
+                        raise BackupError(f'Line {number}: unknown record type {record_type!r}.')
+                    data = record.get('data')
+                    if not isinstance(data, dict):
+                        raise BackupError(f'Line {number}: the data of a record must be a JSON object.')
+                    missing = [key for key in REQUIRED_KEYS.get(record_type, []) if data.get(key) is None]
+                    if missing:
+                        raise BackupError(f"Line {number}: {record_type} without {', '.join(missing)}.")
+                    if record_type == 'area':
+                        try:
+                            with transaction.atomic():
+                                self.create_area(data)
+                        except (IntegrityError, TypeError, ValueError) as e:
+                            raise BackupError(f'Line {number}: invalid area ({e!r}).')
+                        continue
+                    if self.area is None:
+                        raise BackupError(f'Line {number}: rows before the area record.')
+                    if record_type == 'blob':
+                        self.write_blob(data, number)
+                        continue
+                    if record_type != kind or len(buffer) >= CHUNK_SIZE:
+                        if buffer:
+                            self.flush(kind, buffer, numbers, id_map)
+                        kind, buffer, numbers = record_type, [], []
+                    buffer.append(data)
+                    numbers.append(number)
+                if buffer:
+                    self.flush(kind, buffer, numbers, id_map)
+                if self.area is None:
+                    raise BackupError('The backup contains no area.')
+                refresh_area_stats(self.area.id)
+                bump_area_version(self.area.id)
+        except IntegrityError as e:
+            # Deferred foreign keys, checked at COMMIT.
+            raise BackupError(f'The backup refers to rows that do not exist ({e}).')
+        finally:
+            self.remove_partial_blobs()
+        return self.area
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _numbered(lines):
+    # (line number, line), with undecodable input as a BackupError. Text is
+    # decoded in blocks, so the number is where the bad bytes were noticed.
+    iterator = iter(lines)
+    number = 0
+    while True:
+        number += 1
+        try:
+            line = next(iterator)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            raise BackupError(f'Line {number} or later: the backup is not UTF-8 text.')
+        yield number, line
+
+
+def import_area_stream(lines, slug=None, name=None):
+    # Restores a backup into a new area (optionally under another slug/name).
+    # The whole restore is one transaction: it either fully succeeds or leaves
+    # nothing behind.
+    importer = AreaImporter(slug=slug, name=name)
+    area = importer.run(lines)
+    return area, importer.counts
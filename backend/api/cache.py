@@ -0,0 +1,32 @@
+# In backend/api/cache.py
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from .models import AcademicArea
+
+# Area detail payloads are cached under (slug, id, version). Any write inside an
+# area bumps its version, so stale entries are never read again and simply
+# age out of the cache backend.
+
+
+def area_cache():
+    return caches[getattr(settings, 'AREA_CACHE_ALIAS', 'default')]
+
+
+def bump_area_version(area_id):
+    AcademicArea.objects.filter(pk=area_id).update(version=F('version') + 1)
+
+
+def bump_resource_area_version(resource_id):
+    # For the detail tables, which only know their resource.
+    AcademicArea.objects.filter(resources__id=resource_id).update(version=F('version') + 1)
+
+
+def area_etag(area_id, version):
+    return f'"area-{area_id}-v{version}"'
+
+
+def area_cache_key(slug, area_id, version):
+    # The id guards against a deleted area's slug being reused.
+    return f'area-payload:{slug}:{area_id}:{version}'
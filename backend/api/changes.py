@@ -0,0 +1,151 @@
+# In backend/api/changes.py
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .events import get_broker
+from .models import *
+from .serializers import *
+
+# Delta sync. Every write to an area's resources, canvas items, connections,
+# tasks and notes appends a ChangeLogEntry (signals for single rows, explicit
+# record_changes calls in bulk paths). A client remembers the sequence number
+# it is current to -- the X-Change-Seq header of the area detail response --
+# and asks /api/areas/<slug>/changes/?since=<seq> for what happened since:
+# the current state of every changed row plus the ids of deleted ones.
+#
+# Sequence numbers are the log's ids, handed out in commit order because
+# SQLite runs one write transaction at a time.
+#
+# compact_change_log drops entries superseded by a later one for the same
+# row, then everything older than CHANGE_LOG_RETENTION_DAYS. An area's
+# change_horizon remembers the newest entry dropped that way; a client
+# further behind gets a 410 and reloads the area.
+#
+# Areas restored from a backup or seeded synthetically start with an empty
+# log: nobody can have loaded them before.
+
+KINDS = {
+    Resource: 'resource',
+    CanvasItem: 'canvas_item',
+    ResourceConnection: 'connection',
+    Task: 'task',
+    Note: 'note',
+}
+
+# kind -> (key in the response, which matches the area detail payload,
+#          queryset, serializer)
+PAYLOADS = {
+    'resource': ('resources', lambda: Resource.objects.all(), ResourceSerializer),
+    'canvas_item': ('canvas_items', lambda: CanvasItem.objects.select_related('resource'), CanvasItemSerializer),
+    'connection': ('connections', lambda: ResourceConnection.objects.all(), ResourceConnectionSerializer),
+    'task': ('tasks', lambda: Task.objects.all(), TaskSerializer),
+    'note': ('notes', lambda: Note.objects.all(), NoteSerializer),
+}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+
+class ChangesExpired(Exception):
+    def __init__(self, horizon):
+        super().__init__(f'Changes up to {horizon} have been compacted away, reload the area.')
+        self.horizon = horizon
+
+
+def record_changes(area_id, kind, ids, deleted=False):
+    entries = ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(area_id=area_id, kind=kind, object_id=object_id, deleted=deleted) for object_id in ids]
+    )
+    publish_changes(area_id, entries)
+
+
+def publish_changes(area_id, entries):
+    # Tells live subscribers (api/events.py) once the write is committed.
+    if not entries:
+        return
+    seqs = [entry.pk for entry in entries if entry.pk is not None]
+    seq = max(seqs) if seqs else None
+    data = {'seq': seq, 'kinds': sorted({entry.kind for entry in entries})}
+    transaction.on_commit(lambda: get_broker().publish(area_id, 'change', data, id=seq))
+
+
+def record_change(instance, deleted=False, area_id=None):
+    record_changes(area_id or instance.area_id, KINDS[type(instance)], [instance.pk], deleted=deleted)
+
+
+def record_resource_changes(resource_ids):
+    # For writes to the detail tables and page counts, which change how a
+    # resource serializes.
+    by_area = {}
+    for area_id, resource_id in Resource.objects.filter(id__in=list(resource_ids)).values_list('area_id', 'id'):
+        by_area.setdefault(area_id, []).append(resource_id)
+    for area_id, ids in by_area.items():
+        record_changes(area_id, 'resource', ids)
+
+
+def latest_seq_subquery():
+    # For annotating the sequence number in the same statement that reads an
+    # area, so the number and the data belong to the same snapshot.
+    return ChangeLogEntry.objects.order_by('-id').values('id')[:1]
+
+
+def changes_since(area, since, limit=DEFAULT_LIMIT):
+    if since < area.change_horizon:
+        raise ChangesExpired(area.change_horizon)
+    entries = list(
+        ChangeLogEntry.objects.filter(area=area, id__gt=since)
+        .order_by('id').values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the last entry per row matters.
+    latest = {}
+    for _, kind, object_id, deleted in entries:
+        latest[kind, object_id] = deleted
+
+    changed, removed = {}, {}
+    for kind, (key, queryset, serializer) in PAYLOADS.items():
+        ids = {object_id for (k, object_id), deleted in latest.items() if k == kind and not deleted}
+        rows = list(queryset().filter(area=area, id__in=ids).order_by('id')) if ids else []
+        changed[key] = serializer(rows, many=True).data
+        # Rows gone since (or moved to another area) count as deleted.
+        gone = {object_id for (k, object_id), deleted in latest.items() if k == kind and deleted}
+        gone |= ids - {row.id for row in rows}
+        removed[key] = sorted(gone)
+
+    return {
+        'since': since,
+        'seq': entries[-1][0] if entries else since,
+        'more': more,
+        'changed': changed,
+        'deleted': removed,
+    }
+
+
+def compact_change_log(retention=None):
+    """
+    Drops entries superseded by a later one for the same row, then entries
+    older than `retention` (CHANGE_LOG_RETENTION_DAYS by default), moving each
+    area's change_horizon past the expired ones. Returns both counts.
+    """
+    if retention is None:
+        retention = timedelta(days=getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 7))
+    with transaction.atomic():
+        latest = ChangeLogEntry.objects.values('area_id', 'kind', 'object_id').annotate(latest=Max('id')).values('latest')
+        superseded, _ = ChangeLogEntry.objects.exclude(id__in=latest).delete()
+
+        expired = 0
+        cutoff = timezone.now() - retention
+        horizons = ChangeLogEntry.objects.filter(created_at__lt=cutoff).values('area_id').annotate(seq=Max('id'))
+        for row in list(horizons):
+            AcademicArea.objects.filter(pk=row['area_id']).update(
+                change_horizon=Greatest('change_horizon', Value(row['seq']))
+            )
+            deleted, _ = ChangeLogEntry.objects.filter(area_id=row['area_id'], id__lte=row['seq']).delete()
+            expired += deleted
+    return {'superseded': superseded, 'expired': expired}
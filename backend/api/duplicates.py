@@ -0,0 +1,211 @@
+# In backend/api/duplicates.py
+
+import hashlib
+import random
+import re
+import unicodedata
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from .models import *
+
+# Near-duplicate detection. Every resource gets a MinHash signature of its
+# normalized title (character trigrams) and, for books and papers, its author
+# names. The signature is cut into BANDS bands of ROWS values; each band is
+# hashed into a bucket stored in FingerprintBand, indexed by bucket. Two
+# resources whose titles/authors overlap by Jaccard similarity s share at least
+# one bucket with probability 1 - (1 - s^ROWS)^BANDS: about 0.99 at s = 0.6
+# and 0.4 at s = 0.3. A lookup therefore reads a handful of index entries
+# instead of comparing against the whole library, and the candidates it finds
+# are kept only if their signatures agree on at least DUPLICATE_THRESHOLD of
+# the values (the estimate of s).
+#
+# Fingerprints follow single-row writes through the signals in
+# api/signals.py; bulk paths call index_fingerprints themselves, like the
+# search index.
+
+BANDS = 20
+ROWS = 3
+PRIME = (1 << 61) - 1
+# Fixed, so signatures stay comparable across processes and restarts.
+_random = random.Random(20240521)
+PERMUTATIONS = [(_random.randrange(1, PRIME), _random.randrange(PRIME)) for _ in range(BANDS * ROWS)]
+STOPWORDS = {'a', 'an', 'and', 'der', 'die', 'das', 'for', 'in', 'la', 'le', 'of', 'on', 'the', 'to', 'with'}
+WORD = re.compile(r'\w+')
+# A generic title can share buckets with many resources; only this many
+# candidates are compared.
+MAX_CANDIDATES = 1000
+
+
+def normalize(text):
+    # Lower case, accents and punctuation stripped, stop words dropped.
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(word for word in WORD.findall(text) if word not in STOPWORDS)
+
+
+def shingles(title, authors=''):
+    title = normalize(title)
+    grams = {title[i:i + 3] for i in range(max(len(title) - 2, 1))} if title else set()
+    # Author names count as whole words, so initials and order don't matter much.
+    grams |= {f'author:{word}' for word in normalize(authors).split() if len(word) > 1}
+    return grams
+
+
+def signature(title, authors=''):
+    # A tuple of BANDS * ROWS values, or None when there is nothing to compare.
+    hashes = [
+        int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'big')
+        for gram in shingles(title, authors)
+    ]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+def buckets(signature):
+    # One signed 64-bit bucket per band; the band number is part of the hash.
+    out = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        data = band.to_bytes(2, 'big') + b''.join(value.to_bytes(8, 'big') for value in values)
+        out.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True))
+    return out
+
+
+def pack(signature):
+    return b''.join(value.to_bytes(8, 'big') for value in signature)
+
+
+def unpack(data):
+    data = bytes(data)
+    return tuple(int.from_bytes(data[i:i + 8], 'big') for i in range(0, len(data), 8))
+
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def default_threshold():
+    return getattr(settings, 'DUPLICATE_THRESHOLD', 0.6)
+
+
+# --- Index maintenance ---
+
+def _titles_and_authors(resource_ids):
+    rows = Resource.objects.filter(id__in=resource_ids).values_list(
+        'id', 'title', 'book_details__authors', 'paper_details__authors',
+    )
+    return [(pk, title, book_authors or paper_authors or '') for pk, title, book_authors, paper_authors in rows]
+
+
+def index_fingerprints(resource_ids):
+    # Batched like the search index, to stay below SQLite's parameter limit.
+    resource_ids = list(resource_ids)
+    for start in range(0, len(resource_ids), 500):
+        ids = resource_ids[start:start + 500]
+        fingerprints, bands = [], []
+        for pk, title, authors in _titles_and_authors(ids):
+            sig = signature(title, authors)
+            if sig is None:
+                continue
+            fingerprints.append(ResourceFingerprint(resource_id=pk, signature=pack(sig)))
+            bands += [FingerprintBand(resource_id=pk, bucket=bucket) for bucket in buckets(sig)]
+        with transaction.atomic():
+            ResourceFingerprint.objects.filter(resource_id__in=ids).delete()
+            FingerprintBand.objects.filter(resource_id__in=ids).delete()
+            ResourceFingerprint.objects.bulk_create(fingerprints)
+            FingerprintBand.objects.bulk_create(bands)
+
+
+def rebuild_fingerprints():
+    ResourceFingerprint.objects.all().delete()
+    FingerprintBand.objects.all().delete()
+    index_fingerprints(Resource.objects.order_by('id').values_list('id', flat=True).iterator())
+
+
+# --- Lookups ---
+
+def _signatures(resource_ids):
+    return {
+        pk: unpack(data)
+        for pk, data in ResourceFingerprint.objects.filter(resource_id__in=list(resource_ids)).values_list('resource_id', 'signature')
+    }
+
+
+def find_duplicates(title, authors='', exclude=None, limit=10, threshold=None):
+    """
+    Resources whose title and authors look like these, most similar first:
+    dicts with id, title, resource_type, area (id), area_slug and similarity.
+    `exclude` is a resource id to leave out (the resource itself); threshold
+    defaults to settings.DUPLICATE_THRESHOLD.
+    """
+    sig = signature(title, authors)
+    if sig is None:
+        return []
+    candidates = (
+        FingerprintBand.objects.filter(bucket__in=buckets(sig)).exclude(resource_id=exclude)
+        .values_list('resource_id', flat=True).distinct()[:MAX_CANDIDATES]
+    )
+    cutoff = threshold if threshold is not None else default_threshold()
+    scores = {
+        pk: score for pk, other in _signatures(list(candidates)).items()
+        if (score := similarity(sig, other)) >= cutoff
+    }
+    best = sorted(scores, key=lambda pk: (-scores[pk], pk))[:limit]
+    rows = Resource.objects.filter(id__in=best).values('id', 'title', 'resource_type', 'area_id', 'area__slug')
+    rows = {row['id']: row for row in rows}
+    return [
+        {
+            'id': pk, 'title': rows[pk]['title'], 'resource_type': rows[pk]['resource_type'],
+            'area': rows[pk]['area_id'], 'area_slug': rows[pk]['area__slug'], 'similarity': round(scores[pk], 3),
+        }
+        for pk in best if pk in rows
+    ]
+
+
+def duplicates_of(resource, limit=10):
+    rows = _titles_and_authors([resource.pk])
+    if not rows:
+        return []
+    _, title, authors = rows[0]
+    return find_duplicates(title, authors, exclude=resource.pk, limit=limit)
+
+
+def duplicate_clusters(area_id=None, threshold=None):
+    """
+    Groups of resources that are near-duplicates of each other, as sorted id
+    lists, largest first. Only resources sharing a bucket are ever compared;
+    a group is the connected component of the pairs that pass the threshold.
+    Scoped to one area if given.
+    """
+    bands = FingerprintBand.objects.all()
+    if area_id is not None:
+        bands = bands.filter(resource__area_id=area_id)
+    shared = bands.values('bucket').annotate(n=Count('id')).filter(n__gt=1).values('bucket')
+    members = {}
+    for bucket, pk in bands.filter(bucket__in=shared).values_list('bucket', 'resource_id').iterator():
+        members.setdefault(bucket, []).append(pk)
+
+    signatures = _signatures({pk for group in members.values() for pk in group})
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    cutoff = threshold if threshold is not None else default_threshold()
+    for group in members.values():
+        group = sorted(set(group))
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                if find(a) != find(b) and similarity(signatures[a], signatures[b]) >= cutoff:
+                    parent[find(a)] = find(b)
+
+    clusters = {}
+    for node in parent:
+        clusters.setdefault(find(node), []).append(node)
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=lambda c: (-len(c), c[0]))
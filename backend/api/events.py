@@ -0,0 +1,129 @@
+# In backend/api/events.py
+
+import asyncio
+import json
+import threading
+from collections import deque
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Live workspace updates. Whenever the change log (api/changes.py) records a
+# write and its transaction commits, the area's subscribers get an event over
+# Server-Sent Events (async_views.area_events). Events are only hints -- the
+# sequence number and which rows changed; clients fetch the rows themselves
+# from the changes endpoint, so a missed event never loses data.
+#
+# Fan-out: an event is encoded once, and each event loop holding subscribers
+# of the area is woken once (call_soon_threadsafe), whichever thread
+# published it. Backpressure: every subscriber has a bounded queue. A client
+# that stops reading until its queue is full has the queue replaced by a
+# single 'resync' event, and further events are dropped until it catches up;
+# a slow client costs a fixed amount of memory and never slows the others.
+#
+# LocalBroker only reaches subscribers of this process. For several worker
+# processes, point EVENT_BROKER at a subclass whose publish() sends the event
+# to a shared channel (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) and have
+# each process pass what it receives to deliver().
+
+RESYNC = b'event: resync\ndata: {}\n\n'
+
+
+def encode_event(event, data, id=None):
+    lines = [f'id: {id}'] if id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class Subscription:
+    # One connected client. Only touched from the event loop it was made on.
+
+    def __init__(self, broker, area_id, maxsize):
+        self.broker = broker
+        self.area_id = area_id
+        self.loop = asyncio.get_running_loop()
+        self.maxsize = maxsize
+        self.pending = deque()
+        self.ready = asyncio.Event()
+
+    def push(self, message):
+        if self.pending and self.pending[-1] is RESYNC:
+            # Lagging behind; the resync covers everything until it is read.
+            return
+        if len(self.pending) >= self.maxsize:
+            self.pending.clear()
+            message = RESYNC
+        self.pending.append(message)
+        self.ready.set()
+
+    async def next_batch(self, timeout):
+        # Everything queued so far as one chunk, or None after `timeout`
+        # seconds without events.
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        batch = b''.join(self.pending)
+        self.pending.clear()
+        self.ready.clear()
+        return batch
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # area id -> event loop -> subscriptions
+        self.subscribers = {}
+
+    def subscribe(self, area_id, maxsize=None):
+        subscription = Subscription(self, area_id, maxsize or getattr(settings, 'EVENT_QUEUE_SIZE', 100))
+        with self.lock:
+            loops = self.subscribers.setdefault(area_id, {})
+            loops.setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            loops = self.subscribers.get(subscription.area_id, {})
+            group = loops.get(subscription.loop, set())
+            group.discard(subscription)
+            if not group:
+                loops.pop(subscription.loop, None)
+            if not loops:
+                self.subscribers.pop(subscription.area_id, None)
+
+    def subscriber_count(self, area_id=None):
+        with self.lock:
+            areas = [self.subscribers.get(area_id, {})] if area_id is not None else self.subscribers.values()
+            return sum(len(group) for loops in areas for group in loops.values())
+
+    def publish(self, area_id, event, data, id=None):
+        self.deliver(area_id, encode_event(event, data, id))
+
+    def deliver(self, area_id, message):
+        with self.lock:
+            targets = [(loop, list(group)) for loop, group in self.subscribers.get(area_id, {}).items()]
+        for loop, group in targets:
+            try:
+                loop.call_soon_threadsafe(_push_all, group, message)
+            except RuntimeError:
+                # The loop is closed; its subscriptions are going away.
+                pass
+
+
+def _push_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.push(message)
+
+
+_broker = None
+
+
+def get_broker():
+    # settings.EVENT_BROKER picks the broker by dotted path.
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'EVENT_BROKER', 'api.events.LocalBroker'))()
+    return _broker
@@ -0,0 +1,151 @@
+# In backend/api/fastpath.py
+
+from django.conf import settings
+from django.utils import timezone
+from .metrics import timed_serialization
+from .models import *
+from .serializers import DETAIL_SERIALIZERS
+
+# Serializer-free read path for the hottest GETs: the resource and canvas
+# item lists and the area detail payload. Rows come straight from values()
+# queries and become plain dicts, skipping DRF's per-field machinery, which
+# is most of the CPU time of a large response. The output is the same as
+# ResourceSerializer, CanvasItemSerializer and AcademicAreaDetailSerializer
+# produce (tests.FastReadPathTests checks byte equality), so a change to
+# those serializers has to be made here too. FAST_READ_PATH = False turns
+# the whole thing off.
+
+# Keys are written in the serializers' field order ('__all__' puts plain
+# fields before relations). Detail fields come from the detail serializers.
+DETAIL_VALUES = {
+    resource_type: (serializer.Meta.model, list(serializer.Meta.fields))
+    for resource_type, serializer in DETAIL_SERIALIZERS.items()
+}
+# Detail fields written out as DRF's DateTimeField would.
+DETAIL_DATETIMES = {
+    resource_type: [name for name in fields if model._meta.get_field(name).get_internal_type() == 'DateTimeField']
+    for resource_type, (model, fields) in DETAIL_VALUES.items()
+}
+RESOURCE_VALUES = ('id', 'area_id', 'title', 'resource_type')
+CANVAS_ITEM_VALUES = ('id', 'area_id', 'resource_id', 'resource__title', 'resource__resource_type', 'pos_x', 'pos_y')
+CONNECTION_VALUES = ('id', 'label', 'area_id', 'source_id', 'target_id')
+TASK_VALUES = ('id', 'description', 'is_completed', 'area_id', 'resource_id')
+NOTE_VALUES = ('id', 'content', 'resource_id', 'area_id', 'version', 'updated_at')
+
+
+def fast_read_path(request):
+    # ?fields= trimming is left to the serializers.
+    return getattr(settings, 'FAST_READ_PATH', True) and not request.query_params.get('fields')
+
+
+def _datetime(value):
+    # As DRF's DateTimeField writes it.
+    if value is None:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _file_url(name):
+    # As DRF's FileField writes it without a request in the context, which is
+    # how get_details serializes them: relative to the site.
+    if not name:
+        return None
+    return PDFResource._meta.get_field('file').storage.url(name)
+
+
+def _details(rows, area_id=None):
+    # {resource id: details dict}, one query per resource type present. A
+    # whole area is matched by a join, a page of rows by id. The join checks
+    # the type too: a resource whose type was changed keeps its old detail
+    # row, which the serializers never show.
+    by_type = {}
+    for row in rows:
+        by_type.setdefault(row['resource_type'], []).append(row['id'])
+    details = {}
+    for resource_type, ids in by_type.items():
+        if resource_type not in DETAIL_VALUES:
+            continue
+        model, fields = DETAIL_VALUES[resource_type]
+        datetimes = DETAIL_DATETIMES[resource_type]
+        if area_id is not None:
+            queryset = model.objects.filter(resource__area_id=area_id, resource__resource_type=resource_type)
+        else:
+            queryset = model.objects.filter(resource_id__in=ids)
+        for detail in queryset.values('resource_id', *fields):
+            resource_id = detail.pop('resource_id')
+            if 'file' in detail:
+                detail['file'] = _file_url(detail['file'])
+            for name in datetimes:
+                detail[name] = _datetime(detail[name])
+            details[resource_id] = detail
+    return details
+
+
+def resource_payloads(rows, area_id=None):
+    # rows: dicts of RESOURCE_VALUES.
+    details = _details(rows, area_id)
+    with timed_serialization():
+        return [
+            {
+                'id': row['id'],
+                'area': row['area_id'],
+                'title': row['title'],
+                'resource_type': row['resource_type'],
+                'details': details.get(row['id']),
+            }
+            for row in rows
+        ]
+
+
+def canvas_item_payloads(rows):
+    # rows: dicts of CANVAS_ITEM_VALUES.
+    with timed_serialization():
+        return [
+            {
+                'id': row['id'],
+                'area': row['area_id'],
+                'resource': {
+                    'id': row['resource_id'],
+                    'title': row['resource__title'],
+                    'resource_type': row['resource__resource_type'],
+                },
+                'pos_x': row['pos_x'],
+                'pos_y': row['pos_y'],
+            }
+            for row in rows
+        ]
+
+
+def area_payload(area_id):
+    # What AcademicAreaDetailSerializer returns for the area, without a request.
+    area = AcademicArea.objects.values('id', 'name', 'slug', 'description').get(pk=area_id)
+    resources = list(Resource.objects.filter(area_id=area_id).order_by('id').values(*RESOURCE_VALUES))
+    resources = resource_payloads(resources, area_id=area_id)
+    canvas_items = canvas_item_payloads(
+        list(CanvasItem.objects.filter(area_id=area_id).order_by('id').values(*CANVAS_ITEM_VALUES))
+    )
+    connections = list(ResourceConnection.objects.filter(area_id=area_id).order_by('id').values_list(*CONNECTION_VALUES))
+    tasks = list(Task.objects.filter(area_id=area_id).order_by('id').values_list(*TASK_VALUES))
+    notes = list(Note.objects.filter(area_id=area_id).order_by('id').values_list(*NOTE_VALUES))
+    with timed_serialization():
+        return {
+            **area,
+            'resources': resources,
+            'canvas_items': canvas_items,
+            'connections': [
+                {'id': pk, 'label': label, 'area': area_pk, 'source': source, 'target': target}
+                for pk, label, area_pk, source, target in connections
+            ],
+            'tasks': [
+                {'id': pk, 'description': description, 'is_completed': is_completed, 'area': area_pk, 'resource': resource}
+                for pk, description, is_completed, area_pk, resource in tasks
+            ],
+            'notes': [
+                {
+                    'id': pk, 'content': content, 'resource': resource, 'area': area_pk,
+                    'version': version, 'updated_at': _datetime(updated_at),
+                }
+                for pk, content, resource, area_pk, version, updated_at in notes
+            ],
+        }
@@ -0,0 +1,224 @@
+# In backend/api/graph.py
+
+import threading
+from bisect import bisect_right
+from collections import defaultdict, deque
+from .models import AcademicArea, ChangeLogEntry, Resource, ResourceConnection
+
+
+class GraphIndex:
+    """
+    In-memory adjacency index over every ResourceConnection, kept per process.
+
+    Edges are stored once as id -> (area, source, target, label); every node
+    keeps the set of edge ids touching it and every area the set of its edges.
+    Traversals treat the graph as undirected and never query per edge.
+
+    Writes made in this process are applied incrementally by the signal
+    receivers once they commit (a rolled-back write never reaches the
+    index). Writes from other processes are picked up by refresh(), which
+    reads the change log's connection entries since the last one it saw and
+    reloads just those edges. Whole areas are (re)loaded only when they
+    appear, disappear or have their change log expired (change_horizon
+    moves), which are the writes that leave no connection entry behind.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.edges = {}
+        self.adjacency = defaultdict(set)
+        self.area_edges = defaultdict(set)
+        # The last connection change log entry applied, None until loaded,
+        # and each area's change_horizon at that point.
+        self.seq = None
+        self.area_horizons = {}
+        # Sorted edge ids for the paged global graph, rebuilt after changes.
+        self._ordered = None
+
+    # --- Maintenance ---
+
+    def _add(self, edge_id, area_id, source, target, label):
+        self._ordered = None
+        self.edges[edge_id] = (area_id, source, target, label)
+        self.adjacency[source].add(edge_id)
+        self.adjacency[target].add(edge_id)
+        self.area_edges[area_id].add(edge_id)
+
+    def _remove(self, edge_id):
+        edge = self.edges.pop(edge_id, None)
+        if edge is None:
+            return
+        self._ordered = None
+        area_id, source, target, _ = edge
+        for node in (source, target):
+            self.adjacency[node].discard(edge_id)
+            if not self.adjacency[node]:
+                del self.adjacency[node]
+        self.area_edges[area_id].discard(edge_id)
+
+    def _load_areas(self, area_ids=None):
+        # Reloads the edges of the given areas, or of everything if None.
+        rows = ResourceConnection.objects.values_list('id', 'area_id', 'source_id', 'target_id', 'label')
+        if area_ids is None:
+            self.edges.clear()
+            self.adjacency.clear()
+            self.area_edges.clear()
+            chunks = [rows]
+        else:
+            for area_id in area_ids:
+                for edge_id in list(self.area_edges.get(area_id, ())):
+                    self._remove(edge_id)
+                self.area_edges.pop(area_id, None)
+            chunks = [rows.filter(area_id__in=area_ids[i:i + 500]) for i in range(0, len(area_ids), 500)]
+        for chunk in chunks:
+            for row in chunk.iterator(chunk_size=5000):
+                self._add(*row)
+
+    def _load_edges(self, edge_ids):
+        rows = ResourceConnection.objects.filter(id__in=edge_ids).values_list('id', 'area_id', 'source_id', 'target_id', 'label')
+        for edge_id in edge_ids:
+            self._remove(edge_id)
+        for row in rows:
+            self._add(*row)
+
+    def refresh(self):
+        # Two queries, the areas' horizons and the connection entries since
+        # the last refresh, plus one per kind of change found.
+        with self.lock:
+            horizons = dict(AcademicArea.objects.values_list('id', 'change_horizon'))
+            entries = ChangeLogEntry.objects.filter(kind='connection').order_by('id')
+            if self.seq is None:
+                self.seq = entries.values_list('id', flat=True).last() or 0
+                self._load_areas()
+            else:
+                changes = list(entries.filter(id__gt=self.seq).values_list('id', 'object_id'))
+                stale = [a for a, h in horizons.items() if self.area_horizons.get(a) != h]
+                stale += [a for a in self.area_horizons if a not in horizons]
+                if stale:
+                    self._load_areas(stale)
+                if changes:
+                    self._load_edges(sorted({edge_id for _, edge_id in changes}))
+                    self.seq = changes[-1][0]
+            self.area_horizons = horizons
+
+    def edge_saved(self, edge_id, area_id, source, target, label):
+        with self.lock:
+            self._remove(edge_id)
+            self._add(edge_id, area_id, source, target, label)
+
+    def edge_deleted(self, edge_id):
+        with self.lock:
+            self._remove(edge_id)
+
+    # --- Queries ---
+
+    def edge(self, edge_id):
+        area_id, source, target, label = self.edges[edge_id]
+        return {'id': edge_id, 'area': area_id, 'source': source, 'target': target, 'label': label}
+
+    def neighbours(self, node):
+        for edge_id in self.adjacency.get(node, ()):
+            _, source, target, _ = self.edges[edge_id]
+            yield edge_id, target if source == node else source
+
+    def neighbourhood(self, node, depth, max_nodes):
+        # Breadth-first, so every node is reported at its shortest distance.
+        with self.lock:
+            distances = {node: 0}
+            queue = deque([node])
+            truncated = False
+            while queue:
+                current = queue.popleft()
+                if distances[current] == depth:
+                    continue
+                for _, neighbour in self.neighbours(current):
+                    if neighbour in distances:
+                        continue
+                    if len(distances) >= max_nodes:
+                        truncated = True
+                        break
+                    distances[neighbour] = distances[current] + 1
+                    queue.append(neighbour)
+            edge_ids = {
+                edge_id for n in distances for edge_id, other in self.neighbours(n) if other in distances
+            }
+            return distances, [self.edge(e) for e in sorted(edge_ids)], truncated
+
+    def shortest_path(self, source, target, max_depth):
+        with self.lock:
+            if source == target:
+                return [source], []
+            parents = {source: None}
+            frontier = [source]
+            for _ in range(max_depth):
+                next_frontier = []
+                for current in frontier:
+                    for edge_id, neighbour in self.neighbours(current):
+                        if neighbour in parents:
+                            continue
+                        parents[neighbour] = (current, edge_id)
+                        if neighbour == target:
+                            nodes, edges = [target], []
+                            while parents[nodes[-1]] is not None:
+                                previous, via = parents[nodes[-1]]
+                                edges.append(self.edge(via))
+                                nodes.append(previous)
+                            return nodes[::-1], edges[::-1]
+                        next_frontier.append(neighbour)
+                frontier = next_frontier
+                if not frontier:
+                    break
+            return None, None
+
+    def components(self, area_id=None):
+        # Connected components, largest first. Scoped to one area's edges if given.
+        with self.lock:
+            edge_ids = self.area_edges.get(area_id, set()) if area_id is not None else self.edges.keys()
+            parent = {}
+
+            def find(node):
+                parent.setdefault(node, node)
+                while parent[node] != node:
+                    parent[node] = parent[parent[node]]
+                    node = parent[node]
+                return node
+
+            for edge_id in edge_ids:
+                _, source, target, _ = self.edges[edge_id]
+                root_a, root_b = find(source), find(target)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+            groups = defaultdict(list)
+            for node in parent:
+                groups[find(node)].append(node)
+            return sorted((sorted(nodes) for nodes in groups.values()), key=lambda c: (-len(c), c[0]))
+
+    def edge_page(self, after, limit, area_id=None):
+        # Keyset paging over edge ids, like the REST list endpoints.
+        with self.lock:
+            if area_id is not None:
+                ordered = sorted(self.area_edges.get(area_id, ()))
+            else:
+                if self._ordered is None:
+                    self._ordered = sorted(self.edges)
+                ordered = self._ordered
+            start = bisect_right(ordered, after)
+            page = ordered[start:start + limit]
+            has_more = start + limit < len(ordered)
+            return [self.edge(e) for e in page], has_more
+
+
+def describe_nodes(node_ids):
+    # Node payloads for a set of resource ids, in one query.
+    rows = Resource.objects.filter(id__in=list(node_ids)).values('id', 'title', 'resource_type', 'area_id')
+    return {
+        row['id']: {'id': row['id'], 'title': row['title'], 'resource_type': row['resource_type'], 'area': row['area_id']}
+        for row in rows
+    }
+
+
+_index = GraphIndex()
+
+
+def graph_index():
+    return _index
@@ -0,0 +1,298 @@
+# In backend/api/ingest.py
+
+import csv
+import json
+import re
+from collections import defaultdict
+from itertools import count, islice
+from django.db import transaction
+from .models import *
+from .cache import bump_area_version
+from .changes import record_changes
+from .duplicates import index_fingerprints
+from .jobs import queue_related_update
+from .stats import adjust_area_stats
+from .search import get_search_backend
+from .serializers import ResourceImportSerializer
+
+DEFAULT_BATCH_SIZE = 500
+# A JSON array is decoded one element at a time; an element may be at most
+# this many characters, which bounds the buffer.
+MAX_JSON_ROW = 1024 * 1024
+JSON_READ_SIZE = 64 * 1024
+# Per-row errors are reported up to this many, after which only the count grows.
+MAX_REPORTED_ERRORS = 1000
+
+
+def build_resource_detail(resource, data):
+    # Returns the unsaved child row that holds the type-specific fields.
+    resource_type = resource.resource_type
+    if resource_type == 'course':
+        return Course(resource=resource, lecturer=data.get('lecturer', ''), website=data.get('website', ''))
+    if resource_type == 'book':
+        return Book(resource=resource, authors=data.get('authors', ''), url=data.get('url', ''))
+    if resource_type == 'paper':
+        return Paper(resource=resource, authors=data.get('authors', ''), publication_year=data.get('publication_year'))
+    if resource_type == 'web':
+        return WebResource(resource=resource, url=data.get('url', ''))
+    if resource_type == 'pdf':
+        return PDFResource(resource=resource)
+    return None
+
+
+# --- Parsers ---
+# Every parser reads its text stream lazily and yields (line_number, row) pairs,
+# so only one batch of rows is ever held in memory.
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    line = reader.line_num
+    for row in reader:
+        yield line + 1, row
+        line = reader.line_num
+
+
+def parse_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'__error__': f'Invalid JSON: {e}'}
+        yield line_number, row
+
+
+def parse_json_array(stream):
+    # Positions in the array stand in for line numbers. Syntax errors cannot
+    # be skipped over like a bad JSONL line, so they end the input.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        block = stream.read(JSON_READ_SIZE)
+        eof = not block
+        buffer = buffer[pos:] + (block or '')
+        pos = 0
+        return not eof
+
+    def next_char():
+        # The next non-blank character, without consuming it ('' at the end).
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return buffer[pos:pos + 1]
+
+    if next_char() != '[':
+        yield 1, {'__error__': 'Expected a JSON array of rows.'}
+        return
+    pos += 1
+    if next_char() == ']':
+        return
+    for position in count(1):
+        while True:
+            try:
+                row, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                error = e
+            else:
+                # Only a separator ends a row: "3." may be the start of 3.5.
+                if eof or (end < len(buffer) and (buffer[end].isspace() or buffer[end] in ',]')):
+                    break
+                error = None
+            if len(buffer) - pos > MAX_JSON_ROW:
+                yield position, {'__error__': f'Rows may be at most {MAX_JSON_ROW} characters.'}
+                return
+            if not fill() and error is not None:
+                yield position, {'__error__': f'Invalid JSON: {error.msg}.'}
+                return
+        pos = end
+        yield position, row
+        char = next_char()
+        if char == ']':
+            return
+        if char != ',':
+            yield position + 1, {'__error__': "Invalid JSON: expected ',' or ']' after a row."}
+            return
+        pos += 1
+        next_char()
+
+
+BIBTEX_TYPES = {
+    'article': 'paper', 'inproceedings': 'paper', 'conference': 'paper',
+    'incollection': 'paper', 'phdthesis': 'paper', 'mastersthesis': 'paper',
+    'techreport': 'paper', 'unpublished': 'paper',
+    'book': 'book', 'inbook': 'book',
+    'misc': 'web', 'online': 'web', 'electronic': 'web', 'www': 'web',
+}
+BIBTEX_SKIPPED = {'comment', 'string', 'preamble'}
+BIBTEX_FIELD = re.compile(r'\s*([\w-]+)\s*=\s*')
+BIBTEX_BARE_VALUE = re.compile(r'[^,}\s]*')
+
+
+def _bibtex_value(text, pos):
+    # Reads one {braced}, "quoted" or bare value starting at pos.
+    if text[pos] in '{"':
+        depth, i = 0, pos + (text[pos] == '"')
+        while i < len(text):
+            char = text[i]
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0 and text[pos] == '{':
+                    break
+            elif char == '"' and depth == 0:
+                break
+            i += 1
+        value, end = text[pos + 1:i], i + 1
+    else:
+        match = BIBTEX_BARE_VALUE.match(text, pos)
+        value, end = match.group(0), match.end()
+    value = re.sub(r'\s+', ' ', value.replace('{', '').replace('}', '')).strip()
+    return value, end
+
+
+def _bibtex_fields(body):
+    # body is everything after "@type{": "key, field = value, ...}"
+    fields = {}
+    pos = body.find(',')
+    if pos == -1:
+        return fields
+    pos += 1
+    while True:
+        match = BIBTEX_FIELD.match(body, pos)
+        if not match:
+            break
+        value, pos = _bibtex_value(body, match.end())
+        fields[match.group(1).lower()] = value
+        while pos < len(body) and body[pos] in ', \t\r\n':
+            pos += 1
+    return fields
+
+
+def _bibtex_row(entry_type, fields):
+    resource_type = BIBTEX_TYPES.get(entry_type, 'paper')
+    if resource_type == 'web' and not fields.get('url'):
+        resource_type = 'paper'
+    row = {'title': fields.get('title', ''), 'resource_type': resource_type}
+    if fields.get('author'):
+        row['authors'] = ', '.join(a.strip() for a in re.split(r'\s+and\s+', fields['author']))
+    year = re.search(r'\d{4}', fields.get('year', ''))
+    if year and resource_type == 'paper':
+        row['publication_year'] = int(year.group(0))
+    if fields.get('url'):
+        row['url'] = fields['url']
+    return row
+
+
+def parse_bibtex(stream):
+    entry, start, depth, opened = None, 0, 0, False
+    for line_number, line in enumerate(stream, start=1):
+        if entry is None:
+            at = line.find('@')
+            if at == -1:
+                continue
+            entry, start, depth, opened = [], line_number, 0, False
+            line = line[at:]
+        entry.append(line)
+        depth += line.count('{') - line.count('}')
+        opened = opened or '{' in line
+        if depth > 0 or not opened:
+            continue
+        text = ''.join(entry)
+        entry = None
+        header = re.match(r'@\s*(\w+)\s*\{', text)
+        if not header:
+            yield start, {'__error__': 'Malformed BibTeX entry.'}
+            continue
+        entry_type = header.group(1).lower()
+        if entry_type in BIBTEX_SKIPPED:
+            continue
+        yield start, _bibtex_row(entry_type, _bibtex_fields(text[header.end():]))
+    if entry is not None:
+        yield start, {'__error__': 'Unterminated BibTeX entry.'}
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'jsonl': parse_jsonl,
+    'json': parse_json_array,
+    'bibtex': parse_bibtex,
+}
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json', '.bib': 'bibtex', '.bibtex': 'bibtex',
+}
+
+
+def guess_format(filename):
+    for extension, fmt in FORMAT_EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    return None
+
+
+# --- Ingestion ---
+
+def _clean(row):
+    # Blank CSV cells mean "not given", not "invalid empty value".
+    return {key: value for key, value in row.items() if value not in ('', None)}
+
+
+def _insert_batch(area, valid_rows):
+    with transaction.atomic():
+        resources = Resource.objects.bulk_create([
+            Resource(area=area, title=data['title'], resource_type=data['resource_type'])
+            for data in valid_rows
+        ])
+        children = defaultdict(list)
+        for resource, data in zip(resources, valid_rows):
+            child = build_resource_detail(resource, data)
+            if child is not None:
+                children[type(child)].append(child)
+        for model, rows in children.items():
+            model.objects.bulk_create(rows)
+        # bulk_create skips the signals that normally maintain the index, stats and change log.
+        get_search_backend().index_resources([resource.id for resource in resources])
+        index_fingerprints([resource.id for resource in resources])
+        queue_related_update([resource.id for resource in resources])
+        adjust_area_stats(area.id, resource_count=len(resources))
+        record_changes(area.id, 'resource', [resource.id for resource in resources])
+        bump_area_version(area.id)
+    return resources
+
+
+def ingest_resources(rows, area, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Validates and inserts (line_number, row) pairs into the given area.
+    Each batch is inserted with bulk_create inside its own transaction, so a
+    failing batch never leaves a Resource without its detail row.
+    """
+    report = {'created': 0, 'failed': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        valid_rows = []
+        for line_number, row in batch:
+            if not isinstance(row, dict):
+                errors = {'non_field_errors': ['Expected an object.']}
+            elif '__error__' in row:
+                errors = {'non_field_errors': [row['__error__']]}
+            else:
+                serializer = ResourceImportSerializer(data=_clean(row))
+                if serializer.is_valid():
+                    valid_rows.append(serializer.validated_data)
+                    continue
+                errors = serializer.errors
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'errors': errors})
+        if valid_rows:
+            report['created'] += len(_insert_batch(area, valid_rows))
+    return report
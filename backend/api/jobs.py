@@ -0,0 +1,364 @@
+# In backend/api/jobs.py
+
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import *
+from .cache import bump_area_version, bump_resource_area_version
+from .changes import record_resource_changes
+from .links import run_link_checks
+from .pdf import extract_pdf_text
+from .related import mark_related_stale, update_related
+from .search import get_search_backend
+from .storage import expire_uploads, media_path
+
+# Background jobs live in the Job table, so nothing is lost when the worker
+# restarts and no broker is needed. Requests only ever insert a row; the
+# run_jobs command claims runnable rows, runs them in a local process pool and
+# writes the results back.
+#
+# Failed jobs are retried with exponential backoff until MAX_ATTEMPTS. A job
+# left 'running' by a worker that died is handed out again after STALE_AFTER.
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=15)
+# Extracted text beyond this many characters is dropped.
+MAX_TEXT_LENGTH = 2_000_000
+
+
+class PermanentJobError(Exception):
+    # Raised when retrying cannot help; the job fails right away.
+    pass
+
+
+class JobType:
+    # prepare() and finish() run in the worker's main process and may use the
+    # database. work() runs in a pool process: it has to be a plain module-level
+    # function of what prepare() returned, and must not touch the database.
+    # Job types without work() run prepare/finish only, in the main process.
+    work = None
+
+    def prepare(self, payload):
+        return payload
+
+    def finish(self, payload, result):
+        pass
+
+
+JOB_TYPES = {}
+
+
+def job_type(kind):
+    def register(cls):
+        JOB_TYPES[kind] = cls()
+        return cls
+    return register
+
+
+def enqueue(kind, payload, delay=None):
+    if kind not in JOB_TYPES:
+        raise ValueError(f'Unknown job kind {kind!r}.')
+    run_after = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.create(kind=kind, payload=payload, run_after=run_after)
+
+
+# --- Job types ---
+
+@job_type('extract_pdf')
+class ExtractPDFText(JobType):
+    work = staticmethod(extract_pdf_text)
+
+    def prepare(self, payload):
+        try:
+            stored_file = StoredFile.objects.get(pk=payload['stored_file'])
+        except StoredFile.DoesNotExist:
+            raise PermanentJobError('The stored file no longer exists.')
+        return media_path(stored_file.file.name)
+
+    def finish(self, payload, result):
+        page_count, text = result
+        stored_file_id = payload['stored_file']
+        with transaction.atomic():
+            StoredFile.objects.filter(pk=stored_file_id).update(page_count=page_count)
+            ExtractedText.objects.update_or_create(
+                stored_file_id=stored_file_id, defaults={'text': text[:MAX_TEXT_LENGTH]}
+            )
+            # Every resource sharing this content gets the page count and
+            # becomes searchable by the text.
+            resource_ids = list(
+                PDFResource.objects.filter(stored_file_id=stored_file_id).values_list('resource_id', flat=True)
+            )
+            PDFResource.objects.filter(stored_file_id=stored_file_id).update(page_count=page_count)
+            get_search_backend().index_resources(resource_ids)
+            record_resource_changes(resource_ids)
+            for resource_id in resource_ids:
+                bump_resource_area_version(resource_id)
+
+
+# Detail models holding a URL the check_links job looks after, and the field.
+LINK_FIELDS = {Course: 'website', Book: 'url', WebResource: 'url'}
+LINK_CHECK_FIELDS = ['status', 'error', 'final_url', 'content_type', 'title', 'etag', 'last_modified', 'checked_at']
+
+
+@job_type('check_links')
+class CheckLinks(JobType):
+    """
+    Probes every linked URL not checked in the last `stale_hours` (or never
+    copied to its resources yet), stores one LinkCheck per URL and copies
+    status and time into the detail rows. With `every_hours` in the payload
+    the job queues its own next run, which makes it a schedule that lives in
+    the job table like everything else.
+    """
+    work = staticmethod(run_link_checks)
+
+    def prepare(self, payload):
+        stale_hours = payload.get('stale_hours', getattr(settings, 'LINK_CHECK_STALE_HOURS', 24))
+        cutoff = timezone.now() - timedelta(hours=stale_hours)
+        urls, unchecked = set(), set()
+        for model, field in LINK_FIELDS.items():
+            linked = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            if payload.get('area'):
+                linked = linked.filter(resource__area_id=payload['area'])
+            for url, checked_at in linked.values_list(field, 'link_checked_at').distinct():
+                urls.add(url)
+                if checked_at is None:
+                    unchecked.add(url)
+        previous = {
+            url: (etag, last_modified, checked_at)
+            for url, etag, last_modified, checked_at in LinkCheck.objects.values_list('url', 'etag', 'last_modified', 'checked_at')
+        }
+        targets = []
+        for url in sorted(urls):
+            etag, last_modified, checked_at = previous.get(url, ('', '', None))
+            if url in unchecked or checked_at is None or checked_at < cutoff:
+                targets.append((url, etag, last_modified))
+        return {
+            'targets': targets,
+            'concurrency': payload.get('concurrency', getattr(settings, 'LINK_CHECK_CONCURRENCY', 20)),
+            'per_host': payload.get('per_host', getattr(settings, 'LINK_CHECK_PER_HOST', 2)),
+            'timeout': payload.get('timeout', getattr(settings, 'LINK_CHECK_TIMEOUT', 10)),
+            'allow_private': getattr(settings, 'LINK_CHECK_ALLOW_PRIVATE', False),
+        }
+
+    def finish(self, payload, result):
+        now = timezone.now()
+        previous = LinkCheck.objects.in_bulk([probe['url'] for probe in result], field_name='url')
+        checks = []
+        for probe in result:
+            old = previous.get(probe['url'])
+            if probe['status'] == 304 and old is not None:
+                # Unchanged since the last probe: keep what it found.
+                check = LinkCheck(**{name: getattr(old, name) for name in ['url'] + LINK_CHECK_FIELDS})
+                check.etag = probe['etag'] or old.etag
+                check.last_modified = probe['last_modified'] or old.last_modified
+                check.error = ''
+            else:
+                check = LinkCheck(**{name: probe[name] for name in ['url'] + LINK_CHECK_FIELDS if name in probe})
+            check.checked_at = now
+            checks.append(check)
+
+        by_status = {}
+        for check in checks:
+            by_status.setdefault(check.status, []).append(check.url)
+        with transaction.atomic():
+            LinkCheck.objects.bulk_create(
+                checks, update_conflicts=True, unique_fields=['url'], update_fields=LINK_CHECK_FIELDS,
+            )
+            resource_ids = []
+            for model, field in LINK_FIELDS.items():
+                for status, urls in by_status.items():
+                    linked = model.objects.filter(**{f'{field}__in': urls})
+                    resource_ids += linked.values_list('resource_id', flat=True)
+                    linked.update(link_status=status, link_checked_at=now)
+            record_resource_changes(resource_ids)
+            area_ids = Resource.objects.filter(id__in=resource_ids).values_list('area_id', flat=True).distinct()
+            for area_id in list(area_ids):
+                bump_area_version(area_id)
+
+        if payload.get('every_hours'):
+            enqueue('check_links', payload, delay=timedelta(hours=payload['every_hours']))
+
+
+@job_type('update_related')
+class UpdateRelated(JobType):
+    # No work(): it runs in the worker's main process, whose RelatedIndex
+    # stays loaded between runs (api/related.py).
+    def prepare(self, payload):
+        return update_related()
+
+
+def queue_related_update(resource_ids):
+    # Marks related lists stale, in the writer's transaction, and makes sure
+    # an update_related job is coming. Writes within RELATED_UPDATE_DELAY
+    # seconds share one run.
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return
+    mark_related_stale(resource_ids)
+    schedule_related_update()
+
+
+def schedule_related_update():
+    # For writers that marked StaleRelatedResource rows themselves.
+    if not Job.objects.filter(kind='update_related', status='pending').exists():
+        enqueue('update_related', {}, delay=timedelta(seconds=getattr(settings, 'RELATED_UPDATE_DELAY', 30)))
+
+
+@job_type('expire_uploads')
+class ExpireUploads(JobType):
+    # Removes abandoned upload sessions and their partial files. It comes back
+    # while any session is left, so it runs only when uploads are in use.
+    def prepare(self, payload):
+        return expire_uploads(upload_expiry())
+
+    def finish(self, payload, result):
+        if UploadSession.objects.exists():
+            schedule_upload_expiry()
+
+
+def upload_expiry():
+    return timedelta(hours=getattr(settings, 'UPLOAD_EXPIRY_HOURS', 24))
+
+
+def schedule_upload_expiry():
+    # Called whenever an upload session is created.
+    if not Job.objects.filter(kind='expire_uploads', status='pending').exists():
+        enqueue('expire_uploads', {}, delay=upload_expiry())
+
+
+# --- Queue ---
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - STALE_AFTER
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(status='pending', locked_at=None)
+
+
+def claim_jobs(limit):
+    # Several workers may poll at once; a job belongs to whoever flips it from
+    # pending to running.
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status='pending', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    claimed = [
+        job_id for job_id in list(candidates)
+        if Job.objects.filter(pk=job_id, status='pending').update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_after', 'id'))
+
+
+def complete_job(job, result):
+    JOB_TYPES[job.kind].finish(job.payload, result)
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), last_error='')
+
+
+def fail_job(job, error, permanent=False):
+    message = ''.join(traceback.format_exception(error)).strip()
+    if permanent or job.attempts >= MAX_ATTEMPTS:
+        Job.objects.filter(pk=job.pk).update(status='failed', finished_at=timezone.now(), last_error=message)
+        return 'failed'
+    delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+    Job.objects.filter(pk=job.pk).update(
+        status='pending', locked_at=None, run_after=timezone.now() + delay, last_error=message
+    )
+    return 'retried'
+
+
+class JobRunner:
+    """
+    Runs claimed jobs on a process pool of `workers` processes (or inline in
+    this process when workers is 0). At most `max_in_flight` jobs are claimed
+    at a time, so a long queue stays in the table instead of in memory and
+    other workers can share it.
+    """
+
+    def __init__(self, workers, max_in_flight=None, poll_interval=1.0, stdout=None):
+        self.workers = workers
+        self.max_in_flight = max_in_flight or max(workers, 1) * 2
+        self.poll_interval = poll_interval
+        self.stdout = stdout
+        self.counts = {'done': 0, 'retried': 0, 'failed': 0}
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def start(self, job, pool):
+        # Returns a future for pool jobs, or None once an inline job is handled.
+        job_type = JOB_TYPES.get(job.kind)
+        try:
+            if job_type is None:
+                raise PermanentJobError(f'Unknown job kind {job.kind!r}.')
+            args = job_type.prepare(job.payload)
+            if job_type.work is not None and pool is not None:
+                return pool.submit(job_type.work, args)
+            result = job_type.work(args) if job_type.work is not None else args
+        except Exception as e:
+            self.failed(job, e)
+            return None
+        self.finished(job, result)
+        return None
+
+    def finished(self, job, result):
+        try:
+            complete_job(job, result)
+        except Exception as e:
+            self.failed(job, e)
+            return
+        self.counts['done'] += 1
+        self.log(f'Job {job.pk} ({job.kind}) done.')
+
+    def failed(self, job, error):
+        outcome = fail_job(job, error, permanent=isinstance(error, (PermanentJobError, ObjectDoesNotExist)))
+        self.counts[outcome] += 1
+        self.log(f'Job {job.pk} ({job.kind}) {outcome}: {error}')
+
+    def run(self, once=False, max_jobs=None):
+        # once: stop as soon as nothing runnable is left, instead of polling.
+        requeue_stale_jobs()
+        pool = ProcessPoolExecutor(self.workers) if self.workers else None
+        in_flight = {}
+        started = 0
+        try:
+            while True:
+                free = self.max_in_flight - len(in_flight)
+                if max_jobs is not None:
+                    free = min(free, max_jobs - started)
+                claimed = claim_jobs(free)
+                for job in claimed:
+                    started += 1
+                    future = self.start(job, pool)
+                    if future is not None:
+                        in_flight[future] = job
+                if not in_flight:
+                    if claimed:
+                        continue
+                    if once or (max_jobs is not None and started >= max_jobs):
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.failed(job, e)
+                    else:
+                        self.finished(job, result)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return self.counts
@@ -0,0 +1,253 @@
+# In backend/api/links.py
+
+import asyncio
+import ipaddress
+import re
+import socket
+import ssl
+from html import unescape
+from urllib.parse import quote, urljoin, urlsplit
+
+# Link health checks for the URLs of courses, books and web resources, run by
+# the check_links job (api/jobs.py) and management command. This module must
+# not touch Django: it runs inside the run_jobs worker pool processes.
+#
+# Probes are plain HTTP/1.1 GETs over asyncio streams, so no HTTP client
+# library is needed. All URLs of a run are probed concurrently, at most
+# `concurrency` at a time and at most `per_host` against any one host, each
+# probe (redirects included) bounded by `timeout` seconds. A URL checked
+# before is asked for conditionally (If-None-Match / If-Modified-Since), so
+# an unchanged page answers 304 without a body. For HTML pages the first
+# MAX_BODY bytes are read to pick up the <title>.
+#
+# The URLs are typed in by users, so every hop (redirects included) is
+# resolved first and refused if any address of the host is not public --
+# loopback, private, link-local (cloud metadata at 169.254.169.254) and the
+# like -- and the connection goes to the address that was checked.
+# allow_private (settings.LINK_CHECK_ALLOW_PRIVATE) lifts that, for tests and
+# intranet deployments.
+
+USER_AGENT = 'AcademicWorkspace-LinkChecker/1.0'
+MAX_REDIRECTS = 5
+MAX_BODY = 64 * 1024
+REDIRECTS = {301, 302, 303, 307, 308}
+# Characters left alone when re-quoting a path for the request line.
+SAFE_PATH = "/%?=&;:@!$'()*+,~-._[]"
+TITLE = re.compile(rb'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+MAX_TITLE_LENGTH = 300
+
+
+class LinkError(Exception):
+    # A response (or URL) that cannot be checked.
+    pass
+
+
+def run_link_checks(options):
+    # Entry point for the check_links job: options is what
+    # CheckLinks.prepare returns. Results come back in the order of targets.
+    return check_links(
+        options['targets'], concurrency=options['concurrency'],
+        per_host=options['per_host'], timeout=options['timeout'],
+        allow_private=options.get('allow_private', False),
+    )
+
+
+def check_links(targets, concurrency=20, per_host=2, timeout=10.0, allow_private=False):
+    # targets: (url, etag, last_modified) triples; the validators may be empty.
+    return asyncio.run(_check_all(targets, concurrency, per_host, timeout, allow_private))
+
+
+async def _check_all(targets, concurrency, per_host, timeout, allow_private):
+    overall = asyncio.Semaphore(concurrency)
+    hosts = {}
+
+    async def check(url, etag, last_modified):
+        try:
+            host = (urlsplit(url).hostname or '').lower()
+        except ValueError:
+            host = ''
+        # The host slot is taken first, so probes queued behind a busy host
+        # never hold one of the overall slots while they wait.
+        async with hosts.setdefault(host, asyncio.Semaphore(per_host)):
+            async with overall:
+                return await probe(url, etag, last_modified, timeout, allow_private)
+
+    return await asyncio.gather(*(check(*target) for target in targets))
+
+
+async def probe(url, etag='', last_modified='', timeout=10.0, allow_private=False):
+    """
+    Fetches `url`, following redirects. Returns a dict with the final
+    status (None when there was no usable answer, see error), final_url, the
+    validators and content type of the final response and the page title.
+    """
+    result = {
+        'url': url, 'status': None, 'final_url': url, 'etag': '', 'last_modified': '',
+        'content_type': '', 'title': '', 'error': '',
+    }
+    try:
+        await asyncio.wait_for(_follow(result, etag, last_modified, allow_private), timeout)
+    except asyncio.TimeoutError:
+        result['status'] = None
+        result['error'] = f'No answer within {timeout:g}s.'
+    except (OSError, EOFError, ValueError, UnicodeError, LinkError) as e:
+        # OSError covers refused connections, DNS failures and TLS errors.
+        result['status'] = None
+        result['error'] = (str(e) or type(e).__name__)[:300]
+    return result
+
+
+async def _follow(result, etag, last_modified, allow_private):
+    url = url_seen = result['url']
+    for _ in range(MAX_REDIRECTS + 1):
+        # The validators are sent on every hop; redirects ignore them.
+        status, headers, body = await _get(url, etag, last_modified, allow_private)
+        url_seen = url
+        if status in REDIRECTS and headers.get('location'):
+            url = urljoin(url, headers['location'])
+            continue
+        content_type = headers.get('content-type', '')
+        result.update({
+            'status': status,
+            'final_url': url_seen,
+            'etag': headers.get('etag', ''),
+            'last_modified': headers.get('last-modified', ''),
+            'content_type': content_type.split(';')[0].strip()[:100],
+            'title': _title(body, content_type),
+        })
+        return
+    raise LinkError(f'More than {MAX_REDIRECTS} redirects.')
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not (
+        ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_multicast
+        or ip.is_reserved or ip.is_unspecified
+    )
+
+
+async def _resolve(host, port, allow_private):
+    # The addresses to connect to; all of them must be public.
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = [info[4][0] for info in infos]
+    if not addresses:
+        raise LinkError(f'{host} has no address.')
+    if not allow_private:
+        for address in addresses:
+            if not _is_public(address):
+                raise LinkError(f'{host} resolves to the non-public address {address}.')
+    return list(dict.fromkeys(addresses))
+
+
+async def _connect(host, port, https, allow_private):
+    # Like asyncio.open_connection(host, ...), trying the checked addresses
+    # in turn instead of resolving the host again.
+    error = None
+    for address in await _resolve(host, port, allow_private):
+        try:
+            return await asyncio.open_connection(
+                address, port, ssl=ssl.create_default_context() if https else None,
+                server_hostname=host if https else None,
+            )
+        except OSError as e:
+            error = e
+    raise error
+
+
+async def _get(url, etag, last_modified, allow_private):
+    # One GET on a fresh connection. Returns (status, lower-cased headers, body).
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise LinkError(f'Unsupported scheme {parts.scheme!r}.')
+    if not parts.hostname:
+        raise LinkError('The URL has no host.')
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    target = quote(parts.path or '/', safe=SAFE_PATH)
+    if parts.query:
+        target += '?' + quote(parts.query, safe=SAFE_PATH)
+    lines = [
+        f'GET {target} HTTP/1.1',
+        f'Host: {parts.netloc.rpartition("@")[2]}',
+        f'User-Agent: {USER_AGENT}',
+        'Accept: text/html,*/*;q=0.8',
+        'Accept-Encoding: identity',
+        'Connection: close',
+    ]
+    if etag:
+        lines.append(f'If-None-Match: {etag}')
+    if last_modified:
+        lines.append(f'If-Modified-Since: {last_modified}')
+
+    reader, writer = await _connect(parts.hostname, port, https, allow_private)
+    try:
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('ascii'))
+        await writer.drain()
+        status = _status(await reader.readline())
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = b''
+        if status == 200 and 'html' in headers.get('content-type', ''):
+            body = await _read_body(reader, headers)
+        return status, headers, body
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def _status(line):
+    version, _, rest = line.decode('latin-1').partition(' ')
+    code = rest[:3]
+    if not version.startswith('HTTP/') or not code.isdigit():
+        raise LinkError('The server did not answer with HTTP.')
+    return int(code)
+
+
+async def _read_body(reader, headers):
+    # At most MAX_BODY bytes of the body, de-chunked. A chunk is only read
+    # as far as the limit, however big the server says it is.
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = b''
+        while len(body) < MAX_BODY:
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if not size:
+                break
+            wanted = min(size, MAX_BODY - len(body))
+            body += await reader.readexactly(wanted)
+            if wanted < size:
+                break
+            await reader.readline()
+        return body
+    length = headers.get('content-length', '')
+    limit = min(int(length), MAX_BODY) if length.isdigit() else MAX_BODY
+    body = b''
+    while len(body) < limit:
+        data = await reader.read(limit - len(body))
+        if not data:
+            break
+        body += data
+    return body
+
+
+def _title(body, content_type):
+    match = TITLE.search(body) if body else None
+    if match is None:
+        return ''
+    charset = CHARSET.search(content_type)
+    try:
+        text = match.group(1).decode(charset.group(1) if charset else 'utf-8', errors='replace')
+    except LookupError:
+        text = match.group(1).decode('utf-8', errors='replace')
+    return ' '.join(unescape(text).split())[:MAX_TITLE_LENGTH]
@@ -0,0 +1,61 @@
+# In backend/api/loaders.py
+
+from collections import defaultdict
+from django.db.models import Prefetch, prefetch_related_objects
+from .models import *
+
+# The reverse one-to-one names of the detail tables, one per resource type.
+DETAIL_RELATIONS = {
+    'course': 'course_details',
+    'book': 'book_details',
+    'paper': 'paper_details',
+    'web': 'web_details',
+    'pdf': 'pdf_details',
+}
+
+
+def load_resource_details(resources):
+    # Groups the resources by type and fetches each detail table in a single
+    # query. Afterwards obj.book_details etc. are cached on every resource, and
+    # a missing detail row raises DoesNotExist instead of hitting the database.
+    by_type = defaultdict(list)
+    for resource in resources:
+        if resource.resource_type in DETAIL_RELATIONS:
+            by_type[resource.resource_type].append(resource)
+    for resource_type, group in by_type.items():
+        prefetch_related_objects(group, DETAIL_RELATIONS[resource_type])
+    return resources
+
+
+async def aload_resource_details(resources):
+    # The async ORM version of load_resource_details, for the ASGI read path.
+    # It fills the same per-instance caches, so serializing afterwards runs
+    # no queries and is safe inside the event loop.
+    by_type = defaultdict(list)
+    for resource in resources:
+        if resource.resource_type in DETAIL_RELATIONS:
+            by_type[resource.resource_type].append(resource)
+    for resource_type, group in by_type.items():
+        related = getattr(Resource, DETAIL_RELATIONS[resource_type]).related
+        children = {
+            child.resource_id: child
+            async for child in related.related_model.objects.filter(resource_id__in=[r.id for r in group])
+        }
+        for resource in group:
+            related.set_cached_value(resource, children.get(resource.id))
+    return resources
+
+
+def workspace_queryset():
+    # Everything AcademicAreaDetailSerializer touches is fetched up front, so
+    # loading an area costs the same handful of queries however big it is:
+    # one for the area and one per nested list. Resource details are batched
+    # by ResourceListSerializer with one query per resource type.
+    # Every list is in id order, like the fast path (api/fastpath.py).
+    return AcademicArea.objects.prefetch_related(
+        Prefetch('resources', queryset=Resource.objects.order_by('id')),
+        Prefetch('canvas_items', queryset=CanvasItem.objects.select_related('resource').order_by('id')),
+        Prefetch('connections', queryset=ResourceConnection.objects.order_by('id')),
+        Prefetch('tasks', queryset=Task.objects.order_by('id')),
+        Prefetch('notes', queryset=Note.objects.order_by('id')),
+    )
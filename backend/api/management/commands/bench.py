@@ -0,0 +1,355 @@
+# In backend/api/management/commands/bench.py
+
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started
+from django.db import connection, connections, reset_queries, transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from api import urls as api_urls
+from api.cache import area_cache
+from api.models import *
+from api.storage import store_file
+from api.synthetic import seed_area, synthetic_pdf
+
+# Routes whose URL kwargs or query string need values from the seeded data.
+# Anything not listed is requested with just its URL kwargs filled in.
+QUERIES = {
+    'resource-list': lambda s: {'area': s['slug']},
+    'resourceconnection-list': lambda s: {'area': s['slug']},
+    'canvasitem-list': lambda s: {'area': s['slug']},
+    'task-list': lambda s: {'area': s['slug']},
+    'note-list': lambda s: {'area': s['slug']},
+    'async-resource-list': lambda s: {'area': s['slug']},
+    'search': lambda s: {'q': 'graph theory', 'area': s['slug']},
+    'async-search': lambda s: {'q': 'graph theory', 'area': s['slug']},
+    'graph-list': lambda s: {'area': s['slug']},
+    'graph-neighbourhood': lambda s: {'resource': s['resource'], 'depth': 2},
+    'graph-path': lambda s: {'source': s['resource'], 'target': s['last_resource']},
+    'graph-components': lambda s: {'area': s['slug']},
+    'academicarea-changes': lambda s: {'since': 0},
+    'resource-check-duplicates': lambda s: {'title': 'Graph Theory Learning'},
+}
+
+# Routes that cannot be timed request by request.
+SKIPPED_ROUTES = {
+    'async-area-events': 'an endless event stream',
+}
+
+
+def write_scenarios(samples):
+    # (name, method, url, body, content type). Each one runs in a transaction
+    # that is rolled back, so the seeded data stays the same for every run.
+    area, resources = samples['area_id'], samples['resource_ids']
+    positions = [
+        {'id': item_id, 'pos_x': i, 'pos_y': i} for i, item_id in enumerate(samples['canvas_item_ids'][:100])
+    ]
+    bulk = [{'title': f'Bulk {i}', 'resource_type': 'paper', 'authors': 'Bench'} for i in range(100)]
+    return [
+        ('resource-list POST', 'post', reverse('resource-list'),
+         json.dumps({'area': area, 'title': 'Bench book', 'resource_type': 'book', 'authors': 'Bench'}), 'application/json'),
+        ('resource-bulk POST', 'post', f"{reverse('resource-bulk')}?area={area}", json.dumps(bulk), 'application/json'),
+        ('canvasitem-positions POST', 'post', reverse('canvasitem-positions'),
+         json.dumps({'area': area, 'positions': positions}), 'application/json'),
+        ('note-list POST', 'post', reverse('note-list'),
+         json.dumps({'area': area, 'resource': resources[0], 'content': 'Bench note'}), 'application/json'),
+        ('resource-detail PATCH', 'patch', reverse('resource-detail', kwargs={'pk': resources[0]}),
+         json.dumps({'title': 'Renamed'}), 'application/json'),
+    ]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+@contextmanager
+def count_queries():
+    # Like CaptureQueriesContext, but over every alias (reads and writes may
+    # go to different ones, see api/routers.py) and without opening
+    # connections that the request does not use.
+    result = {'count': 0}
+    saved = {}
+    for alias in connections:
+        conn = connections[alias]
+        saved[alias] = conn.force_debug_cursor
+        conn.force_debug_cursor = True
+        conn.queries_log.clear()
+    # The test client's request_started would clear the logs halfway.
+    request_started.disconnect(reset_queries)
+    try:
+        yield result
+    finally:
+        request_started.connect(reset_queries)
+        for alias, force_debug_cursor in saved.items():
+            conn = connections[alias]
+            conn.force_debug_cursor = force_debug_cursor
+            result['count'] += len(conn.queries_log)
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern
+
+
+def read_routes():
+    # Every named GET route of api/urls.py, once (the router registers each
+    # route a second time with a format suffix).
+    routes = {}
+    for pattern in iter_patterns(api_urls.urlpatterns):
+        kwargs = set(pattern.pattern.regex.groupindex)
+        if 'format' in kwargs or pattern.name in routes or pattern.name in SKIPPED_ROUTES:
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if actions is not None and 'get' not in actions:
+            continue
+        if actions is None and view_class is not None and not hasattr(view_class, 'get'):
+            continue
+        routes[pattern.name] = kwargs
+    return routes
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic areas into a throwaway database and measures latency percentiles, '
+        'SQL query counts and payload sizes for every route in api/urls.py. Results are JSON; '
+        'with --baseline the run fails when a route regresses past --threshold.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resources', type=int, default=1000, help='Resources per synthetic area.')
+        parser.add_argument('--areas', type=int, default=1, help='Number of synthetic areas; the first one is measured.')
+        parser.add_argument('--degree', type=int, default=5, help='Outgoing connections per resource.')
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per route.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per route first.')
+        parser.add_argument('--routes', nargs='*', help='Only measure these route names.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='Results file to compare against.')
+        parser.add_argument('--input', help='Compare this results file with --baseline instead of running.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed relative growth of p50/p95 latency and payload size (default 0.25 = 25%%).',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0,
+            help='Latency changes smaller than this are never regressions (timer noise).',
+        )
+        parser.add_argument(
+            '--reference-path', action='store_true',
+            help='Measure the serializers and the stdlib JSON renderer instead of the fast read path '
+                 '(api/fastpath.py); compare the two runs with --baseline.',
+        )
+        parser.add_argument(
+            '--current-db', action='store_true',
+            help='Seed into the configured database instead of a temporary test database.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['input']:
+            with open(options['input']) as f:
+                result = json.load(f)
+        else:
+            result = self.run(options)
+            output = json.dumps(result, indent=2)
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    f.write(output + '\n')
+            else:
+                self.stdout.write(output)
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline, result, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    # --- Running ---
+
+    def run(self, options):
+        # The test client talks to the app in-process as host 'testserver'.
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        overrides = {'ALLOWED_HOSTS': hosts}
+        if options['reference_path']:
+            overrides['FAST_READ_PATH'] = False
+            overrides['REST_FRAMEWORK'] = {
+                **getattr(settings, 'REST_FRAMEWORK', {}),
+                'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+            }
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media, **overrides):
+            if options['current_db']:
+                return self.measure(options)
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+                # A file, not the in-memory default, so timings include real I/O.
+                test_settings['NAME'] = os.path.join(media, 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            # Read connections (see api/routers.py) have to follow onto the bench database.
+            for alias in connections:
+                if connections.settings[alias].get('TEST', {}).get('MIRROR') == connection.alias:
+                    connections[alias].close()
+                    connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+            try:
+                return self.measure(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        started = time.perf_counter()
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        areas = [
+            seed_area(f'bench-{suffix}-{i}', resources=options['resources'], degree=options['degree'], seed=i)
+            for i in range(options['areas'])
+        ]
+        area = areas[0]
+        resource_ids = list(Resource.objects.filter(area=area).order_by('id').values_list('id', flat=True))
+        pdf = PDFResource.objects.filter(resource__area=area).select_related('resource').first()
+        if pdf is not None:
+            # One real stored file, so the file route serves bytes.
+            path = os.path.join(tempfile.mkdtemp(), 'bench.pdf')
+            with open(path, 'wb') as f:
+                f.write(synthetic_pdf([f'Page {i}' for i in range(20)]))
+            pdf.stored_file = store_file(path)
+            pdf.file = pdf.stored_file.file.name
+            pdf.save()
+        samples = {
+            'slug': area.slug,
+            'area_id': area.id,
+            'resource': resource_ids[0],
+            'last_resource': resource_ids[-1],
+            'resource_ids': resource_ids,
+            'canvas_item_ids': list(CanvasItem.objects.filter(area=area).order_by('id').values_list('id', flat=True)),
+            'pks': {
+                'resource': pdf.resource_id if pdf is not None else resource_ids[0],
+                'resourceconnection': ResourceConnection.objects.filter(area=area).values_list('id', flat=True).first(),
+                'canvasitem': CanvasItem.objects.filter(area=area).values_list('id', flat=True).first(),
+                'task': Task.objects.filter(area=area).values_list('id', flat=True).first(),
+                'note': Note.objects.filter(area=area).values_list('id', flat=True).first(),
+                'upload': UploadSession.objects.create(filename='bench.pdf', size=1024).pk,
+            },
+        }
+        return samples, round(time.perf_counter() - started, 3)
+
+    def request(self, client, method, url, body=None, content_type=None):
+        with count_queries() as queries:
+            started = time.perf_counter()
+            if body is None:
+                response = getattr(client, method)(url)
+            else:
+                response = getattr(client, method)(url, body, content_type=content_type)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, queries['count'], size
+
+    def sample(self, client, options, method, url, body=None, content_type=None, before=None, rollback=False):
+        latencies = []
+        for i in range(options['warmup'] + options['repeat']):
+            if before is not None:
+                before()
+            if rollback:
+                with transaction.atomic():
+                    status, elapsed, queries, size = self.request(client, method, url, body, content_type)
+                    transaction.set_rollback(True)
+            else:
+                status, elapsed, queries, size = self.request(client, method, url, body, content_type)
+            if i >= options['warmup']:
+                latencies.append(elapsed)
+        return {
+            'method': method.upper(),
+            'url': url,
+            'status': status,
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'queries': queries,
+            'bytes': size,
+        }
+
+    def measure(self, options):
+        area_cache().clear()
+        samples, seed_seconds = self.seed(options)
+        client = Client()
+        wanted = set(options['routes'] or [])
+        results = {}
+
+        for name, kwargs in sorted(read_routes().items()):
+            if wanted and name not in wanted:
+                continue
+            values = {'slug': samples['slug']}
+            if 'pk' in kwargs:
+                values['pk'] = samples['pks'].get(name.rsplit('-', 1)[0])
+            url = reverse(name, kwargs={k: values[k] for k in kwargs})
+            query = QUERIES.get(name)
+            if query is not None:
+                url += '?' + '&'.join(f'{k}={v}' for k, v in query(samples).items())
+            results[name] = self.sample(client, options, 'get', url)
+            if name == 'academicarea-detail':
+                # The cached path above, and a cache miss on every request.
+                results[f'{name} (uncached)'] = self.sample(client, options, 'get', url, before=area_cache().clear)
+
+        for name, method, url, body, content_type in write_scenarios(samples):
+            if wanted and name not in wanted:
+                continue
+            results[name] = self.sample(client, options, method, url, body, content_type, rollback=True)
+
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'resources': options['resources'],
+                'areas': options['areas'],
+                'degree': options['degree'],
+                'fast_read_path': settings.FAST_READ_PATH,
+                'repeat': options['repeat'],
+                'seed_seconds': seed_seconds,
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'routes': results,
+        }
+
+    # --- Comparing ---
+
+    def compare(self, baseline, result, threshold, min_delta_ms):
+        # Query counts are deterministic, so any increase is a regression.
+        # Latency and size may grow by `threshold` before they count.
+        regressions = []
+        self.stdout.write(f"{'route':40} {'metric':8} {'baseline':>10} {'current':>10} {'change':>8}")
+        for name, base in sorted(baseline['routes'].items()):
+            current = result['routes'].get(name)
+            if current is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'queries', 'bytes'):
+                a, b = base[metric], current[metric]
+                if metric == 'queries':
+                    regressed = b > a
+                elif metric == 'bytes':
+                    regressed = b > a * (1 + threshold)
+                else:
+                    regressed = b > a * (1 + threshold) and b - a > min_delta_ms
+                change = f'{(b - a) / a:+.0%}' if a else '-'
+                line = f'{name:40} {metric:8} {a:>10} {b:>10} {change:>8}'
+                if regressed:
+                    regressions.append((name, metric, a, b))
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+                elif self.verbosity > 1:
+                    self.stdout.write(line)
+        return regressions
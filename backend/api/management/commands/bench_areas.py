@@ -0,0 +1,96 @@
+# In backend/api/management/commands/bench_areas.py
+
+import json
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from api.areas import clone_area, delete_area
+from api.backup import import_area_stream, iter_area_export
+from api.models import *
+from api.synthetic import seed_area
+
+# Times whole-area clone and delete on a synthetic area: the set-based SQL of
+# api/areas.py against what was there before, a backup round trip for the
+# clone and the ORM's cascading delete (collector plus per-row signals) for
+# the delete. Runs on a throwaway database file, like the bench command.
+# --resources 10000 with the default degree is about 100k rows: resources,
+# details, canvas items, notes and tasks at 10k each plus 50k connections.
+
+ROW_MODELS = [Resource, Course, Book, Paper, WebResource, PDFResource, CanvasItem, Note, Task, ResourceConnection]
+
+
+def area_rows(area_id):
+    return sum(
+        model.objects.filter(**({'area_id': area_id} if hasattr(model, 'area') else {'resource__area_id': area_id})).count()
+        for model in ROW_MODELS
+    )
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, round(time.perf_counter() - started, 3)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks cloning and deleting a large area, set-based against the ORM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resources', type=int, default=10_000)
+        parser.add_argument('--degree', type=int, default=5)
+        parser.add_argument('--skip-orm', action='store_true', help="Skip the ORM delete, which is slow on big areas.")
+        parser.add_argument('--current-db', action='store_true', help='Use the configured database instead of a throwaway one.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        if options['current_db']:
+            result = self.measure(options)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                test_settings = connection.settings_dict.setdefault('TEST', {})
+                if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+                    test_settings['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                # Read connections (see api/routers.py) have to follow onto the bench database.
+                for alias in connections:
+                    if connections.settings[alias].get('TEST', {}).get('MIRROR') == connection.alias:
+                        connections[alias].close()
+                        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+                try:
+                    result = self.measure(options)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    def measure(self, options):
+        suffix = str(time.time_ns())
+        source, seed_seconds = timed(seed_area, f'bench-areas-{suffix}', resources=options['resources'], degree=options['degree'])
+        rows = area_rows(source.pk)
+
+        (copy, _), clone_seconds = timed(clone_area, source, f'bench-clone-{suffix}')
+        (restored, _), import_seconds = timed(
+            lambda: import_area_stream(iter_area_export(source), slug=f'bench-restore-{suffix}'),
+        )
+        _, delete_seconds = timed(delete_area, copy.pk)
+        result = {
+            'resources': options['resources'],
+            'rows': rows,
+            'database': connection.vendor,
+            'seed_seconds': seed_seconds,
+            'clone_seconds': clone_seconds,
+            'backup_round_trip_seconds': import_seconds,
+            'delete_seconds': delete_seconds,
+        }
+        if not options['skip_orm']:
+            area = AcademicArea.objects.get(pk=restored.pk)
+            _, result['orm_delete_seconds'] = timed(area.delete)
+        else:
+            delete_area(restored.pk)
+        delete_area(source.pk)
+        return result
@@ -0,0 +1,101 @@
+# In backend/api/management/commands/bench_related.py
+
+import json
+import random
+import statistics
+import time
+from itertools import accumulate
+from django.core.management.base import BaseCommand
+from api.related import RelatedIndex, document_terms, np, top_k
+
+# Measures the related-resource engine (api/related.py) on a synthetic
+# library held in memory: loading the term counts, computing every neighbour
+# list, and the incremental update of a few resources after an edit. The
+# words follow a Zipf distribution over a large vocabulary, like real titles
+# and notes, which is what keeps the postings short. Reading the stored lists
+# is a single indexed query and is covered by the bench command's
+# resource-related route.
+
+
+def zipf_sampler(rng, vocabulary, exponent):
+    words = [f'w{i}' for i in range(vocabulary)]
+    cumulative = list(accumulate(1 / (rank + 1) ** exponent for rank in range(vocabulary)))
+    return lambda count: ' '.join(rng.choices(words, cum_weights=cumulative, k=count))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks building and incrementally updating related-resource lists at library scale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resources', type=int, default=100_000)
+        parser.add_argument('--areas', type=int, default=100)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--note-words', type=int, default=40, help='Words of note text per resource.')
+        parser.add_argument('--updates', type=int, default=200, help='Single-resource updates to time.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = zipf_sampler(rng, options['vocabulary'], 1.07)
+        n, k = options['resources'], top_k()
+
+        started = time.perf_counter()
+        docs = [
+            (i, i % options['areas'], document_terms(words(rng.randint(3, 8)), '', [words(options['note_words'])]))
+            for i in range(n)
+        ]
+        generate_seconds = time.perf_counter() - started
+
+        index = RelatedIndex()
+        started = time.perf_counter()
+        for resource_id, area_id, counts in docs:
+            index.set(resource_id, area_id, counts)
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ids = list(range(n))
+        lists = {}
+        for start in range(0, n, 1000):
+            lists.update(index.neighbours(ids[start:start + 1000], k))
+        build_seconds = time.perf_counter() - started
+
+        # An edit: the resource's counts change, then its list and the lists
+        # that contained it are recomputed, as update_related does.
+        containing = {}
+        for resource_id, best in lists.items():
+            for other, _ in best:
+                containing.setdefault(other, []).append(resource_id)
+        latencies = []
+        for resource_id in rng.sample(ids, min(options['updates'], n)):
+            area_id = docs[resource_id][1]
+            counts = document_terms(words(rng.randint(3, 8)), '', [words(options['note_words'])])
+            started = time.perf_counter()
+            index.set(resource_id, area_id, counts)
+            index.neighbours([resource_id, *containing.get(resource_id, ())], k)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        filled = [len(best) for best in lists.values()]
+        result = {
+            'resources': n,
+            'areas': options['areas'],
+            'vocabulary': options['vocabulary'],
+            'scorer': 'numpy/scipy' if np is not None else 'pure Python',
+            'generate_seconds': round(generate_seconds, 2),
+            'load_seconds': round(load_seconds, 2),
+            'build_seconds': round(build_seconds, 2),
+            'build_per_resource_ms': round(build_seconds * 1000 / n, 3),
+            'mean_neighbours': round(statistics.mean(filled), 2),
+            'update_p50_ms': round(percentile(latencies, 0.5), 2),
+            'update_p95_ms': round(percentile(latencies, 0.95), 2),
+        }
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
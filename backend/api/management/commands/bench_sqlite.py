@@ -0,0 +1,185 @@
+# In backend/api/management/commands/bench_sqlite.py
+
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Compares SQLite as Django configures it out of the box (rollback journal,
+# deferred transactions, a new connection per request) with the tuned
+# settings in settings.DATABASES, under concurrent canvas/note style load:
+# many threads reading an area's canvas, a share of them writing positions
+# and notes, each write bumping the area's version like the API does.
+
+SCHEMA = [
+    'CREATE TABLE area (id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE canvas_item (id INTEGER PRIMARY KEY, area_id INTEGER NOT NULL, pos_x INTEGER, pos_y INTEGER)',
+    'CREATE INDEX canvas_item_area ON canvas_item (area_id, id)',
+    'CREATE TABLE note (id INTEGER PRIMARY KEY, area_id INTEGER NOT NULL, content TEXT NOT NULL)',
+    'CREATE INDEX note_area ON note (area_id, id)',
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Mode:
+    def __init__(self, name, pragmas, begin, persistent, read_pragmas=()):
+        self.name = name
+        self.pragmas = pragmas
+        self.begin = begin
+        self.persistent = persistent
+        self.read_pragmas = read_pragmas
+
+    def connect(self, path, pragmas):
+        # Autocommit mode with explicit BEGIN, the way Django drives sqlite3.
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for pragma in pragmas:
+            conn.execute(pragma)
+        return conn
+
+
+def modes():
+    tuned = settings.SQLITE_PRAGMAS
+    return [
+        Mode('django-default', [], 'BEGIN', persistent=False),
+        Mode('production', tuned, 'BEGIN IMMEDIATE', persistent=True, read_pragmas=tuned[1:] + ['PRAGMA query_only = ON']),
+    ]
+
+
+def seed(path, areas, items):
+    conn = sqlite3.connect(path, isolation_level=None)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.execute('BEGIN')
+    conn.executemany('INSERT INTO area (id) VALUES (?)', [(a,) for a in range(1, areas + 1)])
+    conn.executemany(
+        'INSERT INTO canvas_item (area_id, pos_x, pos_y) VALUES (?, 0, 0)',
+        [(a,) for a in range(1, areas + 1) for _ in range(items)],
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def worker(mode, path, args, deadline, stats, seed_value):
+    rng = random.Random(seed_value)
+    writer = reader = None
+    while time.perf_counter() < deadline:
+        area = rng.randint(1, args['areas'])
+        is_write = rng.random() < args['write_ratio']
+        started = time.perf_counter()
+        try:
+            if not mode.persistent or writer is None:
+                # A request either reuses the thread's connections or opens new ones.
+                writer = mode.connect(path, mode.pragmas)
+                reader = mode.connect(path, mode.read_pragmas) if mode.read_pragmas else writer
+            if is_write:
+                writer.execute(mode.begin)
+                try:
+                    rows = writer.execute('SELECT id FROM canvas_item WHERE area_id = ? LIMIT 20', (area,)).fetchall()
+                    writer.executemany(
+                        'UPDATE canvas_item SET pos_x = ?, pos_y = ? WHERE id = ?',
+                        [(rng.randint(0, 4000), rng.randint(0, 4000), row[0]) for row in rows],
+                    )
+                    writer.execute('INSERT INTO note (area_id, content) VALUES (?, ?)', (area, 'x' * 200))
+                    writer.execute('UPDATE area SET version = version + 1 WHERE id = ?', (area,))
+                    writer.execute('COMMIT')
+                except Exception:
+                    writer.execute('ROLLBACK')
+                    raise
+            else:
+                reader.execute('SELECT version FROM area WHERE id = ?', (area,)).fetchone()
+                reader.execute('SELECT id, pos_x, pos_y FROM canvas_item WHERE area_id = ?', (area,)).fetchall()
+                reader.execute('SELECT id, content FROM note WHERE area_id = ? ORDER BY id DESC LIMIT 50', (area,)).fetchall()
+        except sqlite3.OperationalError:
+            stats['errors'] += 1
+        else:
+            stats['writes' if is_write else 'reads'].append(time.perf_counter() - started)
+        finally:
+            if not mode.persistent and writer is not None:
+                if reader is not writer:
+                    reader.close()
+                writer.close()
+                writer = reader = None
+    if writer is not None:
+        if reader is not writer:
+            reader.close()
+        writer.close()
+
+
+def run_mode(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        seed(path, args['areas'], args['items'])
+        if mode.persistent:
+            # journal_mode is stored in the file, set it before the threads start.
+            conn = mode.connect(path, mode.pragmas)
+            conn.close()
+        per_thread = [{'reads': [], 'writes': [], 'errors': 0} for _ in range(args['threads'])]
+        deadline = time.perf_counter() + args['duration']
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(mode, path, args, deadline, per_thread[i], i))
+            for i in range(args['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    reads = [t for stats in per_thread for t in stats['reads']]
+    writes = [t for stats in per_thread for t in stats['writes']]
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'mode': mode.name,
+        'operations': len(reads) + len(writes),
+        'throughput_ops': round((len(reads) + len(writes)) / elapsed, 1),
+        'write_throughput_ops': round(len(writes) / elapsed, 1),
+        'errors': sum(stats['errors'] for stats in per_thread),
+        'read_ms': {'mean': ms(statistics.fmean(reads)) if reads else None, 'p95': ms(percentile(reads, 0.95))},
+        'write_ms': {'mean': ms(statistics.fmean(writes)) if writes else None, 'p95': ms(percentile(writes, 0.95))},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrency benchmark for the SQLite settings: runs the same mixed read/write load '
+        'against Django\'s default SQLite setup and against the tuned one from settings.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per mode.')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of operations that write.')
+        parser.add_argument('--areas', type=int, default=20)
+        parser.add_argument('--items', type=int, default=200, help='Canvas items per area.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        results = [run_mode(mode, options) for mode in modes()]
+        baseline, tuned = results
+        summary = {
+            'threads': options['threads'],
+            'write_ratio': options['write_ratio'],
+            'results': results,
+            'speedup': round(tuned['throughput_ops'] / baseline['throughput_ops'], 2) if baseline['throughput_ops'] else None,
+        }
+        output = json.dumps(summary, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
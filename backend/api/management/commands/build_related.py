@@ -0,0 +1,20 @@
+# In backend/api/management/commands/build_related.py
+
+import time
+from django.core.management.base import BaseCommand
+from api.related import np, rebuild_related
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the related-resource lists of the whole library. Writes keep them current '
+        'incrementally (the update_related job); run this after large imports or periodically.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_related()
+        scorer = 'numpy/scipy' if np is not None else 'pure Python'
+        self.stdout.write(self.style.SUCCESS(
+            f'Related lists for {count} resources in {time.perf_counter() - started:.1f}s ({scorer}).'
+        ))
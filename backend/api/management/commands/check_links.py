@@ -0,0 +1,52 @@
+# In backend/api/management/commands/check_links.py
+
+from django.core.management.base import BaseCommand, CommandError
+from api.jobs import JOB_TYPES, enqueue
+from api.models import AcademicArea, Job
+
+
+class Command(BaseCommand):
+    help = 'Checks the URLs of courses, books and web resources, now or as a recurring background job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--area', help='Only check the links of the area with this slug.')
+        parser.add_argument(
+            '--stale-hours', type=float, default=None,
+            help='Recheck URLs last checked longer ago than this (default: settings.LINK_CHECK_STALE_HOURS).',
+        )
+        parser.add_argument('--concurrency', type=int, default=None, help='Probes in flight at once.')
+        parser.add_argument('--per-host', type=int, default=None, help='Probes in flight against one host.')
+        parser.add_argument('--timeout', type=float, default=None, help='Seconds per URL, redirects included.')
+        parser.add_argument(
+            '--every', type=float, default=None, metavar='HOURS',
+            help='Instead of checking now, queue a check_links job that repeats every HOURS (run_jobs runs it).',
+        )
+
+    def handle(self, *args, **options):
+        payload = {
+            key: options[option] for key, option in [
+                ('stale_hours', 'stale_hours'), ('concurrency', 'concurrency'),
+                ('per_host', 'per_host'), ('timeout', 'timeout'),
+            ] if options[option] is not None
+        }
+        if options['area']:
+            try:
+                payload['area'] = AcademicArea.objects.get(slug=options['area']).pk
+            except AcademicArea.DoesNotExist:
+                raise CommandError(f"No area with slug {options['area']!r}.")
+
+        if options['every'] is not None:
+            if Job.objects.filter(kind='check_links', status__in=['pending', 'running']).exists():
+                raise CommandError('A check_links job is already queued.')
+            payload['every_hours'] = options['every']
+            job = enqueue('check_links', payload)
+            self.stdout.write(self.style.SUCCESS(f"Queued check_links job {job.pk}, repeating every {options['every']:g} hours."))
+            return
+
+        job_type = JOB_TYPES['check_links']
+        results = job_type.work(job_type.prepare(payload))
+        job_type.finish(payload, results)
+        broken = [probe for probe in results if probe['status'] is None or probe['status'] >= 400]
+        for probe in broken:
+            self.stdout.write(f"{probe['url']}: {probe['status'] or probe['error']}")
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(results)} links, {len(broken)} broken.'))
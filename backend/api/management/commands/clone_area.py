@@ -0,0 +1,25 @@
+# In backend/api/management/commands/clone_area.py
+
+from django.core.management.base import BaseCommand, CommandError
+from api.areas import AreaError, clone_area
+from api.models import AcademicArea
+
+
+class Command(BaseCommand):
+    help = 'Copies an area with everything in it into a new area, e.g. to use it as a template.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', help='The area to copy.')
+        parser.add_argument('new_slug', help='Slug for the copy.')
+        parser.add_argument('--name', help='Name for the copy (defaults to the original name).')
+
+    def handle(self, *args, **options):
+        source = AcademicArea.objects.filter(slug=options['slug'], deleting=False).first()
+        if source is None:
+            raise CommandError(f"No area with slug '{options['slug']}'.")
+        try:
+            area, counts = clone_area(source, options['new_slug'], name=options['name'])
+        except AreaError as e:
+            raise CommandError(str(e))
+        summary = ', '.join(f'{count} {kind}s' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Copied '{source.slug}' to '{area.slug}': {summary}."))
@@ -0,0 +1,22 @@
+# In backend/api/management/commands/compact_changes.py
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from api.changes import compact_change_log
+
+
+class Command(BaseCommand):
+    help = 'Compacts the change log behind the delta sync endpoint; run it periodically (e.g. from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=None,
+            help='Drop entries older than this (default: settings.CHANGE_LOG_RETENTION_DAYS).',
+        )
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] is not None else None
+        counts = compact_change_log(retention)
+        self.stdout.write(self.style.SUCCESS(
+            f"Dropped {counts['superseded']} superseded and {counts['expired']} expired change log entries."
+        ))
@@ -0,0 +1,25 @@
+# In backend/api/management/commands/delete_area.py
+
+from django.core.management.base import BaseCommand, CommandError
+from api.areas import delete_area, delete_area_later
+from api.models import AcademicArea
+
+
+class Command(BaseCommand):
+    help = 'Deletes an area with everything in it, table by table (see api/areas.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug')
+        parser.add_argument('--background', action='store_true', help='Queue a delete_area job instead (run_jobs runs it).')
+
+    def handle(self, *args, **options):
+        area = AcademicArea.objects.filter(slug=options['slug']).first()
+        if area is None:
+            raise CommandError(f"No area with slug '{options['slug']}'.")
+        if options['background']:
+            job = delete_area_later(area)
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk} to delete '{area.slug}'."))
+            return
+        counts = delete_area(area.pk) or {}
+        summary = ', '.join(f'{count} {kind}s' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Deleted '{area.slug}': {summary}."))
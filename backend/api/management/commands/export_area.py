@@ -0,0 +1,28 @@
+# In backend/api/management/commands/export_area.py
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from api.backup import iter_area_export
+from api.models import AcademicArea
+
+
+class Command(BaseCommand):
+    help = 'Streams an area with all of its contents to an NDJSON backup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug')
+        parser.add_argument('-o', '--output', help='Output file (defaults to stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            area = AcademicArea.objects.get(slug=options['slug'])
+        except AcademicArea.DoesNotExist:
+            raise CommandError(f"Area '{options['slug']}' does not exist.")
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for line in iter_area_export(area):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,41 @@
+# In backend/api/management/commands/find_duplicates.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.duplicates import duplicate_clusters, rebuild_fingerprints
+from api.models import AcademicArea, Resource
+
+
+class Command(BaseCommand):
+    help = 'Lists groups of near-duplicate resources across the library (or one area).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--area', help='Only look inside the area with this slug.')
+        parser.add_argument(
+            '--threshold', type=float, default=None,
+            help='Minimum estimated similarity, 0-1 (default: settings.DUPLICATE_THRESHOLD).',
+        )
+        parser.add_argument('--rebuild', action='store_true', help='First recompute every fingerprint.')
+
+    def handle(self, *args, **options):
+        area_id = None
+        if options['area']:
+            try:
+                area_id = AcademicArea.objects.get(slug=options['area']).pk
+            except AcademicArea.DoesNotExist:
+                raise CommandError(f"No area with slug {options['area']!r}.")
+        if options['rebuild']:
+            with transaction.atomic():
+                rebuild_fingerprints()
+
+        clusters = duplicate_clusters(area_id, threshold=options['threshold'])
+
+        rows = Resource.objects.filter(id__in=[pk for cluster in clusters for pk in cluster])
+        rows = {row['id']: row for row in rows.values('id', 'title', 'resource_type', 'area__slug')}
+        for cluster in clusters:
+            self.stdout.write(f'{len(cluster)} resources:')
+            for pk in cluster:
+                row = rows[pk]
+                self.stdout.write(f"  {pk} [{row['area__slug']}] ({row['resource_type']}) {row['title']}")
+        total = sum(len(cluster) for cluster in clusters)
+        self.stdout.write(self.style.SUCCESS(f'Found {len(clusters)} groups of duplicates ({total} resources).'))
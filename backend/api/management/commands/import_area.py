@@ -0,0 +1,28 @@
+# In backend/api/management/commands/import_area.py
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from api.backup import BackupError, import_area_stream
+
+
+class Command(BaseCommand):
+    help = 'Restores an NDJSON area backup (see export_area) into a new area.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Backup file, or '-' for stdin.")
+        parser.add_argument('--slug', help='Slug for the restored area (defaults to the one in the backup).')
+        parser.add_argument('--name', help='Name for the restored area.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            area, counts = import_area_stream(stream, slug=options['slug'], name=options['name'])
+        except BackupError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        summary = ', '.join(f'{count} {kind}s' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Restored '{area.slug}': {summary}."))
@@ -0,0 +1,40 @@
+# In backend/api/management/commands/import_resources.py
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from api.ingest import DEFAULT_BATCH_SIZE, PARSERS, guess_format, ingest_resources
+from api.models import AcademicArea
+
+
+class Command(BaseCommand):
+    help = 'Streams resources from a CSV, JSON Lines or BibTeX file into an area.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--area', required=True, help='Slug of the target area.')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Input format (guessed from the file name by default).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            area = AcademicArea.objects.get(slug=options['area'])
+        except AcademicArea.DoesNotExist:
+            raise CommandError(f"Area '{options['area']}' does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if fmt is None:
+            raise CommandError('Could not guess the format, pass --format.')
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = ingest_resources(PARSERS[fmt](stream), area, batch_size=options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} resources into '{area.slug}' ({report['failed']} failed)."
+        ))
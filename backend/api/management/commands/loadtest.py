@@ -0,0 +1,140 @@
+# In backend/api/management/commands/loadtest.py
+
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def read_response(reader):
+    # Minimal HTTP/1.1 response reader: status line, headers, and a body that
+    # is either Content-Length delimited or chunked.
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server.')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    size = 0
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(chunk_size + 2)
+            size += chunk_size
+            if chunk_size == 0:
+                break
+    elif 'content-length' in headers:
+        size = int(headers['content-length'])
+        await reader.readexactly(size)
+    return status, size, headers.get('connection', '').lower() == 'close'
+
+
+async def worker(url, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n'
+        f'Connection: keep-alive\r\n\r\n'
+    ).encode()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _, close = await read_response(reader)
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(url, deadline, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives a running server with many concurrent keep-alive connections and reports '
+        'throughput and latency percentiles. Run it once against the WSGI deployment and '
+        'once against the ASGI one (backend/asgi.py, e.g. uvicorn) and pass both result '
+        'files to --compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', help='URL to request, e.g. http://127.0.0.1:8000/api/async/areas/demo/')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run.')
+        parser.add_argument('--label', default='', help='Name stored with the results, e.g. "wsgi" or "asgi".')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'), help='Compare two result files.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'])
+        if not options['url'] or not options['url'].startswith('http://'):
+            raise CommandError('Pass an http:// URL to load test.')
+        result = asyncio.run(run(options['url'], options['concurrency'], options['duration']))
+        result['label'] = options['label']
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    def compare(self, baseline_path, candidate_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        with open(candidate_path) as f:
+            candidate = json.load(f)
+        rows = [('throughput_rps', baseline['throughput_rps'], candidate['throughput_rps'])]
+        rows += [(f'latency {k} (ms)', baseline['latency_ms'][k], candidate['latency_ms'][k]) for k in ('p50', 'p95', 'p99')]
+        self.stdout.write(f"{'':20} {baseline.get('label') or 'baseline':>12} {candidate.get('label') or 'candidate':>12} {'ratio':>8}")
+        for name, a, b in rows:
+            ratio = f'{b / a:.2f}x' if a and b else '-'
+            self.stdout.write(f'{name:20} {a!s:>12} {b!s:>12} {ratio:>8}')
@@ -0,0 +1,48 @@
+# In backend/api/management/commands/run_jobs.py
+
+import os
+from django.core.management.base import BaseCommand
+from api.jobs import JobRunner, enqueue
+from api.models import Job, StoredFile
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs (PDF text extraction, ...) from the job table on a local process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Pool processes (default: one per CPU). 0 runs jobs inline in this process.',
+        )
+        parser.add_argument(
+            '--max-in-flight', type=int, default=None,
+            help='Jobs claimed at once (default: twice the number of workers).',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--once', action='store_true', help='Exit once no runnable job is left.')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Exit after this many jobs.')
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='First queue text extraction for stored PDFs that have none yet.',
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            queued = set(
+                Job.objects.filter(kind='extract_pdf', status__in=['pending', 'running'])
+                .values_list('payload__stored_file', flat=True)
+            )
+            missing = StoredFile.objects.filter(extracted_text__isnull=True).values_list('id', flat=True)
+            for stored_file_id in missing.iterator():
+                if stored_file_id not in queued:
+                    enqueue('extract_pdf', {'stored_file': stored_file_id})
+        runner = JobRunner(
+            options['workers'], max_in_flight=options['max_in_flight'],
+            poll_interval=options['poll_interval'], stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        try:
+            counts = runner.run(once=options['once'], max_jobs=options['max_jobs'])
+        except KeyboardInterrupt:
+            counts = runner.counts
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Jobs: {summary}.'))
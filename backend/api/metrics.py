@@ -0,0 +1,254 @@
+# In backend/api/metrics.py
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, JsonResponse
+
+# Per-request timings: SQL (count and time, via a database execute wrapper),
+# serialization (the outermost to_representation, see TimedRepresentationMixin),
+# rendering and total. They are sent back as a Server-Timing header, slow
+# requests are logged to 'api.performance' with their worst statements, and
+# every request lands in per-view histograms served by metrics_view.
+#
+# Recording a query is one ContextVar lookup and two perf_counter calls, so
+# this is meant to stay on in production. Histograms are per process.
+
+logger = logging.getLogger('api.performance')
+
+_current = ContextVar('request_timer', default=None)
+
+# Upper bounds in milliseconds; the last bucket catches everything slower.
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOWEST_QUERIES = 5
+MAX_SQL_LENGTH = 1000
+# Long IN (%s, %s, ...) lists are shortened in the slow log.
+PLACEHOLDERS = re.compile(r'(?:%s, ){3,}%s')
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.depth = 0
+        # Min-heap of (duration, sql), so the smallest of the worst is cheap to replace.
+        self.slowest = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db += duration
+        if len(self.slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, (duration, sql))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, sql))
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        return {
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.db * 1000, 2),
+            'serialize_ms': round(self.serialize * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'queries': self.queries,
+        }
+
+
+@contextmanager
+def timed_serialization():
+    # Nested serializers run inside their parent, so only the outermost one counts.
+    timer = _current.get()
+    if timer is None or timer.depth:
+        yield
+        return
+    timer.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.serialize += time.perf_counter() - started
+        timer.depth -= 1
+
+
+def query_timer(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # Receiver of connection_created, see api/signals.py. The wrapper stays on
+    # the connection object, which Django reuses when it reconnects.
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+class Histograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, key, summary):
+        total = summary['total_ms']
+        with self.lock:
+            view = self.views.get(key)
+            if view is None:
+                view = self.views[key] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'db_ms': 0.0, 'serialize_ms': 0.0,
+                    'render_ms': 0.0, 'queries': 0, 'max_ms': 0.0, 'buckets': [0] * (len(BUCKETS) + 1),
+                }
+            view['count'] += 1
+            view['errors'] += summary['status'] >= 500
+            for field in ('total_ms', 'db_ms', 'serialize_ms', 'render_ms', 'queries'):
+                view[field] += summary[field]
+            view['max_ms'] = max(view['max_ms'], total)
+            for i, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    break
+            else:
+                i = len(BUCKETS)
+            view['buckets'][i] += 1
+
+    def snapshot(self):
+        with self.lock:
+            views = {key: dict(view, buckets=list(view['buckets'])) for key, view in self.views.items()}
+        result = {}
+        for key, view in sorted(views.items()):
+            count = view['count']
+            result[key] = {
+                'count': count,
+                'errors': view['errors'],
+                'mean_ms': round(view['total_ms'] / count, 2),
+                'mean_db_ms': round(view['db_ms'] / count, 2),
+                'mean_serialize_ms': round(view['serialize_ms'] / count, 2),
+                'mean_render_ms': round(view['render_ms'] / count, 2),
+                'mean_queries': round(view['queries'] / count, 2),
+                'max_ms': round(view['max_ms'], 2),
+                'p50_ms': self.quantile(view['buckets'], count, 0.50),
+                'p95_ms': self.quantile(view['buckets'], count, 0.95),
+                'p99_ms': self.quantile(view['buckets'], count, 0.99),
+                'buckets': {
+                    **{f'le_{bound}': n for bound, n in zip(BUCKETS, view['buckets'])},
+                    'le_inf': view['buckets'][-1],
+                },
+            }
+        return result
+
+    @staticmethod
+    def quantile(buckets, count, fraction):
+        # The upper bound of the bucket holding the quantile (None beyond the last).
+        seen = 0
+        for bound, n in zip(BUCKETS + (None,), buckets):
+            seen += n
+            if seen >= fraction * count:
+                return bound
+        return None
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+_histograms = Histograms()
+
+
+def histograms():
+    return _histograms
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request and reports it (see the top of this module). Place it
+    first in MIDDLEWARE so the total covers the other middleware too. For
+    streaming responses the total ends when the body starts streaming.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        timer = _current.get()
+        if timer is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timer.render += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timer):
+        summary = timer.summary()
+        summary['status'] = response.status_code
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        histograms().record(f'{request.method} {view}', summary)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries"',
+                f'serialize;dur={summary["serialize_ms"]}',
+                f'render;dur={summary["render_ms"]}',
+                f'total;dur={summary["total_ms"]}',
+            ])
+        if summary['total_ms'] >= getattr(settings, 'SLOW_REQUEST_MS', 500):
+            slowest = sorted(timer.slowest, reverse=True)
+            logger.warning('slow request %s', json.dumps({
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': view,
+                **summary,
+                'slowest_queries': [
+                    {'ms': round(duration * 1000, 2), 'sql': PLACEHOLDERS.sub('%s, ..., %s', sql)[:MAX_SQL_LENGTH]} for duration, sql in slowest
+                ],
+            }))
+        return response
+
+
+def metrics_view(request):
+    # GET /api/internal/metrics/ -- per-view timings of this process. Only
+    # answered for METRICS_ALLOWED_IPS (or in DEBUG); anyone else gets a 404.
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if not settings.DEBUG and request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    return JsonResponse({'pid': os.getpid(), 'buckets_ms': BUCKETS, 'views': histograms().snapshot()})
+
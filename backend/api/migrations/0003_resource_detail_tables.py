@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_academicarea_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='book_details', serialize=False, to='api.resource')),
+                ('authors', models.CharField(blank=True, max_length=500, null=True)),
+                ('url', models.URLField(blank=True, max_length=500, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='course_details', serialize=False, to='api.resource')),
+                ('lecturer', models.CharField(blank=True, max_length=200, null=True)),
+                ('website', models.URLField(blank=True, max_length=500, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Paper',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='paper_details', serialize=False, to='api.resource')),
+                ('authors', models.CharField(blank=True, max_length=500, null=True)),
+                ('publication_year', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PDFResource',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pdf_details', serialize=False, to='api.resource')),
+                ('file', models.FileField(blank=True, null=True, upload_to='uploads/')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WebResource',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='web_details', serialize=False, to='api.resource')),
+                ('url', models.URLField(blank=True, max_length=500, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='resource',
+            name='authors',
+        ),
+        migrations.RemoveField(
+            model_name='resource',
+            name='content',
+        ),
+        migrations.RemoveField(
+            model_name='resource',
+            name='file',
+        ),
+        migrations.RemoveField(
+            model_name='resource',
+            name='publication_year',
+        ),
+        migrations.RemoveField(
+            model_name='resource',
+            name='url',
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='resource_type',
+            field=models.CharField(choices=[('course', 'Course'), ('book', 'Book'), ('paper', 'Paper'), ('web', 'Web Resource'), ('pdf', 'PDF Resource')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='Note',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='api.academicarea')),
+                ('resource', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notes', to='api.resource')),
+            ],
+        ),
+    ]
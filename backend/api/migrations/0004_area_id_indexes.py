@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_resource_detail_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='canvasitem',
+            index=models.Index(fields=['area', 'id'], name='canvasitem_area_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['area', 'id'], name='note_area_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['area', 'id'], name='resource_area_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resourceconnection',
+            index=models.Index(fields=['area', 'id'], name='connection_area_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['area', 'id'], name='task_area_id_idx'),
+        ),
+    ]
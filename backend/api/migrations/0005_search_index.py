@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # The FTS5 index only exists on SQLite, other databases use the
+    # DatabaseSearchBackend and need no table.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS api_search_index USING fts5("
+        "area_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Index what is already there, see SQLiteFTSBackend for the rowid scheme.
+    schema_editor.execute(
+        "INSERT INTO api_search_index (rowid, area_id, title, body) "
+        "SELECT r.id * 2, r.area_id, r.title, COALESCE(b.authors, p.authors, '') FROM api_resource r "
+        "LEFT JOIN api_book b ON b.resource_id = r.id LEFT JOIN api_paper p ON p.resource_id = r.id"
+    )
+    schema_editor.execute(
+        "INSERT INTO api_search_index (rowid, area_id, title, body) "
+        "SELECT n.id * 2 + 1, n.area_id, '', n.content FROM api_note n"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_area_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
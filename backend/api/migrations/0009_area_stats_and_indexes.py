@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_areas(apps, schema_editor):
+    # From here on api/stats.py keeps the counters current.
+    AcademicArea = apps.get_model('api', 'AcademicArea')
+    AreaStats = apps.get_model('api', 'AreaStats')
+    models_by_counter = {
+        'resource_count': apps.get_model('api', 'Resource'),
+        'note_count': apps.get_model('api', 'Note'),
+        'task_count': apps.get_model('api', 'Task'),
+        'connection_count': apps.get_model('api', 'ResourceConnection'),
+    }
+    stats = {area_id: AreaStats(area_id=area_id) for area_id in AcademicArea.objects.values_list('id', flat=True)}
+    for counter, model in models_by_counter.items():
+        for row in model.objects.values('area_id').annotate(n=Count('id')):
+            setattr(stats[row['area_id']], counter, row['n'])
+    Task = models_by_counter['task_count']
+    for row in Task.objects.filter(is_completed=False).values('area_id').annotate(n=Count('id')):
+        stats[row['area_id']].open_task_count = row['n']
+    AreaStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_pdf_text_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaStats',
+            fields=[
+                ('area', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.academicarea')),
+                ('resource_count', models.PositiveIntegerField(default=0)),
+                ('note_count', models.PositiveIntegerField(default=0)),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('open_task_count', models.PositiveIntegerField(default=0)),
+                ('connection_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_areas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['area', 'updated_at'], name='note_area_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['area', 'resource_type', 'id'], name='resource_area_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['area', 'is_completed', 'id'], name='task_area_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_area_stats_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicarea',
+            name='change_horizon',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('resource', 'Resource'), ('canvas_item', 'Canvas item'), ('connection', 'Connection'), ('task', 'Task'), ('note', 'Note')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_log', to='api.academicarea')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['area', 'id'], name='changelog_area_id_idx'), models.Index(fields=['created_at'], name='changelog_created_idx')],
+            },
+        ),
+    ]
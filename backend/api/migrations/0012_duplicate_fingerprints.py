@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fingerprint_existing_resources(apps, schema_editor):
+    # Same as api.duplicates.index_fingerprints, on the historical models.
+    from api.duplicates import buckets, pack, signature
+    Resource = apps.get_model('api', 'Resource')
+    ResourceFingerprint = apps.get_model('api', 'ResourceFingerprint')
+    FingerprintBand = apps.get_model('api', 'FingerprintBand')
+    rows = Resource.objects.order_by('id').values_list('id', 'title', 'book_details__authors', 'paper_details__authors')
+    fingerprints, bands = [], []
+    for pk, title, book_authors, paper_authors in rows.iterator():
+        sig = signature(title, book_authors or paper_authors or '')
+        if sig is None:
+            continue
+        fingerprints.append(ResourceFingerprint(resource_id=pk, signature=pack(sig)))
+        bands += [FingerprintBand(resource_id=pk, bucket=bucket) for bucket in buckets(sig)]
+        if len(fingerprints) >= 500:
+            ResourceFingerprint.objects.bulk_create(fingerprints)
+            FingerprintBand.objects.bulk_create(bands)
+            fingerprints, bands = [], []
+    ResourceFingerprint.objects.bulk_create(fingerprints)
+    FingerprintBand.objects.bulk_create(bands)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_link_checks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceFingerprint',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='api.resource')),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_bands', to='api.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='fingerprint_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(fingerprint_existing_resources, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_note_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicarea',
+            name='deleting',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
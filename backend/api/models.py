@@ -1,13 +1,42 @@
 # In backend/api/models.py
 
+import uuid
 from django.db import models
+from django.utils import timezone
 
 class AcademicArea(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField(blank=True, null=True)
+    # Bumped on every write inside the area, see api/cache.py.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Change log entries up to this sequence number were compacted away, see api/changes.py.
+    change_horizon = models.PositiveBigIntegerField(default=0, editable=False)
+    # Set while a delete_area job is queued for the area, see api/areas.py.
+    deleting = models.BooleanField(default=False, editable=False)
     def __str__(self): return self.name
 
+    # Only ever moved by atomic UPDATEs, never by saving the model.
+    SERVER_FIELDS = ('version', 'change_horizon', 'deleting')
+
+    def save(self, *args, **kwargs):
+        # A stale in-memory copy must never write old server-maintained values back.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.SERVER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+class AreaStats(models.Model):
+    # Denormalized per-area counts for the library overview, kept current by
+    # api/stats.py so listing areas never has to count their contents.
+    area = models.OneToOneField(AcademicArea, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    resource_count = models.PositiveIntegerField(default=0)
+    note_count = models.PositiveIntegerField(default=0)
+    task_count = models.PositiveIntegerField(default=0)
+    open_task_count = models.PositiveIntegerField(default=0)
+    connection_count = models.PositiveIntegerField(default=0)
+
 class Resource(models.Model):
     RESOURCE_TYPES = [
         ('course', 'Course'), ('book', 'Book'), ('paper', 'Paper'),
@@ -18,15 +47,28 @@ class Resource(models.Model):
     resource_type = models.CharField(max_length=10, choices=RESOURCE_TYPES)
     def __str__(self): return self.title
 
+    class Meta:
+        # Area-scoped lists are paged by id, see IdCursorPagination, and can
+        # be narrowed to one type (?resource_type=).
+        indexes = [
+            models.Index(fields=['area', 'id'], name='resource_area_id_idx'),
+            models.Index(fields=['area', 'resource_type', 'id'], name='resource_area_type_idx'),
+        ]
+
 class Course(models.Model):
     resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='course_details')
     lecturer = models.CharField(max_length=200, blank=True, null=True)
     website = models.URLField(max_length=500, blank=True, null=True)
+    # Copied from the LinkCheck of the website by the check_links job.
+    link_status = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    link_checked_at = models.DateTimeField(blank=True, null=True, editable=False)
 
 class Book(models.Model):
     resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='book_details')
     authors = models.CharField(max_length=500, blank=True, null=True)
     url = models.URLField(max_length=500, blank=True, null=True)
+    link_status = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    link_checked_at = models.DateTimeField(blank=True, null=True, editable=False)
 
 class Paper(models.Model):
     resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='paper_details')
@@ -36,32 +78,172 @@ class Paper(models.Model):
 class WebResource(models.Model):
     resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='web_details')
     url = models.URLField(max_length=500, blank=True, null=True)
+    link_status = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    link_checked_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+class LinkCheck(models.Model):
+    # The last probe of one URL (api/links.py), shared by every resource
+    # linking to it. status is the HTTP status after redirects, or null when
+    # the URL gave no answer (see error). The validators make the next probe
+    # conditional.
+    url = models.URLField(max_length=500, unique=True)
+    status = models.PositiveSmallIntegerField(blank=True, null=True)
+    error = models.CharField(max_length=300, blank=True, default='')
+    final_url = models.URLField(max_length=2000, blank=True, default='')
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    title = models.CharField(max_length=300, blank=True, default='')
+    etag = models.CharField(max_length=200, blank=True, default='')
+    last_modified = models.CharField(max_length=100, blank=True, default='')
+    checked_at = models.DateTimeField()
+
+class ResourceFingerprint(models.Model):
+    # MinHash signature of the normalized title and authors, see api/duplicates.py.
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    signature = models.BinaryField()
+
+class FingerprintBand(models.Model):
+    # One LSH bucket of a resource's signature. Resources sharing a bucket are
+    # duplicate candidates; the bucket index makes finding them a lookup.
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='fingerprint_bands')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['bucket'], name='fingerprint_bucket_idx')]
+
+class ResourceTerms(models.Model):
+    # Term counts of a resource's title, authors and notes, the input of the
+    # related-resource vectors (api/related.py).
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='terms')
+    area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='+')
+    terms = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+class RelatedResource(models.Model):
+    # One precomputed neighbour of a resource, from another area.
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='related_resources')
+    related = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+class StaleRelatedResource(models.Model):
+    # Resources whose related list the update_related job has to redo. A
+    # plain id, so marks survive the resource being deleted.
+    resource_id = models.BigIntegerField(primary_key=True)
+
+class StoredFile(models.Model):
+    # One row per distinct file content, see api/storage.py.
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    file = models.FileField(upload_to='blobs/')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Filled in by the extract_pdf background job, see api/jobs.py.
+    page_count = models.PositiveIntegerField(blank=True, null=True)
+
+class ExtractedText(models.Model):
+    # Kept apart from StoredFile so that serving or listing files never loads it.
+    stored_file = models.OneToOneField(StoredFile, on_delete=models.CASCADE, primary_key=True, related_name='extracted_text')
+    text = models.TextField(blank=True, default='')
+    extracted_at = models.DateTimeField(auto_now=True)
+
+class UploadSession(models.Model):
+    # A resumable, chunked upload in progress.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
 class PDFResource(models.Model):
     resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='pdf_details')
     file = models.FileField(upload_to='uploads/', blank=True, null=True)
+    # Set for PDFs kept in the content-addressed store; file then points at the blob.
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.PROTECT, blank=True, null=True, related_name='pdf_resources')
+    # Copied from stored_file once its text is extracted, so the detail payload needs no join.
+    page_count = models.PositiveIntegerField(blank=True, null=True)
 
 class Note(models.Model):
     area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='notes')
     resource = models.ForeignKey(Resource, on_delete=models.SET_NULL, blank=True, null=True, related_name='notes')
     content = models.TextField()
+    # Goes up with every content write; saves name the version they were
+    # made against, see api/notes.py.
+    version = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # (area, updated_at) serves ?updated_after= on the notes list.
+        indexes = [
+            models.Index(fields=['area', 'id'], name='note_area_id_idx'),
+            models.Index(fields=['area', 'updated_at'], name='note_area_updated_idx'),
+        ]
+
 class ResourceConnection(models.Model):
     area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='connections')
     source = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='source_connections')
     target = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='target_connections')
     label = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=['area', 'id'], name='connection_area_id_idx')]
+
 class CanvasItem(models.Model):
     area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='canvas_items')
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='canvas_placements')
     pos_x = models.IntegerField(default=0)
     pos_y = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [models.Index(fields=['area', 'id'], name='canvasitem_area_id_idx')]
+
 class Task(models.Model):
     area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='tasks')
     resource = models.ForeignKey(Resource, on_delete=models.SET_NULL, blank=True, null=True)
     description = models.CharField(max_length=500)
-    is_completed = models.BooleanField(default=False)
\ No newline at end of file
+    is_completed = models.BooleanField(default=False)
+
+    class Meta:
+        # (area, is_completed, id) serves ?is_completed= and the open task count.
+        indexes = [
+            models.Index(fields=['area', 'id'], name='task_area_id_idx'),
+            models.Index(fields=['area', 'is_completed', 'id'], name='task_area_completed_idx'),
+        ]
+
+class ChangeLogEntry(models.Model):
+    # Append-only record of writes to an area's contents, read by the delta
+    # sync endpoint (api/changes.py). The id is the sequence number clients
+    # sync from; the row itself is read from its table when a client asks.
+    KINDS = [
+        ('resource', 'Resource'), ('canvas_item', 'Canvas item'), ('connection', 'Connection'),
+        ('task', 'Task'), ('note', 'Note'),
+    ]
+    area = models.ForeignKey(AcademicArea, on_delete=models.CASCADE, related_name='change_log')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['area', 'id'], name='changelog_area_id_idx'),
+            models.Index(fields=['created_at'], name='changelog_created_idx'),
+        ]
+
+class Job(models.Model):
+    # A durable unit of background work, picked up by the run_jobs command.
+    STATUSES = [
+        ('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # The worker polls for the oldest runnable pending jobs.
+        indexes = [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')]
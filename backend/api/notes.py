@@ -0,0 +1,157 @@
+# In backend/api/notes.py
+
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .cache import bump_area_version
+from .changes import record_change
+from .jobs import JobType, enqueue, job_type, queue_related_update
+from .models import *
+from .search import get_search_backend
+
+# Note autosave. Editors send what changed since the version they loaded --
+# a list of {start, end, text} replacements -- instead of the whole note, to
+# POST /api/notes/upsert/ (views.NoteViewSet.upsert). Every content write
+# bumps Note.version; a save made against any other version than the
+# current one is refused with 409 and the current text, so two editors never
+# silently overwrite each other (optimistic concurrency).
+#
+# Every save is written before it is answered. What is coalesced is the
+# fan-out of a note write -- search index, change log, live events, area
+# version, related resources: it runs at most once every NOTE_SAVE_INTERVAL
+# seconds per note, the first save after a quiet spell straight away and the
+# rest through one note_saved job when the interval is up. So a typing user
+# costs one fan-out per interval instead of one per keystroke pause, the
+# job table makes the deferred fan-out survive a restart, and readers of the
+# area payload, search or the change log lag by at most the interval.
+
+
+class NoteError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class NoteConflict(NoteError):
+    # The save was made against another version; carries the current one.
+    def __init__(self, note_id, version, content):
+        super().__init__(f'Note {note_id} is at version {version}, merge and save again.', status=409)
+        self.version = version
+        self.content = content
+
+
+def apply_patches(content, patches):
+    """
+    Applies [{"start": s, "end": e, "text": t}] replacements to content.
+    Offsets count UTF-16 code units, like JavaScript string indices, and all
+    refer to the text before the patches; ranges may not overlap.
+    """
+    try:
+        replacements = sorted((int(p['start']), int(p['end']), p.get('text', '')) for p in patches)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise NoteError('Each patch needs a start, an end and a text.')
+    try:
+        data = content.encode('utf-16-le')
+        out, position = [], 0
+        for start, end, text in replacements:
+            if not isinstance(text, str):
+                raise NoteError('A patch text must be a string.')
+            if not position <= 2 * start <= 2 * end <= len(data):
+                raise NoteError('Patch ranges must lie within the note and not overlap.')
+            out += [data[position:2 * start], text.encode('utf-16-le')]
+            position = 2 * end
+        out.append(data[position:])
+        return b''.join(out).decode('utf-16-le')
+    except UnicodeError:
+        raise NoteError('A patch splits a character.')
+
+
+def note_fanout(note_id):
+    # What the Note signals do for a content update (api/signals.py); the
+    # saves themselves are written with update(), which sends none.
+    note = Note.objects.filter(pk=note_id).first()
+    if note is None:
+        # Deleted since; the delete did its own fan-out.
+        return
+    get_search_backend().index_notes([note.pk])
+    record_change(note)
+    bump_area_version(note.area_id)
+    if note.resource_id is not None:
+        queue_related_update([note.resource_id])
+
+
+class NoteSaver:
+    """
+    Writes autosaves and paces their fan-out, see above. The times of the
+    last fan-outs are kept per process; they only decide whether one can
+    run straight away, losing them costs at most an extra fan-out.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        # note id -> when its fan-out last ran (time.monotonic())
+        self.fanned_out = {}
+
+    def save(self, note_id, version, patches=None, content=None):
+        """
+        Saves new content, given in full or as patches, made against
+        `version`. Returns (content, version, fanned_out), fanned_out being
+        False while the fan-out waits for its job.
+        """
+        with transaction.atomic():
+            # The row lock (BEGIN IMMEDIATE on SQLite) keeps the version check
+            # and the write together; the conditional update double-checks.
+            row = Note.objects.select_for_update().filter(pk=note_id).values_list('content', 'version').first()
+            if row is None:
+                raise NoteError('No such note.', status=404)
+            current, current_version = row
+            if version != current_version:
+                raise NoteConflict(note_id, current_version, current)
+            new = apply_patches(current, patches) if patches is not None else content
+            written = Note.objects.filter(pk=note_id, version=version).update(
+                content=new, version=version + 1, updated_at=timezone.now(),
+            )
+            if not written:
+                current, current_version = Note.objects.values_list('content', 'version').get(pk=note_id)
+                raise NoteConflict(note_id, current_version, current)
+            fanned_out = self._fan_out(note_id)
+        return new, version + 1, fanned_out
+
+    def _fan_out(self, note_id):
+        now = time.monotonic()
+        with self.lock:
+            last = self.fanned_out.get(note_id)
+            due = last is None or now - last >= self.interval
+            if due:
+                self.fanned_out[note_id] = now
+            # Notes fanned out longer than an interval ago go straight away
+            # again anyway.
+            if len(self.fanned_out) > 1000:
+                self.fanned_out = {n: at for n, at in self.fanned_out.items() if now - at < self.interval}
+        if due:
+            note_fanout(note_id)
+            return True
+        if not Job.objects.filter(kind='note_saved', status='pending', payload__note=note_id).exists():
+            enqueue('note_saved', {'note': note_id}, delay=timedelta(seconds=last + self.interval - now))
+        return False
+
+
+@job_type('note_saved')
+class NoteSaved(JobType):
+    # No work(): a few statements, run in the worker's main process.
+    def prepare(self, payload):
+        note_fanout(payload['note'])
+
+
+_saver = None
+
+
+def note_saver():
+    global _saver
+    if _saver is None:
+        _saver = NoteSaver(getattr(settings, 'NOTE_SAVE_INTERVAL', 2))
+    return _saver
@@ -0,0 +1,12 @@
+# In backend/api/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+# Keyset pagination on the primary key. Every page is a "WHERE id > cursor
+# ORDER BY id LIMIT n" range scan, so page 10,000 costs the same as page 1,
+# and rows inserted while a client is paging never shift or repeat results.
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,101 @@
+# In backend/api/pdf.py
+
+import re
+import zlib
+
+# Text and page count extraction for stored PDFs. This module must not touch
+# Django: it runs inside the run_jobs worker pool processes.
+#
+# pypdf is used when it is installed. Without it a small fallback reads the
+# page objects and the text-showing operators of the (Flate or uncompressed)
+# content streams, which covers PDFs with plain single-byte fonts, i.e. most
+# exported papers and slides, but not scanned or CID-font documents.
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+STREAM = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+TEXT_BLOCK = re.compile(rb'\bBT\b(.*?)\bET\b', re.S)
+# Literal strings, hex strings, TJ arrays and the operators that move to a new line.
+TEXT_TOKEN = re.compile(
+    rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|\[|\]|-?\d+(?:\.\d+)?|T\*|Td|TD|Tj|TJ|\'|"', re.S
+)
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+# A TJ adjustment wider than this (thousandths of an em) is taken as a space.
+WORD_GAP = 200
+
+
+def extract_pdf_text(path):
+    # Returns (page_count, text).
+    if pypdf is not None:
+        reader = pypdf.PdfReader(path)
+        return len(reader.pages), '\n'.join(page.extract_text() or '' for page in reader.pages)
+    with open(path, 'rb') as f:
+        data = f.read()
+    streams = [_decode_stream(raw) for raw in STREAM.findall(data)]
+    # Page objects may sit inside compressed object streams (PDF 1.5+).
+    outside = STREAM.sub(b'', data)
+    page_count = len(PAGE.findall(outside)) + sum(len(PAGE.findall(s)) for s in streams)
+    text = '\n'.join(filter(None, (_stream_text(s) for s in streams)))
+    return page_count, text
+
+
+def _decode_stream(raw):
+    try:
+        return zlib.decompress(raw)
+    except zlib.error:
+        return raw
+
+
+def _unescape(literal):
+    out, i = bytearray(), 0
+    while i < len(literal):
+        char = literal[i:i + 1]
+        if char != b'\\':
+            out += char
+            i += 1
+            continue
+        following = literal[i + 1:i + 2]
+        octal = re.match(rb'[0-7]{1,3}', literal[i + 1:i + 4])
+        if octal:
+            out.append(int(octal.group(0), 8) & 0xFF)
+            i += 1 + len(octal.group(0))
+        elif following in (b'\r', b'\n'):
+            i += 2
+        else:
+            out += ESCAPES.get(following, following)
+            i += 2
+    return bytes(out)
+
+
+def _string(token):
+    if token.startswith(b'('):
+        return _unescape(token[1:-1])
+    digits = re.sub(rb'\s', b'', token[1:-1])
+    if len(digits) % 2:
+        digits += b'0'
+    return bytes.fromhex(digits.decode('ascii'))
+
+
+def _stream_text(stream):
+    lines = []
+    for block in TEXT_BLOCK.findall(stream):
+        line, in_array = [], False
+        for token in TEXT_TOKEN.findall(block):
+            if token == b'[':
+                in_array = True
+            elif token == b']':
+                in_array = False
+            elif token[:1] in (b'(', b'<'):
+                line.append(_string(token).decode('latin-1'))
+            elif in_array and token[:1] in b'-0123456789':
+                if -float(token) > WORD_GAP:
+                    line.append(' ')
+            elif token in (b'T*', b'Td', b'TD', b"'", b'"'):
+                lines.append(''.join(line))
+                line = []
+        lines.append(''.join(line))
+    return '\n'.join(re.sub(r'[ \t]+', ' ', line).strip() for line in lines if line.strip())
@@ -0,0 +1,409 @@
+# In backend/api/related.py
+
+import heapq
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from django.conf import settings
+from django.db import transaction
+from .models import *
+from .search import search_terms
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional, the pure-Python scorer below is used instead
+    np = sparse = None
+
+# Related-resource suggestions from other areas. Each resource is a TF-IDF
+# vector over the words of its title (counted twice), its authors and the
+# notes attached to it. Its top RELATED_TOP_K neighbours by cosine similarity,
+# among resources of other areas, are precomputed into RelatedResource, so
+# /api/resources/<id>/related/ is a single indexed read.
+#
+# Term counts per resource are kept in ResourceTerms. Writes mark resources
+# stale (jobs.queue_related_update); the update_related job re-counts them,
+# refreshes the in-memory RelatedIndex of its worker from ResourceTerms (only
+# rows changed since its last refresh) and recomputes the neighbour lists of
+# the stale resources and of every list they appeared in. The new vectors are
+# also offered to the lists of their new neighbours. build_related recomputes
+# everything, which also corrects the slow drift of document frequencies that
+# incremental updates leave alone.
+#
+# Terms found in more than MAX_DF of all resources relate nothing and are
+# skipped. With numpy and scipy installed, neighbours are exact: batches of
+# rows of the sparse document-term matrix are multiplied with the whole matrix.
+# Without them, each resource is matched on its QUERY_TERMS heaviest terms
+# against impact-ordered postings of at most POSTINGS resources per term,
+# which bounds the work per resource whatever the library size.
+
+TITLE_WEIGHT = 2
+MAX_DF = 0.1
+# ...but never below this many, or a small library would have no terms left.
+MIN_DF_CAP = 50
+QUERY_TERMS = 12
+POSTINGS = 200
+# Rows multiplied at once on the numpy path; bounds the size of the product.
+MATRIX_BATCH = 256
+# Resources whose lists are written per transaction.
+BATCH_SIZE = 1000
+STOPWORDS = set(
+    'a about after all also an and are as at be been but by can do for from has have how in into is it its '
+    'more no not of on or our so such than that the their them then there these they this to was we were '
+    'what when which while who will with you your'.split()
+)
+
+
+def top_k():
+    return getattr(settings, 'RELATED_TOP_K', 10)
+
+
+def document_terms(title, authors='', notes=()):
+    counts = Counter()
+    for text, weight in [(title, TITLE_WEIGHT), (authors, 1), *((note, 1) for note in notes)]:
+        for term in search_terms(text):
+            if len(term) > 1 and not term.isdigit() and term not in STOPWORDS:
+                counts[term] += weight
+    return counts
+
+
+class RelatedIndex:
+    """
+    Term counts of every resource, held compactly (term ids and counts in
+    arrays), plus the document frequencies. Thread-safe; kept per process
+    and refreshed from ResourceTerms by sync_index.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.vocabulary = {}
+        self.terms = []
+        self.df = array('l')
+        # resource id -> (area id, term ids, counts)
+        self.docs = {}
+        self.synced_at = None
+        self._postings = None
+        # term id -> the one resource holding it, for terms not shared (yet);
+        # kept with the postings, which leave such terms out.
+        self._single = None
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _term_id(self, term):
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.terms)
+            self.terms.append(term)
+            self.df.append(0)
+        return term_id
+
+    def set(self, resource_id, area_id, counts):
+        with self.lock:
+            self.discard(resource_id)
+            ids = array('l', (self._term_id(term) for term in counts))
+            shared = {}
+            for term_id in ids:
+                self.df[term_id] += 1
+                if self._single is not None:
+                    if self.df[term_id] == 1:
+                        self._single[term_id] = resource_id
+                    elif self.df[term_id] == 2:
+                        # Now worth matching on: the earlier holder is posted too.
+                        other = self._single.pop(term_id)
+                        shared.setdefault(other, set()).add(term_id)
+            self.docs[resource_id] = (area_id, ids, array('l', counts.values()))
+            self._matrix = None
+            if self._postings is not None:
+                self._post(resource_id)
+                for other, term_ids in shared.items():
+                    self._post(other, term_ids)
+
+    def discard(self, resource_id):
+        with self.lock:
+            doc = self.docs.pop(resource_id, None)
+            if doc is None:
+                return
+            for term_id in doc[1]:
+                self.df[term_id] -= 1
+                if self._postings is not None and term_id in self._postings:
+                    posting = self._postings[term_id] = [p for p in self._postings[term_id] if p[1] != resource_id]
+                    if self.df[term_id] == 1 and len(posting) == 1:
+                        self._single[term_id] = posting[0][1]
+                        del self._postings[term_id]
+                if self._single is not None and self.df[term_id] == 0:
+                    self._single.pop(term_id, None)
+            self._matrix = None
+
+    # --- Weights ---
+
+    def _max_df(self):
+        return max(MIN_DF_CAP, MAX_DF * len(self.docs))
+
+    def weights(self, resource_id):
+        # [(term id, weight)] of the terms worth matching on, L2-normalized
+        # over all of the resource's terms.
+        _, ids, counts = self.docs[resource_id]
+        n, max_df = len(self.docs), self._max_df()
+        weights, norm = [], 0.0
+        for term_id, count in zip(ids, counts):
+            df = self.df[term_id]
+            weight = (1 + math.log(count)) * math.log(1 + n / df)
+            norm += weight * weight
+            if 1 < df <= max_df:
+                weights.append((term_id, weight))
+        norm = math.sqrt(norm) or 1.0
+        return [(term_id, weight / norm) for term_id, weight in weights]
+
+    # --- Pure-Python scorer ---
+
+    def _post(self, resource_id, only=None):
+        for term_id, weight in self.weights(resource_id):
+            if only is not None and term_id not in only:
+                continue
+            posting = self._postings[term_id]
+            if len(posting) < POSTINGS:
+                posting.append((weight, resource_id))
+            else:
+                lowest = min(range(len(posting)), key=posting.__getitem__)
+                if posting[lowest][0] < weight:
+                    posting[lowest] = (weight, resource_id)
+
+    def _ensure_postings(self):
+        if self._postings is None:
+            self._postings = defaultdict(list)
+            self._single = {}
+            everything = defaultdict(list)
+            for resource_id, (_, ids, _) in self.docs.items():
+                for term_id in ids:
+                    if self.df[term_id] == 1:
+                        self._single[term_id] = resource_id
+                for term_id, weight in self.weights(resource_id):
+                    everything[term_id].append((weight, resource_id))
+            for term_id, posting in everything.items():
+                self._postings[term_id] = heapq.nlargest(POSTINGS, posting) if len(posting) > POSTINGS else posting
+
+    def _python_neighbours(self, resource_ids, k):
+        self._ensure_postings()
+        postings, docs = self._postings, self.docs
+        result = {}
+        for resource_id in resource_ids:
+            area_id = docs[resource_id][0]
+            query = heapq.nlargest(QUERY_TERMS, self.weights(resource_id), key=itemgetter(1))
+            scores = {}
+            get = scores.get
+            for term_id, weight in query:
+                for other_weight, other in postings.get(term_id, ()):
+                    scores[other] = get(other, 0.0) + weight * other_weight
+            # Best first, ties by id; the area check only runs until k are found.
+            ranked = sorted(sorted(scores.items()), key=itemgetter(1), reverse=True)
+            best = []
+            for other, score in ranked:
+                if other != resource_id and docs[other][0] != area_id:
+                    best.append((other, score))
+                    if len(best) == k:
+                        break
+            result[resource_id] = best
+        return result
+
+    # --- numpy/scipy scorer ---
+
+    def _ensure_matrix(self):
+        if self._matrix is None:
+            order = list(self.docs)
+            rows, cols, data = array('l'), array('l'), array('d')
+            for row, resource_id in enumerate(order):
+                for term_id, weight in self.weights(resource_id):
+                    rows.append(row)
+                    cols.append(term_id)
+                    data.append(weight)
+            matrix = sparse.csr_matrix(
+                (np.frombuffer(data, dtype=np.float64), (np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64))),
+                shape=(len(order), len(self.terms)),
+            )
+            areas = np.array([self.docs[resource_id][0] for resource_id in order], dtype=np.int64)
+            position = {resource_id: row for row, resource_id in enumerate(order)}
+            self._matrix = (matrix, np.array(order, dtype=np.int64), areas, position)
+        return self._matrix
+
+    def _numpy_neighbours(self, resource_ids, k):
+        matrix, order, areas, position = self._ensure_matrix()
+        transposed = matrix.T.tocsc()
+        result = {}
+        for start in range(0, len(resource_ids), MATRIX_BATCH):
+            batch = resource_ids[start:start + MATRIX_BATCH]
+            rows = [position[resource_id] for resource_id in batch]
+            product = (matrix[rows] @ transposed).tocsr()
+            for i, resource_id in enumerate(batch):
+                cols = product.indices[product.indptr[i]:product.indptr[i + 1]]
+                scores = product.data[product.indptr[i]:product.indptr[i + 1]]
+                keep = areas[cols] != areas[rows[i]]
+                cols, scores = cols[keep], scores[keep]
+                if len(scores) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    cols, scores = cols[top], scores[top]
+                ranked = sorted(zip(scores.tolist(), order[cols].tolist()), key=lambda so: (-so[0], so[1]))
+                result[resource_id] = [(other, score) for score, other in ranked]
+        return result
+
+    def neighbours(self, resource_ids, k):
+        # {resource id: [(other id, score)], best first} for the given ids
+        # that are in the index.
+        with self.lock:
+            resource_ids = [resource_id for resource_id in resource_ids if resource_id in self.docs]
+            if np is not None:
+                return self._numpy_neighbours(resource_ids, k)
+            return self._python_neighbours(resource_ids, k)
+
+
+# --- Database side ---
+
+def count_terms(resource_ids):
+    # Re-counts the terms of the given resources into ResourceTerms; rows of
+    # resources that no longer exist go.
+    resource_ids = list(resource_ids)
+    for start in range(0, len(resource_ids), 500):
+        ids = resource_ids[start:start + 500]
+        docs, notes = {}, defaultdict(list)
+        rows = Resource.objects.filter(id__in=ids).values_list(
+            'id', 'area_id', 'title', 'book_details__authors', 'paper_details__authors',
+        )
+        for resource_id, content in Note.objects.filter(resource_id__in=ids).values_list('resource_id', 'content'):
+            notes[resource_id].append(content)
+        for resource_id, area_id, title, book_authors, paper_authors in rows:
+            counts = document_terms(title, book_authors or paper_authors or '', notes[resource_id])
+            docs[resource_id] = ResourceTerms(resource_id=resource_id, area_id=area_id, terms=dict(counts))
+        with transaction.atomic():
+            ResourceTerms.objects.filter(resource_id__in=ids).delete()
+            ResourceTerms.objects.bulk_create(docs.values())
+
+
+def sync_index(index):
+    # Like GraphIndex.refresh: a full load the first time, afterwards only
+    # the rows written since, plus dropping resources that are gone.
+    with index.lock:
+        rows = ResourceTerms.objects.all()
+        if index.synced_at is not None:
+            rows = rows.filter(updated_at__gte=index.synced_at)
+            for resource_id in index.docs.keys() - set(ResourceTerms.objects.values_list('resource_id', flat=True)):
+                index.discard(resource_id)
+        latest = index.synced_at
+        for resource_id, area_id, terms, updated_at in rows.values_list('resource_id', 'area_id', 'terms', 'updated_at').iterator():
+            index.set(resource_id, area_id, terms)
+            latest = updated_at if latest is None else max(latest, updated_at)
+        index.synced_at = latest
+
+
+def store_related(neighbours):
+    # Replaces the stored lists of the given resources.
+    with transaction.atomic():
+        RelatedResource.objects.filter(resource_id__in=list(neighbours)).delete()
+        RelatedResource.objects.bulk_create([
+            RelatedResource(resource_id=resource_id, related_id=other, score=score)
+            for resource_id, best in neighbours.items() for other, score in best
+        ])
+
+
+_index = RelatedIndex()
+
+
+def related_index():
+    return _index
+
+
+def rebuild_related(index=None, batch_size=BATCH_SIZE):
+    """
+    Re-counts every resource and recomputes every neighbour list, in
+    batches. Returns the number of resources.
+    """
+    index = index or related_index()
+    StaleRelatedResource.objects.all().delete()
+    resource_ids = list(Resource.objects.order_by('id').values_list('id', flat=True))
+    count_terms(resource_ids)
+    with index.lock:
+        index.clear()
+        sync_index(index)
+        RelatedResource.objects.all().delete()
+        for start in range(0, len(resource_ids), batch_size):
+            store_related(index.neighbours(resource_ids[start:start + batch_size], top_k()))
+    return len(resource_ids)
+
+
+def update_related(index=None):
+    """
+    Brings the stale resources and the lists they appear in up to date.
+    Returns the number of lists recomputed.
+    """
+    index = index or related_index()
+    # The marks are claimed up front: an edit made while this runs marks its
+    # resource again, for the next run, instead of being cleared with the
+    # marks taken here. A failed run puts them back.
+    with transaction.atomic():
+        stale = list(StaleRelatedResource.objects.values_list('resource_id', flat=True))
+        StaleRelatedResource.objects.filter(resource_id__in=stale).delete()
+    if not stale:
+        return 0
+    try:
+        return _update_lists(index, stale)
+    except Exception:
+        mark_related_stale(stale)
+        raise
+
+
+def _update_lists(index, stale):
+    count_terms(stale)
+    k = top_k()
+    with index.lock:
+        sync_index(index)
+        # The stale resources' own lists, and every list they were in.
+        affected = set(stale) | set(RelatedResource.objects.filter(related_id__in=stale).values_list('resource_id', flat=True))
+        neighbours = index.neighbours(sorted(affected), k)
+        # Scores are symmetric: a stale resource may now belong in the lists
+        # of its own new neighbours.
+        offers = defaultdict(list)
+        for resource_id in stale:
+            for other, score in neighbours.get(resource_id, ()):
+                if other not in neighbours:
+                    offers[other].append((resource_id, score))
+        if offers:
+            current = defaultdict(list)
+            for resource_id, related_id, score in RelatedResource.objects.filter(resource_id__in=list(offers)).values_list('resource_id', 'related_id', 'score'):
+                current[resource_id].append((related_id, score))
+            for resource_id, offered in offers.items():
+                merged = dict(current[resource_id])
+                merged.update(offered)
+                best = sorted(merged.items(), key=lambda rs: (-rs[1], rs[0]))[:k]
+                if best != sorted(current[resource_id], key=lambda rs: (-rs[1], rs[0])):
+                    neighbours[resource_id] = best
+        # Lists of resources gone in the meantime are simply dropped.
+        gone = affected - index.docs.keys()
+        with transaction.atomic():
+            RelatedResource.objects.filter(resource_id__in=list(gone)).delete()
+            store_related(neighbours)
+    return len(neighbours)
+
+
+def mark_related_stale(resource_ids):
+    StaleRelatedResource.objects.bulk_create(
+        [StaleRelatedResource(resource_id=resource_id) for resource_id in set(resource_ids)], ignore_conflicts=True,
+    )
+
+
+def related_to(resource_id, limit=None):
+    rows = (
+        RelatedResource.objects.filter(resource_id=resource_id).order_by('-score', 'related_id')
+        .values('related_id', 'related__title', 'related__resource_type', 'related__area_id', 'related__area__slug', 'score')
+    )
+    return [
+        {
+            'id': row['related_id'], 'title': row['related__title'], 'resource_type': row['related__resource_type'],
+            'area': row['related__area_id'], 'area_slug': row['related__area__slug'], 'score': round(row['score'], 4),
+        }
+        for row in rows[:limit or top_k()]
+    ]
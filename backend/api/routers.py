@@ -0,0 +1,30 @@
+# In backend/api/routers.py
+
+from django.db import connections
+
+WRITER = 'default'
+READER = 'replica'
+
+
+class ReadWriteRouter:
+    """
+    Sends writes to the writer connection and reads to the read-only one (see
+    DATABASES in settings.py; both open the same SQLite file, so there is no
+    replication lag). Reads made inside a transaction on the writer stay on
+    it, so they see that transaction's own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if READER not in connections.settings or connections[WRITER].in_atomic_block:
+            return WRITER
+        return READER
+
+    def db_for_write(self, model, **hints):
+        return WRITER
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITER
@@ -0,0 +1,221 @@
+# In backend/api/search.py
+
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import *
+
+SEARCH_TABLE = 'api_search_index'
+TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return [term.lower() for term in TERM.findall(query or '')]
+
+
+class SearchBackend:
+    # Resources are indexed on their title plus the authors of books and
+    # papers and the extracted text of PDFs, notes on their content. Backends that keep no index of their
+    # own can leave the index_* / remove_* hooks as no-ops.
+    def index_resources(self, resource_ids):
+        pass
+
+    def remove_resource(self, resource_id):
+        pass
+
+    def index_notes(self, note_ids):
+        pass
+
+    def remove_note(self, note_id):
+        pass
+
+    def index_area(self, area_id):
+        pass
+
+    def remove_area(self, area_id):
+        # Called before the area's rows are deleted.
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, area_id=None, kind=None, limit=20):
+        # Returns dicts with type, id, area, title, snippet and score, best first.
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Keeps an FTS5 table with one row per resource and per note. The rowid
+    encodes the object (resource id * 2, note id * 2 + 1), so incremental
+    updates and deletes are primary-key lookups rather than table scans.
+    """
+
+    def _resource_rows(self, where, params):
+        return (
+            f"SELECT r.id * 2, r.area_id, r.title, COALESCE(b.authors, p.authors, t.text, '') "
+            f"FROM {Resource._meta.db_table} r "
+            f"LEFT JOIN {Book._meta.db_table} b ON b.resource_id = r.id "
+            f"LEFT JOIN {Paper._meta.db_table} p ON p.resource_id = r.id "
+            f"LEFT JOIN {PDFResource._meta.db_table} f ON f.resource_id = r.id "
+            f"LEFT JOIN {ExtractedText._meta.db_table} t ON t.stored_file_id = f.stored_file_id "
+            f"WHERE {where}", params
+        )
+
+    def _note_rows(self, where, params):
+        return (
+            f"SELECT n.id * 2 + 1, n.area_id, '', n.content FROM {Note._meta.db_table} n WHERE {where}",
+            params,
+        )
+
+    def _replace(self, rowids, select):
+        sql, params = select
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})", rowids
+            )
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, area_id, title, body) {sql}", params)
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+
+    def index_resources(self, resource_ids):
+        # Batched so a big import stays below SQLite's bound-parameter limit.
+        resource_ids = list(resource_ids)
+        for start in range(0, len(resource_ids), 500):
+            ids = resource_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(ids))
+            self._replace([i * 2 for i in ids], self._resource_rows(f'r.id IN ({placeholders})', ids))
+
+    def remove_resource(self, resource_id):
+        self._delete(resource_id * 2)
+
+    def index_notes(self, note_ids):
+        note_ids = list(note_ids)
+        for start in range(0, len(note_ids), 500):
+            ids = note_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(ids))
+            self._replace([i * 2 + 1 for i in ids], self._note_rows(f'n.id IN ({placeholders})', ids))
+
+    def remove_note(self, note_id):
+        self._delete(note_id * 2 + 1)
+
+    def index_area(self, area_id):
+        # Every resource and note of the area, in two INSERT ... SELECTs.
+        self.remove_area(area_id)
+        with connection.cursor() as cursor:
+            for sql, params in (self._resource_rows('r.area_id = %s', [area_id]), self._note_rows('n.area_id = %s', [area_id])):
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, area_id, title, body) {sql}", params)
+
+    def remove_area(self, area_id):
+        # By rowid, which is a key lookup per row; area_id is not indexed.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id * 2 FROM {Resource._meta.db_table} WHERE area_id = %s) "
+                f"OR rowid IN (SELECT id * 2 + 1 FROM {Note._meta.db_table} WHERE area_id = %s)",
+                [area_id, area_id],
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            for sql, params in (self._resource_rows('1', []), self._note_rows('1', [])):
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, area_id, title, body) {sql}", params)
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+    def search(self, query, area_id=None, kind=None, limit=20):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # Every term must match; the last one may be a prefix of a word.
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        where, params = [f"{SEARCH_TABLE} MATCH %s"], [match.strip()]
+        if area_id is not None:
+            where.append("area_id = %s")
+            params.append(area_id)
+        if kind == 'resource':
+            where.append("rowid %% 2 = 0")
+        elif kind == 'note':
+            where.append("rowid %% 2 = 1")
+        # bm25 weights follow the column order: area_id, title, body.
+        sql = (
+            f"SELECT rowid, area_id, title, snippet({SEARCH_TABLE}, -1, '[', ']', '…', 12), "
+            f"bm25({SEARCH_TABLE}, 0.0, 10.0, 1.0) AS score "
+            f"FROM {SEARCH_TABLE} WHERE {' AND '.join(where)} ORDER BY score LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            rows = cursor.fetchall()
+        return [
+            {
+                'type': 'note' if rowid % 2 else 'resource',
+                'id': rowid // 2,
+                'area': area,
+                'title': title,
+                'snippet': snippet,
+                # bm25 is "lower is better", flip it so clients can sort descending.
+                'score': round(-score, 4),
+            }
+            for rowid, area, title, snippet, score in rows
+        ]
+
+
+class DatabaseSearchBackend(SearchBackend):
+    # Portable fallback for databases without FTS5: case-insensitive
+    # containment on the same fields, title matches ranked first.
+    def search(self, query, area_id=None, kind=None, limit=20):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        results = []
+        if kind in (None, 'resource'):
+            resources = Resource.objects.all()
+            for term in terms:
+                resources = resources.filter(
+                    Q(title__icontains=term)
+                    | Q(book_details__authors__icontains=term)
+                    | Q(paper_details__authors__icontains=term)
+                    | Q(pdf_details__stored_file__extracted_text__text__icontains=term)
+                )
+            if area_id is not None:
+                resources = resources.filter(area_id=area_id)
+            for row in resources.values('id', 'area_id', 'title')[:limit]:
+                hits = sum(term in row['title'].lower() for term in terms)
+                results.append({
+                    'type': 'resource', 'id': row['id'], 'area': row['area_id'],
+                    'title': row['title'], 'snippet': row['title'], 'score': float(hits + 1),
+                })
+        if kind in (None, 'note'):
+            notes = Note.objects.all()
+            for term in terms:
+                notes = notes.filter(content__icontains=term)
+            if area_id is not None:
+                notes = notes.filter(area_id=area_id)
+            for row in notes.values('id', 'area_id', 'content')[:limit]:
+                results.append({
+                    'type': 'note', 'id': row['id'], 'area': row['area_id'],
+                    'title': '', 'snippet': row['content'][:200], 'score': 1.0,
+                })
+        results.sort(key=lambda result: -result['score'])
+        return results[:limit]
+
+
+_backend = None
+
+
+def get_search_backend():
+    # settings.SEARCH_BACKEND picks a backend by dotted path; by default SQLite
+    # gets the FTS5 index and everything else the portable fallback.
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = DatabaseSearchBackend()
+    return _backend
@@ -1,17 +1,48 @@
 # In backend/api/serializers.py
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import *
+from .loaders import DETAIL_RELATIONS, load_resource_details
+from .metrics import timed_serialization
+
+# Counts the time spent building response data towards the request's
+# serialization time (see api/metrics.py). Used on the serializers that views
+# return; nested serializers are covered by their parent.
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+# Lets API clients ask for a subset of fields with ?fields=id,title. Only the
+# top-level serializer of a read is trimmed, nested ones are left alone;
+# writes always validate and save every field.
+class SparseFieldsMixin:
+    def get_field_names(self, declared_fields, info):
+        field_names = super().get_field_names(declared_fields, info)
+        request = self.context.get('request')
+        is_root = self.root is self or self.root is self.parent
+        if request is None or not is_root or request.method not in SAFE_METHODS:
+            return field_names
+        requested = request.query_params.get('fields')
+        if not requested:
+            return field_names
+        wanted = {name.strip() for name in requested.split(',')}
+        return [name for name in field_names if name in wanted] or field_names
 
 # First, define the serializers for the specific "details" of each resource type.
+# link_status / link_checked_at are filled in by the check_links job (api/links.py).
 class CourseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ['lecturer', 'website']
+        fields = ['lecturer', 'website', 'link_status', 'link_checked_at']
 
 class BookDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        fields = ['authors', 'url']
+        fields = ['authors', 'url', 'link_status', 'link_checked_at']
 
 class PaperDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,52 +52,88 @@ class PaperDetailSerializer(serializers.ModelSerializer):
 class WebResourceDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebResource
-        fields = ['url']
+        fields = ['url', 'link_status', 'link_checked_at']
 
 class PDFResourceDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PDFResource
-        fields = ['file']
+        fields = ['file', 'page_count']
+
+DETAIL_SERIALIZERS = {
+    'course': CourseDetailSerializer,
+    'book': BookDetailSerializer,
+    'paper': PaperDetailSerializer,
+    'web': WebResourceDetailSerializer,
+    'pdf': PDFResourceDetailSerializer,
+}
+
+# Serializing many resources at once loads their details in one query per
+# resource type instead of one query per row.
+class ResourceListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        resources = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'details' in self.child.fields:
+            load_resource_details(resources)
+        return super().to_representation(resources)
 
 # Now, create the main Resource serializer that will manually include the details.
-# This is the corrected version.
-class ResourceSerializer(serializers.ModelSerializer):
+class ResourceSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     details = serializers.SerializerMethodField()
 
     class Meta:
         model = Resource
         fields = ['id', 'area', 'title', 'resource_type', 'details']
+        list_serializer_class = ResourceListSerializer
 
     def get_details(self, obj):
         # This method checks the resource_type and returns the correct detail data.
+        relation = DETAIL_RELATIONS.get(obj.resource_type)
+        if relation is None:
+            return None
         try:
-            if obj.resource_type == 'course':
-                return CourseDetailSerializer(obj.course_details).data
-            if obj.resource_type == 'book':
-                return BookDetailSerializer(obj.book_details).data
-            if obj.resource_type == 'paper':
-                return PaperDetailSerializer(obj.paper_details).data
-            if obj.resource_type == 'web':
-                return WebResourceDetailSerializer(obj.web_details).data
-            if obj.resource_type == 'pdf':
-                return PDFResourceDetailSerializer(obj.pdf_details).data
-        except AttributeError:
-             # This can happen if the child object hasn't been created yet.
+            child = getattr(obj, relation)
+        except ObjectDoesNotExist:
+            # This can happen if the child object hasn't been created yet.
             return None
-        return None
+        return DETAIL_SERIALIZERS[obj.resource_type](child).data
+
+# Validates one row of a bulk import (see api/ingest.py). The area comes from
+# the import itself, not from the rows.
+class ResourceImportSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=300)
+    resource_type = serializers.ChoiceField(choices=Resource.RESOURCE_TYPES)
+    lecturer = serializers.CharField(max_length=200, required=False)
+    website = serializers.URLField(max_length=500, required=False)
+    authors = serializers.CharField(max_length=500, required=False)
+    url = serializers.URLField(max_length=500, required=False)
+    publication_year = serializers.IntegerField(required=False)
+
+class UploadSessionSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    sha256 = serializers.CharField(source='stored_file.sha256', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'received', 'sha256']
+        read_only_fields = ['received']
+
+    def validate_size(self, size):
+        limit = settings.MAX_PDF_UPLOAD_SIZE
+        if not 0 < size <= limit:
+            raise serializers.ValidationError(f'Uploads must be between 1 and {limit} bytes.')
+        return size
 
 # The rest of the serializers follow.
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Note
-        fields = ['id', 'content', 'resource', 'area', 'updated_at']
+        fields = ['id', 'content', 'resource', 'area', 'version', 'updated_at']
 
 class SimpleResourceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Resource
         fields = ['id', 'title', 'resource_type']
 
-class CanvasItemSerializer(serializers.ModelSerializer):
+class CanvasItemSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     # This is the new, smarter way to handle this.
     # On read (GET), we want to show the full resource details.
     # On write (POST), we want to accept just the resource ID.
@@ -74,7 +141,8 @@ class CanvasItemSerializer(serializers.ModelSerializer):
         # Get the default representation
         rep = super().to_representation(instance)
         # On GET requests, replace the resource ID with the full serialized resource data
-        rep['resource'] = SimpleResourceSerializer(instance.resource).data
+        if 'resource' in rep:
+            rep['resource'] = SimpleResourceSerializer(instance.resource).data
         return rep
 
     class Meta:
@@ -84,22 +152,46 @@ class CanvasItemSerializer(serializers.ModelSerializer):
         # that accept the integer IDs on POST requests, which is exactly what we need.
         fields = ['id', 'area', 'resource', 'pos_x', 'pos_y']
 
-class ResourceConnectionSerializer(serializers.ModelSerializer):
+# Input for the bulk canvas positions endpoint. Only ids and coordinates are
+# accepted, so none of the CanvasItemSerializer machinery runs per item.
+class CanvasPositionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    pos_x = serializers.IntegerField()
+    pos_y = serializers.IntegerField()
+
+class CanvasPositionsSerializer(serializers.Serializer):
+    area = serializers.IntegerField()
+    positions = CanvasPositionSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_positions(self, positions):
+        if len({p['id'] for p in positions}) != len(positions):
+            raise serializers.ValidationError('Each canvas item may only appear once.')
+        return positions
+
+class ResourceConnectionSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ResourceConnection
         fields = '__all__'
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = '__all__'
 
-class AcademicAreaSerializer(serializers.ModelSerializer):
+class AreaStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AreaStats
+        fields = ['resource_count', 'note_count', 'task_count', 'open_task_count', 'connection_count']
+
+class AcademicAreaSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    # Maintained counters (api/stats.py), so the area list needs no COUNTs.
+    stats = AreaStatsSerializer(read_only=True)
+
     class Meta:
         model = AcademicArea
-        fields = ['id', 'name', 'slug', 'description']
+        fields = ['id', 'name', 'slug', 'description', 'stats']
 
-class AcademicAreaDetailSerializer(serializers.ModelSerializer):
+class AcademicAreaDetailSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     resources = ResourceSerializer(many=True, read_only=True)
     canvas_items = CanvasItemSerializer(many=True, read_only=True)
     connections = ResourceConnectionSerializer(many=True, read_only=True)
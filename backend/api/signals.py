@@ -0,0 +1,204 @@
+# In backend/api/signals.py
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .cache import bump_area_version, bump_resource_area_version
+from .changes import record_change, record_changes
+from .duplicates import index_fingerprints
+from .graph import graph_index
+from .jobs import enqueue, queue_related_update
+from .metrics import install_query_timer
+from .sqlite import install_lock_retries
+from .stats import adjust_area_stats, contribution, stats_after_save, stored_row
+from .models import *
+from .search import get_search_backend
+
+# --- Search index ---
+# Keep the search index in step with every single-row write. Bulk writes
+# (bulk_create / bulk_update) skip signals and index their rows themselves.
+
+@receiver(post_save, sender=Resource)
+def index_saved_resource(sender, instance, **kwargs):
+    get_search_backend().index_resources([instance.pk])
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Paper)
+@receiver(post_save, sender=PDFResource)
+def index_resource_authors(sender, instance, **kwargs):
+    get_search_backend().index_resources([instance.resource_id])
+
+@receiver(post_delete, sender=Resource)
+def unindex_deleted_resource(sender, instance, **kwargs):
+    get_search_backend().remove_resource(instance.pk)
+
+@receiver(post_save, sender=Note)
+def index_saved_note(sender, instance, **kwargs):
+    get_search_backend().index_notes([instance.pk])
+
+@receiver(post_delete, sender=Note)
+def unindex_deleted_note(sender, instance, **kwargs):
+    get_search_backend().remove_note(instance.pk)
+
+# --- Duplicate fingerprints ---
+# The MinHash/LSH index of api/duplicates.py follows titles and authors. Rows
+# of deleted resources go with them (cascade); bulk writes index themselves.
+
+@receiver(post_save, sender=Resource)
+def fingerprint_saved_resource(sender, instance, **kwargs):
+    index_fingerprints([instance.pk])
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Paper)
+def fingerprint_resource_authors(sender, instance, **kwargs):
+    index_fingerprints([instance.resource_id])
+
+# --- Related resources ---
+# Title, author and note writes change a resource's vector; update_related
+# recomputes the lists. A deleted resource takes the rows listing it along
+# (cascade), so the lists it was in are marked first.
+
+@receiver(post_save, sender=Resource)
+def relate_saved_resource(sender, instance, **kwargs):
+    queue_related_update([instance.pk])
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Paper)
+def relate_resource_authors(sender, instance, **kwargs):
+    queue_related_update([instance.resource_id])
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def relate_note_resource(sender, instance, **kwargs):
+    if instance.resource_id is not None:
+        queue_related_update([instance.resource_id])
+
+@receiver(pre_delete, sender=Resource)
+def relate_deleted_resource(sender, instance, **kwargs):
+    queue_related_update(RelatedResource.objects.filter(related=instance).values_list('resource_id', flat=True))
+
+# --- Area versions ---
+# Any write to an area's contents bumps its version, which invalidates the
+# cached area detail payload and its ETag.
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=CanvasItem)
+@receiver(post_save, sender=ResourceConnection)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=CanvasItem)
+@receiver(post_delete, sender=ResourceConnection)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Note)
+def bump_version_on_area_write(sender, instance, **kwargs):
+    bump_area_version(instance.area_id)
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Paper)
+@receiver(post_save, sender=WebResource)
+@receiver(post_save, sender=PDFResource)
+def bump_version_on_detail_write(sender, instance, **kwargs):
+    bump_resource_area_version(instance.resource_id)
+
+@receiver(post_save, sender=AcademicArea)
+def bump_version_on_area_update(sender, instance, created, **kwargs):
+    if not created:
+        bump_area_version(instance.pk)
+
+# --- Area stats ---
+# Counters move with every single-row create, update (a task being completed,
+# a row moving to another area) and delete, see api/stats.py.
+
+@receiver(post_save, sender=AcademicArea)
+def create_area_stats(sender, instance, created, **kwargs):
+    if created:
+        AreaStats.objects.get_or_create(area=instance)
+
+@receiver(pre_save, sender=Resource)
+@receiver(pre_save, sender=Note)
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=ResourceConnection)
+@receiver(pre_save, sender=CanvasItem)
+def remember_row_before_save(sender, instance, **kwargs):
+    # The stats and the change log need the area an updated row leaves.
+    instance._before_save = stored_row(instance)
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=ResourceConnection)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    stats_after_save(instance, None if created else getattr(instance, '_before_save', None))
+
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=ResourceConnection)
+def update_stats_on_delete(sender, instance, **kwargs):
+    adjust_area_stats(instance.area_id, **{field: -n for field, n in contribution(instance).items()})
+
+# --- Change log ---
+# Feeds the delta sync endpoint, see api/changes.py.
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=CanvasItem)
+@receiver(post_save, sender=ResourceConnection)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Note)
+def log_saved_row(sender, instance, created, **kwargs):
+    before = None if created else getattr(instance, '_before_save', None)
+    if before is not None and before.area_id != instance.area_id:
+        # Moved: gone from the old area, new in this one.
+        record_change(instance, deleted=True, area_id=before.area_id)
+    record_change(instance)
+
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=CanvasItem)
+@receiver(post_delete, sender=ResourceConnection)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Note)
+def log_deleted_row(sender, instance, origin=None, **kwargs):
+    # When the whole area goes, so does its log; an entry written now would
+    # point at the deleted area.
+    if isinstance(origin, AcademicArea) or getattr(origin, 'model', None) is AcademicArea:
+        return
+    record_change(instance, deleted=True)
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Paper)
+@receiver(post_save, sender=WebResource)
+@receiver(post_save, sender=PDFResource)
+def log_detail_write(sender, instance, **kwargs):
+    record_changes(instance.resource.area_id, 'resource', [instance.resource_id])
+
+# --- Graph index ---
+
+# Applied on commit: a rolled-back write also rolls back the version bump
+# that refresh() would repair the index from.
+
+@receiver(post_save, sender=ResourceConnection)
+def index_saved_connection(sender, instance, **kwargs):
+    edge = (instance.pk, instance.area_id, instance.source_id, instance.target_id, instance.label)
+    transaction.on_commit(lambda: graph_index().edge_saved(*edge))
+
+@receiver(post_delete, sender=ResourceConnection)
+def unindex_deleted_connection(sender, instance, **kwargs):
+    edge_id = instance.pk
+    transaction.on_commit(lambda: graph_index().edge_deleted(edge_id))
+
+# --- Background jobs ---
+
+@receiver(post_save, sender=StoredFile)
+def extract_stored_pdf(sender, instance, created, **kwargs):
+    # Only queues the work; run_jobs picks it up, the upload never waits for it.
+    if created:
+        enqueue('extract_pdf', {'stored_file': instance.pk})
+
+# --- Database connections ---
+
+connection_created.connect(install_query_timer, dispatch_uid='api.metrics.install_query_timer')
+connection_created.connect(install_lock_retries, dispatch_uid='api.sqlite.install_lock_retries')
@@ -0,0 +1,39 @@
+# In backend/api/sqlite.py
+
+import random
+import time
+from django.db import OperationalError
+
+# SQLite allows one writer at a time. Write transactions start with BEGIN
+# IMMEDIATE (settings.DATABASES), so a writer waits for the lock in SQLite's
+# busy handler up front instead of failing halfway through. When even that
+# wait runs out, retry_when_locked tries again a few times with jittered
+# backoff. Only statements that are safe to repeat are retried: BEGIN itself
+# and single statements outside a transaction. Inside a transaction the
+# error goes up as usual, since the work before it would be lost.
+
+LOCK_RETRIES = 4
+LOCK_BACKOFF = 0.05
+
+
+def is_lock_error(error):
+    return 'database is locked' in str(error) or 'database is busy' in str(error)
+
+
+def retry_when_locked(execute, sql, params, many, context):
+    connection = context['connection']
+    if connection.in_atomic_block and not sql.startswith('BEGIN'):
+        return execute(sql, params, many, context)
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if attempt == LOCK_RETRIES or not is_lock_error(e):
+                raise
+            time.sleep(LOCK_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def install_lock_retries(sender, connection, **kwargs):
+    # Receiver of connection_created, see api/signals.py.
+    if connection.vendor == 'sqlite' and retry_when_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_when_locked)
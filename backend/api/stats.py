@@ -0,0 +1,69 @@
+# In backend/api/stats.py
+
+from django.db.models import F
+from .models import *
+
+# Per-area counts live in AreaStats, so the library overview is one query
+# (areas joined to their stats row) however many areas there are, instead of
+# a handful of COUNTs per area.
+#
+# Single-row writes adjust the counters from the signals in api/signals.py,
+# as "count = count + n" UPDATEs inside the writer's transaction.
+# Bulk paths either adjust by what they inserted or call refresh_area_stats,
+# which recounts one area from the (area, ...) indexes.
+
+# Which counter each model feeds.
+COUNTERS = {
+    Resource: 'resource_count',
+    Note: 'note_count',
+    Task: 'task_count',
+    ResourceConnection: 'connection_count',
+}
+
+
+def contribution(instance):
+    # What one row adds to its area's counters.
+    counts = {COUNTERS[type(instance)]: 1}
+    if isinstance(instance, Task) and not instance.is_completed:
+        counts['open_task_count'] = 1
+    return counts
+
+
+def adjust_area_stats(area_id, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        AreaStats.objects.filter(area_id=area_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def refresh_area_stats(area_id):
+    counts = {
+        'resource_count': Resource.objects.filter(area_id=area_id).count(),
+        'note_count': Note.objects.filter(area_id=area_id).count(),
+        'task_count': Task.objects.filter(area_id=area_id).count(),
+        'open_task_count': Task.objects.filter(area_id=area_id, is_completed=False).count(),
+        'connection_count': ResourceConnection.objects.filter(area_id=area_id).count(),
+    }
+    AreaStats.objects.update_or_create(area_id=area_id, defaults=counts)
+
+
+def stored_row(instance):
+    # The stored area (and completion, for tasks) of a row about to be
+    # updated, read in pre_save. None for new rows.
+    if instance._state.adding or instance.pk is None:
+        return None
+    fields = ['area_id', 'is_completed'] if isinstance(instance, Task) else ['area_id']
+    row = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    return type(instance)(pk=instance.pk, **row) if row is not None else None
+
+
+def stats_after_save(instance, before):
+    after = (instance.area_id, contribution(instance))
+    if before is not None:
+        before = (before.area_id, contribution(before))
+    if before == after:
+        return
+    if before is not None:
+        area_id, counts = before
+        adjust_area_stats(area_id, **{field: -n for field, n in counts.items()})
+    area_id, counts = after
+    adjust_area_stats(area_id, **counts)
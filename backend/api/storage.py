@@ -0,0 +1,270 @@
+# In backend/api/storage.py
+
+import hashlib
+import os
+import re
+import uuid
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from .models import StoredFile, UploadSession
+
+# PDFs are stored content-addressed under MEDIA_ROOT/blobs/<aa>/<bb>/<sha256>.pdf,
+# so the same paper uploaded into several areas is kept on disk only once.
+# Uploads arrive in chunks into MEDIA_ROOT/partial/<session id>.part and are
+# hashed and moved into place once the last byte is in. Sessions left
+# unfinished are removed, with their files, by the expire_uploads job.
+
+BLOB_DIR = 'blobs'
+PARTIAL_DIR = 'partial'
+CHUNK_SIZE = 8 * 1024 * 1024
+READ_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def media_path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def partial_path(session):
+    return media_path(os.path.join(PARTIAL_DIR, f'{session.pk}.part'))
+
+
+def blob_name(sha256):
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], f'{sha256}.pdf')
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_file(path):
+    """
+    Moves a finished file into the content-addressed store and returns its
+    StoredFile. If the same content is already stored, the new copy is
+    dropped and the existing row is returned.
+    """
+    with open(path, 'rb') as f:
+        if f.read(5) != b'%PDF-':
+            os.remove(path)
+            raise UploadError('The file is not a PDF.')
+    sha256 = hash_file(path)
+    existing = StoredFile.objects.filter(sha256=sha256).first()
+    if existing is not None:
+        os.remove(path)
+        return existing
+    name = blob_name(sha256)
+    os.makedirs(os.path.dirname(media_path(name)), exist_ok=True)
+    size = os.path.getsize(path)
+    os.replace(path, media_path(name))
+    try:
+        with transaction.atomic():
+            return StoredFile.objects.create(sha256=sha256, size=size, file=name)
+    except IntegrityError:
+        # Another upload of the same content finished first; the file on
+        # disk is identical, so theirs and ours are interchangeable.
+        return StoredFile.objects.get(sha256=sha256)
+
+
+def store_uploaded_file(upload):
+    # Single-request uploads (multipart 'file') take the same route.
+    os.makedirs(media_path(PARTIAL_DIR), exist_ok=True)
+    path = media_path(os.path.join(PARTIAL_DIR, f'{uuid.uuid4()}.part'))
+    with open(path, 'wb') as out:
+        for chunk in upload.chunks(READ_SIZE):
+            out.write(chunk)
+    return store_file(path)
+
+
+def write_chunk(session, content_range, stream):
+    """
+    Appends one chunk to an upload. Chunks must arrive in order: the range has
+    to start where the previous one ended, which is what GET on the session
+    reports, so an interrupted client resumes from there.
+
+    The body is first spooled to its own file; only the request that wins the
+    conditional UPDATE on `received` appends it, so two clients retrying the
+    same chunk can never interleave their bytes.
+    """
+    match = CONTENT_RANGE.match(content_range or '')
+    if not match:
+        raise UploadError('A Content-Range header of the form "bytes start-end/total" is required.')
+    start, end, total = map(int, match.groups())
+    if total != session.size or end < start or end >= total:
+        raise UploadError('The Content-Range does not fit this upload.', status=416)
+    if end - start + 1 > CHUNK_SIZE:
+        raise UploadError(f'Chunks may be at most {CHUNK_SIZE} bytes.', status=413)
+    if session.stored_file_id is not None:
+        raise UploadError('This upload is already complete.', status=409)
+
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A crash between claiming a chunk and appending it leaves the file short;
+    # trust the file and let the client resend from there.
+    on_disk = os.path.getsize(path) if os.path.exists(path) else 0
+    if on_disk < session.received:
+        UploadSession.objects.filter(pk=session.pk).update(received=on_disk)
+        session.received = on_disk
+    if start != session.received:
+        raise UploadError(f'Expected the chunk starting at byte {session.received}.', status=409)
+
+    length = end - start + 1
+    chunk_path = f'{path}.{uuid.uuid4().hex}'
+    written = 0
+    try:
+        with open(chunk_path, 'wb') as out:
+            while written < length:
+                block = stream.read(min(READ_SIZE, length - written))
+                if not block:
+                    break
+                out.write(block)
+                written += len(block)
+        if written != length:
+            raise UploadError('The body is shorter than the Content-Range.')
+        if not UploadSession.objects.filter(pk=session.pk, received=start).update(received=end + 1):
+            raise UploadError('Another request uploaded this chunk first.', status=409)
+        with open(path, 'ab') as out, open(chunk_path, 'rb') as chunk:
+            out.truncate(start)
+            for block in iter(lambda: chunk.read(READ_SIZE), b''):
+                out.write(block)
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+
+    session.received = end + 1
+    if session.received == session.size:
+        session.stored_file = store_file(path)
+        session.save(update_fields=['stored_file'])
+    return session
+
+
+# --- Serving ---
+
+def _parse_range(header, size):
+    # Returns (start, end) for a single "bytes=" range, None to serve the whole
+    # file, or False if the range cannot be satisfied.
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class FileRange:
+    # A file opened at `start` that reads no further than `end`. FileResponse
+    # passes it to the WSGI server's file wrapper, which sendfile()s from the
+    # current offset for Content-Length bytes, so ranges are zero-copy too.
+    # No tell()/seek(): FileResponse would take the length from the whole file.
+    def __init__(self, path, start, end):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        block = self.file.read(size)
+        self.remaining -= len(block)
+        return block
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def ranged_file_response(request, stored_file, filename):
+    """
+    Serves a stored PDF. Responses are FileResponses, which WSGI servers hand
+    to sendfile() (zero-copy). Single byte ranges are answered with 206
+    Partial Content so a viewer can fetch a large PDF page by page.
+    """
+    path = media_path(stored_file.file.name)
+    size = stored_file.size
+    etag = f'"{stored_file.sha256}"'
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        # Clients revalidate with the content hash, which is a cheap 304.
+        'Cache-Control': 'private, no-cache',
+    }
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponse(status=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=filename)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(path, start, end), status=206, content_type='application/pdf')
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+# --- Expiry ---
+
+def expire_uploads(max_age):
+    """
+    Deletes upload sessions started more than `max_age` ago and sweeps
+    MEDIA_ROOT/partial of files no remaining session owns: the partial files
+    of those sessions, chunk spools and single-request uploads left by a
+    crash. A session whose file was written to within `max_age` is still in
+    use and kept. Returns the number of sessions deleted.
+    """
+    cutoff = timezone.now() - max_age
+    directory = media_path(PARTIAL_DIR)
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+
+    def modified_since_cutoff(path):
+        try:
+            return os.path.getmtime(path) >= cutoff.timestamp()
+        except FileNotFoundError:
+            return False
+
+    expired = [
+        session.pk for session in UploadSession.objects.filter(created_at__lt=cutoff).only('pk')
+        if not modified_since_cutoff(partial_path(session))
+    ]
+    deleted, _ = UploadSession.objects.filter(pk__in=expired).delete()
+    kept = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+    for name in names:
+        path = os.path.join(directory, name)
+        if name.split('.', 1)[0] not in kept and not modified_since_cutoff(path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return deleted
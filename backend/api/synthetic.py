@@ -0,0 +1,118 @@
+# In backend/api/synthetic.py
+
+import random
+import zlib
+from django.db import transaction
+from .models import *
+from .cache import bump_area_version
+from .duplicates import index_fingerprints
+from .jobs import queue_related_update
+from .search import get_search_backend
+from .stats import refresh_area_stats
+
+# Deterministic synthetic areas for the bench command: every resource type,
+# notes, tasks, canvas items and a dense connection graph. Everything is
+# written with bulk_create, so seeding 100k resources takes seconds.
+
+WORDS = (
+    'algebra graph theory learning neural network distributed systems compiler design '
+    'probability statistics topology category lambda calculus database query optimization '
+    'cryptography protocol verification type inference functional programming operating '
+    'kernel memory cache scheduling numerical analysis linear geometry quantum information'
+).split()
+SURNAMES = 'Knuth Turing Hopper Lovelace Dijkstra Liskov Church Shannon Codd Lamport'.split()
+RESOURCE_TYPES = [choice for choice, _ in Resource.RESOURCE_TYPES]
+LABELS = ['cites', 'extends', 'prerequisite', 'related', 'contradicts']
+BATCH_SIZE = 2000
+
+
+def _phrase(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _detail(rng, resource):
+    resource_type = resource.resource_type
+    if resource_type == 'course':
+        return Course(resource=resource, lecturer=f'Prof. {rng.choice(SURNAMES)}', website='https://example.com/course')
+    if resource_type == 'book':
+        return Book(resource=resource, authors=', '.join(rng.sample(SURNAMES, 2)), url='https://example.com/book')
+    if resource_type == 'paper':
+        return Paper(resource=resource, authors=', '.join(rng.sample(SURNAMES, 3)), publication_year=rng.randint(1950, 2025))
+    if resource_type == 'web':
+        return WebResource(resource=resource, url=f'https://example.com/{resource.pk}')
+    return PDFResource(resource=resource)
+
+
+def seed_area(slug, resources=1000, degree=5, notes_per_resource=1, tasks_per_resource=1, seed=0):
+    """
+    Creates an area with `resources` resources spread over every type, each
+    with a detail row, a canvas item, notes and tasks, and about `degree`
+    outgoing connections to other resources of the area.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        area = AcademicArea.objects.create(name=f'Synthetic {slug}', slug=slug, description='Generated by api.synthetic.')
+        created = []
+        for start in range(0, resources, BATCH_SIZE):
+            batch = Resource.objects.bulk_create([
+                Resource(area=area, title=_phrase(rng, 2, 6).title(), resource_type=RESOURCE_TYPES[i % len(RESOURCE_TYPES)])
+                for i in range(start, min(start + BATCH_SIZE, resources))
+            ])
+            details = {}
+            for resource in batch:
+                child = _detail(rng, resource)
+                details.setdefault(type(child), []).append(child)
+            for model, rows in details.items():
+                model.objects.bulk_create(rows)
+            created.extend(batch)
+
+        CanvasItem.objects.bulk_create(
+            (CanvasItem(area=area, resource=r, pos_x=rng.randint(0, 4000), pos_y=rng.randint(0, 4000)) for r in created),
+            batch_size=BATCH_SIZE,
+        )
+        Note.objects.bulk_create(
+            (Note(area=area, resource=r, content=_phrase(rng, 20, 60)) for r in created for _ in range(notes_per_resource)),
+            batch_size=BATCH_SIZE,
+        )
+        Task.objects.bulk_create(
+            (
+                Task(area=area, resource=r, description=f'Review {r.title}', is_completed=rng.random() < 0.3)
+                for r in created for _ in range(tasks_per_resource)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        if len(created) > 1:
+            ResourceConnection.objects.bulk_create(
+                (
+                    ResourceConnection(area=area, source=source, target=target, label=rng.choice(LABELS))
+                    for i, source in enumerate(created)
+                    for target in {created[(i + rng.randint(1, len(created) - 1)) % len(created)] for _ in range(degree)}
+                ),
+                batch_size=BATCH_SIZE,
+            )
+
+        # bulk_create skips the signals that maintain the index, stats and version.
+        search = get_search_backend()
+        search.index_resources([r.id for r in created])
+        index_fingerprints([r.id for r in created])
+        queue_related_update([r.id for r in created])
+        search.index_notes(Note.objects.filter(area=area).values_list('id', flat=True))
+        refresh_area_stats(area.id)
+        bump_area_version(area.id)
+    return area
+
+
+def synthetic_pdf(pages):
+    # A minimal valid PDF with one Flate-compressed content stream per page,
+    # each page showing the given text and a second line.
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode())
+    for i, text in enumerate(pages):
+        content = zlib.compress(f'BT /F1 12 Tf 72 712 Td ({text}) Tj T* [(Second) -250 (line)] TJ ET'.encode())
+        objects.append(f'<< /Type /Page /Parent 2 0 R /Contents {4 + 2 * i} 0 R >>'.encode())
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream')
+    body = b'%PDF-1.4\n'
+    for number, obj in enumerate(objects, start=1):
+        body += b'%d 0 obj\n' % number + obj + b'\nendobj\n'
+    return body + b'trailer\n<< /Root 1 0 R >>\n%%EOF\n'
@@ -1,3 +1,1968 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .areas import clone_area, delete_area
+from .backup import _line
+from .cache import area_cache
+from .changes import compact_change_log
+from .events import RESYNC, LocalBroker, get_broker
+from .fastpath import area_payload
+from .duplicates import duplicate_clusters, find_duplicates, rebuild_fingerprints
+from .jobs import JOB_TYPES, JobRunner, JobType, enqueue, job_type
+from .links import _is_public, check_links
+from .loaders import DETAIL_RELATIONS, load_resource_details, workspace_queryset
+from .metrics import histograms
+from .notes import NoteError, NoteSaver, apply_patches
+from .models import *
+from .pdf import extract_pdf_text
+from .related import RelatedIndex, rebuild_related, related_to, update_related
+from .renderers import FastJSONRenderer
+from .serializers import AcademicAreaDetailSerializer
+from .routers import ReadWriteRouter
+from .sqlite import retry_when_locked
+from .storage import ranged_file_response
+from .stats import refresh_area_stats
+from .synthetic import seed_area, synthetic_pdf
+
+DETAIL_MODELS = {
+    'course': (Course, {'lecturer': 'Dr. Ada', 'website': 'https://example.com/course'}),
+    'book': (Book, {'authors': 'Knuth', 'url': 'https://example.com/book'}),
+    'paper': (Paper, {'authors': 'Turing', 'publication_year': 1950}),
+    'web': (WebResource, {'url': 'https://example.com'}),
+    'pdf': (PDFResource, {}),
+}
+
+
+def populate_area(area, count):
+    # Spread the resources over every type and give each one a canvas item,
+    # a task, a note and a connection to its predecessor.
+    types = list(DETAIL_MODELS)
+    resources = Resource.objects.bulk_create([
+        Resource(area=area, title=f'Resource {i}', resource_type=types[i % len(types)])
+        for i in range(count)
+    ])
+    for resource_type, (model, fields) in DETAIL_MODELS.items():
+        model.objects.bulk_create([
+            model(resource=r, **fields) for r in resources if r.resource_type == resource_type
+        ])
+    CanvasItem.objects.bulk_create([
+        CanvasItem(area=area, resource=r, pos_x=i, pos_y=i) for i, r in enumerate(resources)
+    ])
+    Task.objects.bulk_create([
+        Task(area=area, resource=r, description=f'Read {r.title}') for r in resources
+    ])
+    Note.objects.bulk_create([
+        Note(area=area, resource=r, content=f'Notes on {r.title}') for r in resources
+    ])
+    ResourceConnection.objects.bulk_create([
+        ResourceConnection(area=area, source=a, target=b, label='next')
+        for a, b in zip(resources, resources[1:])
+    ])
+    # bulk_create skips the signals that keep the counters, as in the bulk paths.
+    refresh_area_stats(area.id)
+    return resources
+
+
+class AreaWorkspaceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+
+    def count_area_queries(self, slug):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/areas/{slug}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response.json()
+
+    def test_query_count_is_constant_as_area_grows(self):
+        small = AcademicArea.objects.create(name='Small', slug='small')
+        large = AcademicArea.objects.create(name='Large', slug='large')
+        populate_area(small, 10)
+        populate_area(large, 10000)
+
+        small_queries, small_payload = self.count_area_queries('small')
+        large_queries, large_payload = self.count_area_queries('large')
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(len(small_payload['resources']), 10)
+        self.assertEqual(len(large_payload['resources']), 10000)
+        self.assertEqual(len(large_payload['canvas_items']), 10000)
+        self.assertEqual(len(large_payload['connections']), 9999)
+
+    def test_payload_shape(self):
+        area = AcademicArea.objects.create(name='Shape', slug='shape')
+        populate_area(area, 5)
+        # A resource without its detail row still serializes.
+        Resource.objects.create(area=area, title='Orphan', resource_type='book')
+
+        _, payload = self.count_area_queries('shape')
+
+        by_title = {r['title']: r for r in payload['resources']}
+        self.assertEqual(by_title['Resource 1']['details'], {
+            'authors': 'Knuth', 'url': 'https://example.com/book', 'link_status': None, 'link_checked_at': None,
+        })
+        self.assertEqual(by_title['Resource 2']['details'], {'authors': 'Turing', 'publication_year': 1950})
+        self.assertIsNone(by_title['Orphan']['details'])
+        item = payload['canvas_items'][0]
+        self.assertEqual(item['resource'], {'id': item['resource']['id'], 'title': 'Resource 0', 'resource_type': 'course'})
+
+
+class ResourceDetailLoaderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Loader', slug='loader')
+
+    def test_resource_list_uses_one_query_per_type(self):
+        populate_area(self.area, 10)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/resources/?page_size=1000')
+        populate_area(self.area, 200)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/resources/?page_size=1000')
+
+        self.assertEqual(len(small), len(large))
+        # One query for the resources and one per detail table.
+        self.assertEqual(len(large), 1 + len(DETAIL_MODELS))
+        self.assertEqual(len(response.json()['results']), 210)
+
+    def test_load_resource_details_caches_missing_children(self):
+        populate_area(self.area, 5)
+        Resource.objects.create(area=self.area, title='Orphan', resource_type='web')
+        resources = load_resource_details(list(Resource.objects.all()))
+
+        with self.assertNumQueries(0):
+            for resource in resources:
+                relation = DETAIL_RELATIONS[resource.resource_type]
+                if resource.title == 'Orphan':
+                    with self.assertRaises(ObjectDoesNotExist):
+                        getattr(resource, relation)
+                else:
+                    self.assertIsNotNone(getattr(resource, relation))
+
+
+class ListEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Lists', slug='lists')
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+        populate_area(self.area, 25)
+        populate_area(self.other, 5)
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids.extend(row['id'] for row in page['results'])
+            url = page['next']
+        return ids
+
+    def test_cursor_pages_cover_every_row_once_in_order(self):
+        for endpoint in ['resources', 'notes', 'tasks', 'canvas-items', 'connections']:
+            ids = self.collect_pages(f'/api/{endpoint}/?page_size=7')
+            self.assertEqual(ids, sorted(set(ids)), endpoint)
+
+        self.assertEqual(len(self.collect_pages('/api/resources/?page_size=7')), 30)
+
+    def test_area_filter_accepts_id_or_slug(self):
+        by_slug = self.collect_pages('/api/tasks/?area=other')
+        by_id = self.collect_pages(f'/api/tasks/?area={self.other.id}')
+        self.assertEqual(by_slug, by_id)
+        self.assertEqual(len(by_slug), 5)
+
+    def test_sparse_fieldset_skips_details(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/resources/?area=lists&fields=id,title')
+        rows = response.json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'title'})
+        # Without details no detail table is touched.
+        self.assertEqual(len(ctx), 1)
+
+        response = self.client.get('/api/canvas-items/?fields=id,pos_x')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'pos_x'})
+
+    def test_sparse_fieldset_does_not_apply_to_writes(self):
+        response = self.client.post('/api/tasks/?fields=id', {'area': self.area.id, 'description': 'Read'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(pk=response.json()['id']).area, self.area)
+        response = self.client.post('/api/notes/?fields=id', {'area': self.area.id, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        resource = Resource.objects.filter(area=self.area).first()
+        response = self.client.patch(f'/api/resources/{resource.id}/?fields=id', {'title': 'New'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Resource.objects.get(pk=resource.id).title, 'New')
+
+    def test_indexed_filters(self):
+        self.assertEqual(len(self.collect_pages('/api/resources/?area=lists&resource_type=book')), 5)
+        Task.objects.filter(area=self.area, id__in=Task.objects.filter(area=self.area).values('id')[:4]).update(is_completed=True)
+        self.assertEqual(len(self.collect_pages('/api/tasks/?area=lists&is_completed=true')), 4)
+        self.assertEqual(len(self.collect_pages('/api/tasks/?area=lists&is_completed=false')), 21)
+        self.assertEqual(self.collect_pages('/api/notes/?updated_after=2999-01-01T00:00:00Z'), [])
+
+        response = self.client.get('/api/tasks/?is_completed=maybe')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('is_completed', response.json())
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Import', slug='import')
+
+    def test_bulk_json_rows_report_errors_per_row(self):
+        rows = [
+            {'title': 'SICP', 'resource_type': 'book', 'authors': 'Abelson, Sussman'},
+            {'title': 'No type'},
+            {'title': 'Attention', 'resource_type': 'paper', 'publication_year': 2017},
+        ]
+        response = self.client.post('/api/resources/bulk/?area=import', rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(response.json()['errors'][0]['line'], 2)
+        self.assertIn('resource_type', response.json()['errors'][0]['errors'])
+        self.assertEqual(Book.objects.get().authors, 'Abelson, Sussman')
+        self.assertEqual(Paper.objects.get().publication_year, 2017)
+
+    def test_bulk_json_body_is_read_a_row_at_a_time(self):
+        rows = [{'title': f'Site {i}', 'resource_type': 'web', 'url': f'https://example.com/{i}'} for i in range(40)]
+        with mock.patch('api.ingest.JSON_READ_SIZE', 16), \
+                mock.patch('rest_framework.parsers.JSONParser.parse', side_effect=AssertionError('parsed whole')):
+            response = self.client.post('/api/resources/bulk/?area=import', rows, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 40)
+
+        response = self.client.post('/api/resources/bulk/?area=import', '[{"title": "Ok", "resource_type": "web"}, {',
+                                    content_type='application/json')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['line'], 2)
+        response = self.client.post('/api/resources/bulk/?area=import', {'title': 'Not a list'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_create_rejects_an_unknown_area(self):
+        for area in (9999, 'import', None):
+            response = self.client.post('/api/resources/', {'area': area, 'title': 'Lost', 'resource_type': 'book'}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Resource.objects.exists())
+        response = self.client.post('/api/resources/', {'area': self.area.pk, 'title': 'Found', 'resource_type': 'book'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_upload_csv_in_batches(self):
+        lines = ['title,resource_type,url'] + [f'Site {i},web,https://example.com/{i}' for i in range(25)]
+        upload = SimpleUploadedFile('links.csv', '\n'.join(lines).encode())
+
+        response = self.client.post('/api/resources/bulk/', {'area': 'import', 'file': upload})
+
+        self.assertEqual(response.json()['created'], 25)
+        self.assertEqual(WebResource.objects.filter(resource__area=self.area).count(), 25)
+
+    def test_import_command_reads_bibtex(self):
+        bib = (
+            '@article{turing, title={Computing Machinery and {Intelligence}},\n'
+            '  author={Alan Turing}, year=1950}\n'
+            '@book{knuth, title="The Art of Computer Programming", author={Donald Knuth}}\n'
+            '@book{empty, author={Nobody}}\n'
+        )
+        with tempfile.NamedTemporaryFile('w', suffix='.bib', delete=False) as f:
+            f.write(bib)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_resources', f.name, area='import', batch_size=1, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(
+            sorted(Resource.objects.values_list('title', 'resource_type')),
+            [('Computing Machinery and Intelligence', 'paper'), ('The Art of Computer Programming', 'book')],
+        )
+        self.assertEqual(Paper.objects.get().authors, 'Alan Turing')
+
+
+class CanvasPositionsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Canvas', slug='canvas')
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+        populate_area(self.area, 50)
+        populate_area(self.other, 1)
+
+    def test_positions_are_applied_in_one_update(self):
+        items = list(CanvasItem.objects.filter(area=self.area))
+        payload = {
+            'area': self.area.id,
+            'positions': [{'id': item.id, 'pos_x': 1000 + i, 'pos_y': -i} for i, item in enumerate(items)],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/canvas-items/positions/', payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'updated': 50})
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_canvasitem"')]
+        self.assertEqual(len(updates), 1)
+        moved = CanvasItem.objects.get(pk=items[7].id)
+        self.assertEqual((moved.pos_x, moved.pos_y), (1007, -7))
+
+    def test_items_from_another_area_reject_the_whole_batch(self):
+        mine = CanvasItem.objects.filter(area=self.area).first()
+        foreign = CanvasItem.objects.get(area=self.other)
+        payload = {
+            'area': self.area.id,
+            'positions': [
+                {'id': mine.id, 'pos_x': 1, 'pos_y': 1},
+                {'id': foreign.id, 'pos_x': 2, 'pos_y': 2},
+            ],
+        }
+        response = self.client.post('/api/canvas-items/positions/', payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ids'], [foreign.id])
+        mine.refresh_from_db()
+        self.assertNotEqual((mine.pos_x, mine.pos_y), (1, 1))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Search', slug='search')
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+
+    def add(self, area, title, resource_type='book', **details):
+        return self.client.post('/api/resources/', {'area': area.id, 'title': title, 'resource_type': resource_type, **details}).json()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranked_prefix_search_over_titles_authors_and_notes(self):
+        book = self.add(self.area, 'Structure and Interpretation of Computer Programs', authors='Abelson, Sussman')
+        paper = self.add(self.area, 'On Computable Numbers', 'paper', authors='Alan Turing')
+        Note.objects.create(area=self.area, content='Turing machines are covered in chapter two.')
+
+        self.assertEqual([r['id'] for r in self.search('sussman')], [book['id']])
+        self.assertEqual([r['id'] for r in self.search('interp')], [book['id']])
+        # A title/author hit outranks a mention in a note.
+        results = self.search('turing')
+        self.assertEqual([(r['type'], r['id']) for r in results][0], ('resource', paper['id']))
+        self.assertEqual([r['type'] for r in results], ['resource', 'note'])
+        self.assertEqual(self.search('turing', type='note')[0]['type'], 'note')
+
+    def test_index_follows_updates_deletes_and_area_scope(self):
+        mine = self.add(self.area, 'Deep Learning')
+        self.add(self.other, 'Deep Learning Book')
+        self.assertEqual(len(self.search('deep')), 2)
+        self.assertEqual([r['id'] for r in self.search('deep', area='search')], [mine['id']])
+
+        self.client.patch(f"/api/resources/{mine['id']}/", {'title': 'Pattern Recognition'}, format='json')
+        self.assertEqual([r['id'] for r in self.search('pattern')], [mine['id']])
+        self.assertEqual(len(self.search('deep')), 1)
+
+        self.client.delete(f"/api/resources/{mine['id']}/")
+        self.assertEqual(self.search('pattern'), [])
+
+    def test_rebuild_command_indexes_existing_rows(self):
+        populate_area(self.area, 10)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM api_search_index')
+        self.assertEqual(self.search('knuth'), [])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        self.assertEqual(len(self.search('knuth')), 2)
+        self.assertEqual(len(self.search('notes resource', type='note')), 10)
+
+    def test_fallback_backend_matches_fts(self):
+        from .search import DatabaseSearchBackend
+        book = self.add(self.area, 'Gödel, Escher, Bach', authors='Douglas Hofstadter')
+        results = DatabaseSearchBackend().search('hofst', area_id=self.area.id)
+        self.assertEqual([r['id'] for r in results], [book['id']])
+
+
+class AreaCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Cached', slug='cached')
+        self.resources = populate_area(self.area, 10)
+
+    def get(self, **headers):
+        return self.client.get('/api/areas/cached/', headers=headers)
+
+    def test_repeat_loads_cost_one_query_and_honour_if_none_match(self):
+        first = self.get()
+        etag = first['ETag']
+
+        with self.assertNumQueries(1):
+            cached = self.get()
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached['ETag'], etag)
+
+        with self.assertNumQueries(1):
+            not_modified = self.get(if_none_match=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_every_kind_of_write_invalidates(self):
+        etag = self.get()['ETag']
+        resource = self.resources[0]
+        writes = [
+            lambda: self.client.post('/api/tasks/', {'area': self.area.id, 'description': 'New'}),
+            lambda: self.client.patch(f'/api/resources/{resource.id}/', {'title': 'Renamed'}, format='json'),
+            lambda: Book.objects.filter(resource__area=self.area).first().save(),
+            lambda: self.client.post('/api/notes/', {'area': self.area.id, 'content': 'Hi'}),
+            lambda: self.client.post('/api/canvas-items/positions/', {
+                'area': self.area.id,
+                'positions': [{'id': CanvasItem.objects.filter(area=self.area).first().id, 'pos_x': 5, 'pos_y': 5}],
+            }, format='json'),
+            lambda: self.client.patch('/api/areas/cached/', {'name': 'Renamed area'}, format='json'),
+            lambda: self.client.delete(f'/api/resources/{resource.id}/'),
+        ]
+        for write in writes:
+            write()
+            response = self.get(if_none_match=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+        payload = self.get().json()
+        self.assertEqual(payload['name'], 'Renamed area')
+        self.assertNotIn(resource.id, [r['id'] for r in payload['resources']])
+
+    def test_stale_instance_save_does_not_roll_back_the_version(self):
+        stale = AcademicArea.objects.get(pk=self.area.pk)
+        Task.objects.create(area=self.area, description='Bump')
+        before = AcademicArea.objects.get(pk=self.area.pk).version
+        stale.description = 'Edited'
+        stale.save()
+        self.assertEqual(AcademicArea.objects.get(pk=self.area.pk).version, before + 1)
+
+
+class GraphTests(TestCase):
+    def setUp(self):
+        from .graph import graph_index
+        self.client = APIClient()
+        self.index = graph_index()
+        self.index.seq = None
+        self.area = AcademicArea.objects.create(name='Graph', slug='graph')
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+        # populate_area chains each resource to the next one.
+        self.chain = populate_area(self.area, 6)
+        self.island = populate_area(self.other, 3)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_neighbourhood_and_path(self):
+        middle = self.chain[2]
+        data = self.get('/api/graph/neighbourhood/', resource=middle.id, depth=2)
+        depths = {node['id']: node['depth'] for node in data['nodes']}
+        expected = {r.id: abs(i - 2) for i, r in enumerate(self.chain) if abs(i - 2) <= 2}
+        self.assertEqual(depths, expected)
+        self.assertEqual(len(data['edges']), 4)
+
+        data = self.get('/api/graph/path/', source=self.chain[0].id, target=self.chain[5].id)
+        self.assertEqual([n['id'] for n in data['nodes']], [r.id for r in self.chain])
+        self.assertEqual(data['length'], 5)
+
+        data = self.get('/api/graph/path/', source=self.chain[0].id, target=self.island[0].id)
+        self.assertIsNone(data['length'])
+
+    def test_components_and_cross_area_edges(self):
+        data = self.get('/api/graph/components/')
+        self.assertEqual([c['size'] for c in data['components']], [6, 3])
+        self.assertEqual(self.get('/api/graph/components/', area='other')['count'], 1)
+
+        self.client.post('/api/connections/', {
+            'area': self.area.id, 'source': self.chain[5].id, 'target': self.island[0].id, 'label': 'cites',
+        })
+        data = self.get('/api/graph/components/')
+        self.assertEqual([c['size'] for c in data['components']], [9])
+
+    def test_global_graph_pages_without_a_query_per_edge(self):
+        populate_area(self.area, 300)
+        self.get('/api/graph/')  # warm the index
+        seen, after = [], 0
+        while after is not None:
+            with CaptureQueriesContext(connection) as ctx:
+                page = self.get('/api/graph/', after=after, limit=100)
+            # The change check (area horizons, connection entries) and the node descriptions.
+            self.assertEqual(len(ctx), 3)
+            self.assertTrue({e['source'] for e in page['edges']} <= {n['id'] for n in page['nodes']})
+            seen.extend(e['id'] for e in page['edges'])
+            after = page['next']
+        self.assertEqual(seen, sorted(ResourceConnection.objects.values_list('id', flat=True)))
+
+    def test_connection_writes_update_the_index_incrementally(self):
+        self.index.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            connection_row = ResourceConnection.objects.create(
+                area=self.other, source=self.island[0], target=self.island[2], label='loop',
+            )
+        self.assertIn(connection_row.id, self.index.edges)
+        with self.captureOnCommitCallbacks(execute=True):
+            edge_id = connection_row.id
+            connection_row.delete()
+        self.assertNotIn(edge_id, self.index.edges)
+        self.assertEqual(len(self.index.area_edges[self.other.id]), 2)
+
+    def test_refresh_reloads_only_changed_edges(self):
+        # Writes committed by another process: no on_commit callback here.
+        self.index.refresh()
+        edge = ResourceConnection.objects.get(source=self.island[0])
+        edge.label = 'renamed'
+        edge.save()
+        Note.objects.create(area=self.area, content='Unrelated write')
+        with mock.patch.object(self.index, '_load_areas', wraps=self.index._load_areas) as load_areas:
+            self.index.refresh()
+        load_areas.assert_not_called()
+        self.assertEqual(self.index.edges[edge.id][3], 'renamed')
+
+        edge_id = edge.id
+        edge.delete()
+        self.index.refresh()
+        self.assertNotIn(edge_id, self.index.edges)
+
+        # A new area and a deleted one are (un)loaded whole.
+        clone, _ = clone_area(self.other, 'copy')
+        delete_area(self.area.id)
+        self.index.refresh()
+        self.assertEqual(len(self.index.area_edges[clone.id]), 1)
+        self.assertNotIn(self.area.id, self.index.area_edges)
+        self.assertEqual(set(self.index.edges), set(ResourceConnection.objects.values_list('id', flat=True)))
+
+    def test_rolled_back_writes_stay_out_of_the_index(self):
+        self.index.refresh()
+        kept = ResourceConnection.objects.get(source=self.island[0])
+        kept_id = kept.id
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                added = ResourceConnection.objects.create(area=self.other, source=self.island[0], target=self.island[2])
+                kept.delete()
+                raise RuntimeError
+        self.index.refresh()
+        self.assertNotIn(added.id, self.index.edges)
+        self.assertIn(kept_id, self.index.edges)
+        self.assertEqual(len(self.index.area_edges[self.other.id]), 2)
+
+
+class BackupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Backup', slug='backup', description='Original')
+        populate_area(self.area, 20)
+        Note.objects.create(area=self.area, content='Loose note')
+        Task.objects.create(area=self.area, description='Loose task', is_completed=True)
+
+    def export(self):
+        response = self.client.get('/api/areas/backup/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def normalized(self, slug):
+        # The area payload with every id replaced by the title it points to.
+        payload = self.client.get(f'/api/areas/{slug}/').json()
+        titles = {r['id']: r['title'] for r in payload['resources']}
+        return {
+            'resources': sorted((r['title'], r['resource_type'], str(r['details'])) for r in payload['resources']),
+            'canvas': sorted((i['resource']['title'], i['pos_x'], i['pos_y']) for i in payload['canvas_items']),
+            'connections': sorted((titles[c['source']], titles[c['target']], c['label']) for c in payload['connections']),
+            'tasks': sorted((titles.get(t['resource'], ''), t['description'], t['is_completed']) for t in payload['tasks']),
+            'notes': sorted((titles.get(n['resource'], ''), n['content'], n['updated_at']) for n in payload['notes']),
+        }
+
+    def test_export_import_round_trip(self):
+        backup = self.export()
+        self.assertEqual(backup.count('\n'), 2 + 20 * 5 - 1 + 2)
+
+        upload = SimpleUploadedFile('backup.ndjson', backup.encode())
+        response = self.client.post('/api/areas/import/', {'file': upload, 'slug': 'restored'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['counts']['resource'], 20)
+
+        self.assertEqual(self.normalized('restored'), self.normalized('backup'))
+        self.assertEqual(AcademicArea.objects.get(slug='restored').description, 'Original')
+
+    def test_export_queries_are_chunked_not_per_row(self):
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        populate_area(self.area, 200)
+        with CaptureQueriesContext(connection) as large:
+            self.export()
+        self.assertEqual(len(small), len(large))
+
+    def test_import_command_is_all_or_nothing(self):
+        lines = self.export().splitlines(keepends=True)
+        broken = lines + ['{"type": "note", "data": {"id": 1, "resource_id": 999999, "content": "x",'
+                          ' "created_at": null, "updated_at": null}}\n']
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.writelines(broken)
+        self.addCleanup(os.remove, f.name)
+
+        with self.assertRaises(CommandError):
+            call_command('import_area', f.name, slug='broken', stdout=io.StringIO())
+        self.assertFalse(AcademicArea.objects.filter(slug='broken').exists())
+        self.assertEqual(Resource.objects.count(), 20)
+
+    def test_pdfs_travel_with_the_backup(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        content = synthetic_pdf(['First page', 'Second page'])
+        upload = SimpleUploadedFile('paper.pdf', content, content_type='application/pdf')
+        for title in ['Paper', 'Same paper']:
+            response = self.client.post('/api/resources/', {'area': self.area.id, 'title': title, 'resource_type': 'pdf', 'file': upload})
+            self.assertEqual(response.status_code, 201, response.content)
+            upload.seek(0)
+        with mock.patch('api.backup.BLOB_CHUNK', 100):
+            backup = self.export()
+        self.assertNotIn('stored_file_id', backup)
+        self.assertEqual(backup.count('"type": "blob"'), -(-len(content) // 100))
+
+        # A fresh instance: neither the row nor the file exists.
+        stored = StoredFile.objects.get()
+        path = stored.file.path
+        AcademicArea.objects.filter(slug='backup').delete()
+        stored.delete()
+        os.remove(path)
+
+        upload = SimpleUploadedFile('backup.ndjson', backup.encode())
+        response = self.client.post('/api/areas/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201, response.content)
+        stored = StoredFile.objects.get()
+        self.assertEqual(PDFResource.objects.filter(stored_file=stored).count(), 2)
+        with open(stored.file.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(os.listdir(os.path.join(media.name, 'partial')), [])
+
+        # Where the content is stored already, the blob lines are skipped.
+        upload = SimpleUploadedFile('backup.ndjson', backup.encode())
+        response = self.client.post('/api/areas/import/', {'file': upload, 'slug': 'again'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_malformed_backups_are_rejected(self):
+        header = '{"type": "header", "format": "academic-library-area", "version": 1}\n'
+        area = '{"type": "area", "data": {"slug": "broken"}}\n'
+        book = {'id': 1, 'title': 'Book', 'resource_type': 'book', 'details': None}
+        pdf = {'id': 2, 'title': 'PDF', 'resource_type': 'pdf', 'details': {'stored_file_id': 999}}
+        cases = {
+            '[1, 2]\n': 'Line 1',
+            '"str"\n': 'Line 1',
+            header + '{"type": "area"}\n': 'Line 2',
+            header + area + '{"type": "resource", "data": {"id": 1}}\n': 'Line 3',
+            header + area + '{"type": "resource", "data": [1]}\n': 'Line 3',
+            header + area + _line('resource', book) + _line('resource', book): 'Line 4',
+            header + area + _line('resource', {**book, 'details': 'x'}): 'Line 3',
+            header + area + _line('resource', pdf): 'Line 3',
+            header + area + _line('resource', {**book, 'id': [1]}): 'Line 3',
+            header + area + _line('resource', book) + _line('note', {'resource_id': 'x'}): 'Line 4',
+            header + area + _line('resource', {**book, 'resource_type': 'paper', 'details': {'publication_year': 'x'}}): 'Lines 3-3',
+            header + area + _line('resource', {**pdf, 'details': {'stored_file_sha256': 'a' * 64}}): 'Line 3',
+            header + area + _line('blob', {'sha256': 'a' * 64, 'offset': 0, 'content': '%%%'}): 'Line 3',
+            header + area + _line('blob', {'sha256': 'a' * 64, 'offset': 5, 'content': ''}): 'Line 3',
+        }
+        for backup, where in cases.items():
+            upload = SimpleUploadedFile('backup.ndjson', backup.encode())
+            response = self.client.post('/api/areas/import/', {'file': upload})
+            self.assertEqual(response.status_code, 400, backup)
+            self.assertIn(where, response.json()['error'])
+
+        upload = SimpleUploadedFile('backup.ndjson', header.encode() + b'\xff\xfe\n')
+        response = self.client.post('/api/areas/import/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['error'])
+        self.assertFalse(AcademicArea.objects.filter(slug='broken').exists())
+        self.assertEqual(Resource.objects.count(), 20)
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Async', slug='async')
+        populate_area(self.area, 30)
+        Resource.objects.create(area=self.area, title='Orphan', resource_type='pdf')
+
+    async def test_area_detail_matches_sync_endpoint(self):
+        response = await self.async_client.get('/api/async/areas/async/')
+        self.assertEqual(response.status_code, 200)
+        await area_cache().aclear()
+        sync_response = await sync_to_async(self.client.get)('/api/areas/async/')
+        self.assertEqual(response.content, sync_response.content)
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        self.assertEqual(response['X-Change-Seq'], sync_response['X-Change-Seq'])
+        self.assertNotEqual(response['X-Change-Seq'], '0')
+        for rows in response.json().values():
+            if isinstance(rows, list):
+                self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+
+        not_modified = await self.async_client.get('/api/async/areas/async/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['X-Change-Seq'], response['X-Change-Seq'])
+
+    async def test_resource_list_pages_match_sync_endpoint(self):
+        ids, after = [], 0
+        while after is not None:
+            response = await self.async_client.get('/api/async/resources/', {'area': 'async', 'after': after, 'limit': 7})
+            page = response.json()
+            ids.extend(r['id'] for r in page['results'])
+            after = page['next']
+        sync_rows = (await sync_to_async(self.client.get)('/api/resources/?area=async&page_size=1000')).json()['results']
+        self.assertEqual(ids, [r['id'] for r in sync_rows])
+
+        first = (await self.async_client.get('/api/async/resources/', {'limit': 1000})).json()['results']
+        self.assertEqual(first, sync_rows)
+
+    async def test_search_matches_sync_endpoint(self):
+        await sync_to_async(call_command)('rebuild_search_index', stdout=io.StringIO())
+        response = await self.async_client.get('/api/async/search/', {'q': 'knuth', 'area': 'async'})
+        sync_response = await sync_to_async(self.client.get)('/api/search/', {'q': 'knuth', 'area': 'async'})
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(len(response.json()['results']), 6)
+
+    async def test_bad_parameters_are_refused_like_the_sync_endpoints(self):
+        for params in [{'limit': 'x'}, {'type': 'book'}]:
+            response = await self.async_client.get('/api/async/search/', params)
+            sync_response = await sync_to_async(self.client.get)('/api/search/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), sync_response.json())
+        response = await self.async_client.get('/api/async/resources/', {'after': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'after': 'A valid integer is required.'})
+
+
+class PDFStorageTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.area = AcademicArea.objects.create(name='PDFs', slug='pdfs')
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+        self.content = b'%PDF-1.4\n' + bytes(range(256)) * 400
+
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+
+    def upload(self, content, chunk=30000):
+        session = self.client.post('/api/uploads/', {'filename': 'paper.pdf', 'size': len(content)}, format='json').json()
+        url = f"/api/uploads/{session['id']}/"
+        for start in range(0, len(content), chunk):
+            body = content[start:start + chunk]
+            response = self.client.put(
+                url, body, content_type='application/octet-stream',
+                headers={'Content-Range': f'bytes {start}-{start + len(body) - 1}/{len(content)}'},
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def create_pdf(self, area, upload_id):
+        response = self.client.post(
+            '/api/resources/', {'area': area.id, 'title': 'Paper', 'resource_type': 'pdf', 'upload': upload_id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_resumable_upload(self):
+        session = self.client.post('/api/uploads/', {'filename': 'paper.pdf', 'size': len(self.content)}, format='json').json()
+        url = f"/api/uploads/{session['id']}/"
+        first = self.content[:40000]
+        self.client.put(url, first, content_type='application/octet-stream',
+                        headers={'Content-Range': f'bytes 0-39999/{len(self.content)}'})
+
+        # Out of order chunks are refused, GET tells where to resume.
+        response = self.client.put(url, b'x', content_type='application/octet-stream',
+                                   headers={'Content-Range': f'bytes 50000-50000/{len(self.content)}'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.get(url).json()['received'], 40000)
+
+        rest = self.content[40000:]
+        response = self.client.put(url, rest, content_type='application/octet-stream',
+                                   headers={'Content-Range': f'bytes 40000-{len(self.content) - 1}/{len(self.content)}'})
+        self.assertEqual(response.json()['received'], len(self.content))
+        self.assertEqual(len(response.json()['sha256']), 64)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'partial')), [])
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_pdf(self.area, self.upload(self.content)['id'])
+        second = self.create_pdf(self.other, self.upload(self.content, chunk=50000)['id'])
+        self.assertEqual(StoredFile.objects.count(), 1)
+        self.assertEqual(
+            PDFResource.objects.get(resource_id=first).stored_file_id, PDFResource.objects.get(resource_id=second).stored_file_id
+        )
+
+    def test_range_requests(self):
+        resource_id = self.create_pdf(self.area, self.upload(self.content)['id'])
+        url = f'/api/resources/{resource_id}/file/'
+
+        whole = self.client.get(url)
+        self.assertEqual(whole.status_code, 200)
+        self.assertEqual(b''.join(whole.streaming_content), self.content)
+        self.assertEqual(whole['Accept-Ranges'], 'bytes')
+
+        part = self.client.get(url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(part.status_code, 206)
+        self.assertEqual(part['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(part['Content-Length'], '100')
+        # A file the WSGI server can sendfile() from, already at the offset.
+        stored = PDFResource.objects.get(resource_id=resource_id).stored_file
+        request = RequestFactory().get(url, headers={'Range': 'bytes=100-199'})
+        response = ranged_file_response(request, stored, 'paper.pdf')
+        self.assertEqual(os.lseek(response.file_to_stream.fileno(), 0, os.SEEK_CUR), 100)
+        response.close()
+        self.assertEqual(b''.join(part.streaming_content), self.content[100:200])
+
+        tail = self.client.get(url, headers={'Range': 'bytes=-10'})
+        self.assertEqual(b''.join(tail.streaming_content), self.content[-10:])
+
+        self.assertEqual(self.client.get(url, headers={'Range': f'bytes={len(self.content)}-'}).status_code, 416)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': whole['ETag']}).status_code, 304)
+
+    def test_abandoned_uploads_expire(self):
+        self.upload(self.content)
+        session = self.client.post('/api/uploads/', {'filename': 'paper.pdf', 'size': len(self.content)}, format='json').json()
+        self.client.put(f"/api/uploads/{session['id']}/", self.content[:1000], content_type='application/octet-stream',
+                        headers={'Content-Range': f'bytes 0-999/{len(self.content)}'})
+        self.assertEqual(Job.objects.filter(kind='expire_uploads', status='pending').count(), 1)
+        partial = os.path.join(self.media.name, 'partial')
+        crashed = os.path.join(partial, f'{uuid.uuid4()}.part')
+        open(crashed, 'wb').close()
+
+        # Still within UPLOAD_EXPIRY_HOURS: nothing goes.
+        Job.objects.filter(kind='expire_uploads').update(run_after=timezone.now())
+        JobRunner(workers=0).run(once=True)
+        self.assertEqual(UploadSession.objects.count(), 2)
+        self.assertEqual(len(os.listdir(partial)), 2)
+        self.assertEqual(Job.objects.filter(kind='expire_uploads', status='pending').count(), 1)
+
+        old = timezone.now() - timedelta(days=2)
+        UploadSession.objects.update(created_at=old)
+        for name in os.listdir(partial):
+            os.utime(os.path.join(partial, name), (old.timestamp(), old.timestamp()))
+        fresh = self.client.post('/api/uploads/', {'filename': 'new.pdf', 'size': 10}, format='json').json()
+        Job.objects.filter(kind='expire_uploads').update(run_after=timezone.now())
+        JobRunner(workers=0).run(once=True)
+        self.assertEqual(list(UploadSession.objects.values_list('id', flat=True)), [uuid.UUID(fresh['id'])])
+        self.assertEqual(os.listdir(partial), [])
+        # The stored blob outlives its session.
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_multipart_create(self):
+        upload = SimpleUploadedFile('paper.pdf', self.content, content_type='application/pdf')
+        response = self.client.post('/api/resources/', {'area': self.area.id, 'title': 'Direct', 'resource_type': 'pdf', 'file': upload})
+        self.assertEqual(response.status_code, 201)
+        pdf = PDFResource.objects.get(resource_id=response.json()['id'])
+        self.assertEqual(pdf.stored_file.size, len(self.content))
+
+        # A bad area is refused before anything is stored.
+        upload = SimpleUploadedFile('other.pdf', self.content + b'other', content_type='application/pdf')
+        response = self.client.post('/api/resources/', {'area': 9999, 'title': 'Lost', 'resource_type': 'pdf', 'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+        not_pdf = SimpleUploadedFile('notes.pdf', b'hello', content_type='application/pdf')
+        response = self.client.post('/api/resources/', {'area': self.area.id, 'title': 'Bad', 'resource_type': 'pdf', 'file': not_pdf})
+        self.assertEqual(response.status_code, 400)
+
+
+class PDFExtractionJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.area = AcademicArea.objects.create(name='PDFs', slug='pdfs')
+
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+        JOB_TYPES.pop('flaky', None)
+
+    def upload(self, content, title='Paper'):
+        upload = SimpleUploadedFile('paper.pdf', content, content_type='application/pdf')
+        response = self.client.post('/api/resources/', {'area': self.area.id, 'title': title, 'resource_type': 'pdf', 'file': upload})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_fallback_extractor(self):
+        path = os.path.join(self.media.name, 'sample.pdf')
+        with open(path, 'wb') as f:
+            f.write(synthetic_pdf(['Hello \\(Turing\\) machines', 'Page two']))
+        page_count, text = extract_pdf_text(path)
+        self.assertEqual(page_count, 2)
+        self.assertIn('Hello (Turing) machines', text)
+        self.assertIn('Second line', text)
+
+    def test_upload_queues_extraction_for_search_and_details(self):
+        resource_id = self.upload(synthetic_pdf(['Lambda calculus notes', 'More']))
+        job = Job.objects.get(kind='extract_pdf')
+        self.assertEqual((job.kind, job.status), ('extract_pdf', 'pending'))
+        self.assertIsNone(self.client.get(f'/api/resources/{resource_id}/').json()['details']['page_count'])
+
+        call_command('run_jobs', '--once', '--workers', '0', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(self.client.get(f'/api/resources/{resource_id}/').json()['details']['page_count'], 2)
+        results = self.client.get('/api/search/', {'q': 'lambda calc'}).json()['results']
+        self.assertEqual([r['id'] for r in results], [resource_id])
+
+        # The same content uploaded again reuses the text without a new job.
+        second = self.upload(synthetic_pdf(['Lambda calculus notes', 'More']), title='Copy')
+        self.assertEqual(Job.objects.filter(kind='extract_pdf').count(), 1)
+        self.assertEqual(self.client.get(f'/api/resources/{second}/').json()['details']['page_count'], 2)
+
+    def test_process_pool(self):
+        for i in range(3):
+            self.upload(synthetic_pdf([f'Document {i}']), title=f'Doc {i}')
+        call_command('run_jobs', '--once', '--workers', '2', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(status='done').count(), 3)
+        self.assertEqual(list(StoredFile.objects.values_list('page_count', flat=True)), [1, 1, 1])
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        calls = []
+
+        @job_type('flaky')
+        class Flaky(JobType):
+            def prepare(self, payload):
+                calls.append(payload)
+                if len(calls) < 2:
+                    raise OSError('disk hiccup')
+                return payload
+
+        job = enqueue('flaky', {'n': 1})
+        runner = JobRunner(0)
+        runner.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('disk hiccup', job.last_error)
+        self.assertGreater(job.run_after, job.created_at)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        runner.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+
+        missing = enqueue('extract_pdf', {'stored_file': 999})
+        runner.run(once=True)
+        missing.refresh_from_db()
+        self.assertEqual((missing.status, missing.attempts), ('failed', 1))
+
+
+class BenchTests(TestCase):
+    def test_seed_area(self):
+        area = seed_area('synthetic', resources=50, degree=4)
+        self.assertEqual(area.resources.count(), 50)
+        self.assertEqual(set(area.resources.values_list('resource_type', flat=True)), set(DETAIL_MODELS))
+        for model, _ in DETAIL_MODELS.values():
+            self.assertEqual(model.objects.filter(resource__area=area).count(), 10)
+        self.assertEqual((area.notes.count(), area.tasks.count(), area.canvas_items.count()), (50, 50, 50))
+        self.assertGreater(area.connections.count(), 150)
+        self.assertFalse(area.connections.filter(source=F('target')).exists())
+
+    def test_bench_reports_every_route_and_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('bench', '--current-db', '--resources', '20', '--repeat', '2', '--warmup', '0', '--output', output)
+            with open(output) as f:
+                result = json.load(f)
+            routes = result['routes']
+            for name in ('academicarea-detail', 'resource-list', 'search', 'graph-neighbourhood', 'resource-file', 'note-list POST'):
+                self.assertIn(name, routes)
+                self.assertLess(routes[name]['status'], 400, name)
+            self.assertEqual(routes['academicarea-detail']['queries'], 1)
+            self.assertGreater(routes['academicarea-detail (uncached)']['queries'], 1)
+            # The write scenarios are rolled back.
+            self.assertEqual(Resource.objects.count(), 20)
+
+            # A baseline with fewer queries makes the comparison fail.
+            baseline = os.path.join(tmp, 'baseline.json')
+            routes['resource-list']['queries'] -= 1
+            with open(baseline, 'w') as f:
+                json.dump(result, f)
+            with self.assertRaises(CommandError):
+                call_command('bench', '--input', output, '--baseline', baseline, stdout=io.StringIO())
+            call_command('bench', '--input', output, '--baseline', output, stdout=io.StringIO())
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        histograms().reset()
+        self.area = AcademicArea.objects.create(name='Metrics', slug='metrics')
+        populate_area(self.area, 20)
+
+    def server_timing(self, response):
+        return {
+            part.split(';')[0].strip(): part for part in response['Server-Timing'].split(',')
+        }
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/resources/', {'area': 'metrics'})
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        serialize_ms = float(timing['serialize'].split('dur=')[1])
+        self.assertGreater(serialize_ms, 0)
+
+    def test_slow_requests_are_logged_with_their_worst_queries(self):
+        with override_settings(SLOW_REQUEST_MS=0), self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client.get('/api/areas/metrics/')
+        entry = json.loads(logs.records[0].getMessage().split(' ', 2)[2])
+        self.assertEqual(entry['view'], 'academicarea-detail')
+        self.assertGreater(entry['queries'], 1)
+        self.assertLessEqual(len(entry['slowest_queries']), 5)
+        self.assertIn('SELECT', entry['slowest_queries'][0]['sql'])
+
+    async def test_async_views_are_measured(self):
+        response = await self.async_client.get('/api/async/resources/', {'area': 'metrics'})
+        timing = self.server_timing(response)
+        self.assertNotIn('desc="0 queries"', timing['db'])
+
+    def test_metrics_endpoint(self):
+        for _ in range(3):
+            self.client.get('/api/tasks/', {'area': 'metrics'})
+        self.client.get('/api/areas/metrics/')
+        views = self.client.get('/api/internal/metrics/').json()['views']
+        tasks = views['GET task-list']
+        self.assertEqual(tasks['count'], 3)
+        self.assertEqual(sum(tasks['buckets'].values()), 3)
+        self.assertGreater(tasks['mean_queries'], 0)
+        self.assertIn('GET academicarea-detail', views)
+
+        with override_settings(DEBUG=False):
+            response = self.client.get('/api/internal/metrics/', REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 404)
+
+
+class SQLiteProductionModeTests(TestCase):
+    def test_router_reads_from_replica_outside_transactions(self):
+        router = ReadWriteRouter()
+        # Test cases run inside a transaction, so reads stay on the writer...
+        self.assertEqual(router.db_for_read(Resource), 'default')
+        # ...which is where they go outside one.
+        with mock.patch.object(connections['default'], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Resource), 'replica')
+        self.assertEqual(router.db_for_write(Resource), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'api'))
+
+    def test_locked_statements_are_retried_outside_transactions(self):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        autocommit = {'connection': mock.Mock(in_atomic_block=False)}
+        with mock.patch('api.sqlite.time.sleep'):
+            self.assertEqual(retry_when_locked(execute, 'BEGIN IMMEDIATE', None, False, autocommit), 'ok')
+        self.assertEqual(len(calls), 3)
+
+        # Inside a transaction the earlier work would be lost, so no retry.
+        calls.clear()
+        in_transaction = {'connection': mock.Mock(in_atomic_block=True)}
+        with self.assertRaises(OperationalError):
+            retry_when_locked(execute, 'UPDATE api_note SET content = %s', ['x'], False, in_transaction)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrency_benchmark(self):
+        out = io.StringIO()
+        call_command('bench_sqlite', '--threads', '4', '--duration', '0.3', '--areas', '3', '--items', '20', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual([r['mode'] for r in result['results']], ['django-default', 'production'])
+        self.assertEqual(result['results'][1]['errors'], 0)
+        self.assertGreater(result['results'][1]['operations'], 0)
+
+
+class AreaStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Stats', slug='stats')
+
+    def stats(self, area=None):
+        return AreaStats.objects.values(
+            'resource_count', 'note_count', 'task_count', 'open_task_count', 'connection_count'
+        ).get(area=area or self.area)
+
+    def test_single_row_writes_keep_counts(self):
+        a = self.client.post('/api/resources/', {'area': self.area.id, 'title': 'A', 'resource_type': 'web'}, format='json').json()
+        b = self.client.post('/api/resources/', {'area': self.area.id, 'title': 'B', 'resource_type': 'web'}, format='json').json()
+        self.client.post('/api/connections/', {'area': self.area.id, 'source': a['id'], 'target': b['id'], 'label': 'x'}, format='json')
+        task = self.client.post('/api/tasks/', {'area': self.area.id, 'description': 'Read A'}, format='json').json()
+        self.client.post('/api/notes/', {'area': self.area.id, 'content': 'Hello'}, format='json')
+        self.assertEqual(self.stats(), {
+            'resource_count': 2, 'note_count': 1, 'task_count': 1, 'open_task_count': 1, 'connection_count': 1,
+        })
+
+        self.client.patch(f'/api/tasks/{task["id"]}/', {'is_completed': True}, format='json')
+        self.assertEqual(self.stats()['open_task_count'], 0)
+
+        # Deleting a resource cascades to its connections.
+        self.client.delete(f'/api/resources/{b["id"]}/')
+        self.assertEqual(self.stats()['resource_count'], 1)
+        self.assertEqual(self.stats()['connection_count'], 0)
+
+        # Moving a row to another area moves its counts.
+        other = AcademicArea.objects.create(name='Other', slug='other-stats')
+        self.client.patch(f'/api/tasks/{task["id"]}/', {'area': other.id, 'is_completed': False}, format='json')
+        self.assertEqual(self.stats()['task_count'], 0)
+        self.assertEqual(self.stats(other)['task_count'], 1)
+        self.assertEqual(self.stats(other)['open_task_count'], 1)
+
+    def test_bulk_paths_keep_counts(self):
+        self.client.post(f'/api/resources/bulk/?area={self.area.id}', [
+            {'title': 'One', 'resource_type': 'web'}, {'title': 'Two', 'resource_type': 'book'},
+        ], format='json')
+        self.assertEqual(self.stats()['resource_count'], 2)
+
+        area = seed_area('stats-synthetic', resources=20, degree=2, seed=1)
+        expected = {
+            'resource_count': 20, 'note_count': 20, 'task_count': 20,
+            'open_task_count': Task.objects.filter(area=area, is_completed=False).count(),
+            'connection_count': ResourceConnection.objects.filter(area=area).count(),
+        }
+        self.assertEqual(self.stats(area), expected)
+
+        backup = self.client.get(f'/api/areas/{area.slug}/export/')
+        upload = SimpleUploadedFile('backup.ndjson', b''.join(backup.streaming_content))
+        restored = self.client.post('/api/areas/import/', {'file': upload, 'slug': 'stats-restored'}).json()
+        self.assertEqual(self.stats(restored['id']), expected)
+
+    def test_refresh_repairs_drift(self):
+        populate_area(self.area, 10)
+        AreaStats.objects.filter(area=self.area).update(resource_count=0, open_task_count=3)
+        self.assertEqual(self.stats()['resource_count'], 0)
+        refresh_area_stats(self.area.id)
+        self.assertEqual(self.stats(), {
+            'resource_count': 10, 'note_count': 10, 'task_count': 10, 'open_task_count': 10, 'connection_count': 9,
+        })
+
+    def test_area_list_is_one_query(self):
+        AcademicArea.objects.bulk_create([AcademicArea(name=f'Area {i}', slug=f'area-{i}') for i in range(50)])
+        AreaStats.objects.bulk_create([AreaStats(area=area) for area in AcademicArea.objects.filter(stats=None)])
+        self.client.post('/api/notes/', {'area': self.area.id, 'content': 'Hello'}, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/areas/')
+        rows = {row['slug']: row for row in response.json()}
+        self.assertEqual(len(rows), 51)
+        self.assertEqual(rows['stats']['stats']['note_count'], 1)
+
+
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Sync', slug='sync')
+        self.resources = populate_area(self.area, 5)
+
+    def seq(self):
+        return int(self.client.get('/api/areas/sync/')['X-Change-Seq'])
+
+    def changes(self, since, **params):
+        return self.client.get('/api/areas/sync/changes/', {'since': since, **params})
+
+    def test_changes_since_a_loaded_snapshot(self):
+        since = self.seq()
+        self.assertEqual(self.changes(since).json()['changed']['tasks'], [])
+
+        task = self.client.post('/api/tasks/', {'area': self.area.id, 'description': 'Read'}, format='json').json()
+        self.client.patch(f'/api/tasks/{task["id"]}/', {'is_completed': True}, format='json')
+        item = CanvasItem.objects.filter(area=self.area).first()
+        self.client.post('/api/canvas-items/positions/', {
+            'area': self.area.id, 'positions': [{'id': item.id, 'pos_x': 7, 'pos_y': 8}],
+        }, format='json')
+        Book.objects.filter(resource__area=self.area).update(authors='Someone')
+        book = Book.objects.filter(resource__area=self.area).first()
+        book.save()
+        doomed = self.resources[2]
+        self.client.delete(f'/api/resources/{doomed.id}/')
+
+        body = self.changes(since).json()
+        self.assertFalse(body['more'])
+        self.assertEqual(body['changed']['tasks'], [dict(task, is_completed=True)])
+        self.assertEqual([(c['id'], c['pos_x'], c['pos_y']) for c in body['changed']['canvas_items']], [(item.id, 7, 8)])
+        self.assertEqual([r['id'] for r in body['changed']['resources']], [book.resource_id])
+        self.assertEqual(body['changed']['resources'][0]['details']['authors'], 'Someone')
+        self.assertEqual(body['deleted']['resources'], [doomed.id])
+        # The resource took its canvas item and connections with it.
+        self.assertEqual(len(body['deleted']['canvas_items']), 1)
+        self.assertEqual(len(body['deleted']['connections']), 2)
+
+        # Nothing new after the returned seq; other areas are not mixed in.
+        other = AcademicArea.objects.create(name='Other', slug='other-sync')
+        Note.objects.create(area=other, content='Elsewhere')
+        empty = self.changes(body['seq']).json()
+        self.assertEqual(empty['seq'], body['seq'])
+        self.assertEqual(sum(len(rows) for rows in empty['changed'].values()), 0)
+
+    def test_paging_and_moves(self):
+        since = self.seq()
+        notes = [Note.objects.create(area=self.area, content=f'Note {i}') for i in range(5)]
+        first = self.changes(since, limit=3).json()
+        self.assertTrue(first['more'])
+        rest = self.changes(first['seq'], limit=3).json()
+        self.assertFalse(rest['more'])
+        self.assertEqual(
+            [n['id'] for n in first['changed']['notes'] + rest['changed']['notes']], [n.id for n in notes]
+        )
+
+        other = AcademicArea.objects.create(name='Other', slug='other-sync')
+        seq = rest['seq']
+        self.client.patch(f'/api/notes/{notes[0].id}/', {'area': other.id}, format='json')
+        self.assertEqual(self.changes(seq).json()['deleted']['notes'], [notes[0].id])
+
+    def test_compaction_and_horizon(self):
+        since = self.seq()
+        item = CanvasItem.objects.filter(area=self.area).first()
+        for x in range(5):
+            self.client.patch(f'/api/canvas-items/{item.id}/', {'pos_x': x}, format='json')
+        counts = compact_change_log()
+        self.assertEqual(counts, {'superseded': 4, 'expired': 0})
+        body = self.changes(since).json()
+        self.assertEqual(body['changed']['canvas_items'][0]['pos_x'], 4)
+
+        ChangeLogEntry.objects.update(created_at=F('created_at') - timedelta(days=30))
+        self.assertEqual(compact_change_log()['expired'], 1)
+        response = self.changes(since)
+        self.assertEqual(response.status_code, 410)
+        self.area.refresh_from_db()
+        self.assertEqual(response.json()['horizon'], self.area.change_horizon)
+        self.assertEqual(self.changes(self.area.change_horizon).status_code, 200)
+
+    def test_deleting_an_area_drops_its_log(self):
+        Note.objects.create(area=self.area, content='Gone soon')
+        self.client.delete('/api/areas/sync/')
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+
+class LiveEventsTests(TestCase):
+    async def test_fan_out_from_other_threads(self):
+        broker = LocalBroker()
+        first, second = broker.subscribe(1), broker.subscribe(1)
+        elsewhere = broker.subscribe(2)
+        thread = threading.Thread(target=broker.publish, args=(1, 'change', {'seq': 5}), kwargs={'id': 5})
+        thread.start()
+        thread.join()
+        expected = b'id: 5\nevent: change\ndata: {"seq":5}\n\n'
+        self.assertEqual(await first.next_batch(1), expected)
+        self.assertEqual(await second.next_batch(1), expected)
+        self.assertIsNone(await elsewhere.next_batch(0.01))
+
+        for subscription in (first, second, elsewhere):
+            subscription.close()
+        self.assertEqual(broker.subscriber_count(), 0)
+        self.assertEqual(broker.subscribers, {})
+
+    async def test_slow_subscribers_get_one_resync(self):
+        broker = LocalBroker()
+        slow = broker.subscribe(1, maxsize=3)
+        for seq in range(10):
+            broker.publish(1, 'change', {'seq': seq})
+        self.assertEqual(await slow.next_batch(1), RESYNC)
+        # Once the resync is read, events flow again.
+        broker.publish(1, 'change', {'seq': 11})
+        self.assertIn(b'"seq":11', await slow.next_batch(1))
+        slow.close()
+
+    async def test_event_stream(self):
+        area = await AcademicArea.objects.acreate(name='Live', slug='live')
+        response = await self.async_client.get('/api/async/areas/live/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertIn(b'event: ready', await anext(stream))
+        self.assertEqual(get_broker().subscriber_count(area.id), 1)
+
+        # A committed write reaches the subscriber.
+        def write():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Note.objects.create(area=area, content='Hello')
+        note = await sync_to_async(write)()
+        chunk = await anext(stream)
+        self.assertIn(b'event: change', chunk)
+        seq = await ChangeLogEntry.objects.filter(object_id=note.id, kind='note').values_list('id', flat=True).aget()
+        self.assertIn(f'"seq":{seq}'.encode(), chunk)
+
+        # A disconnect cancels the pending read, as the ASGI handler does.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(get_broker().subscriber_count(area.id), 0)
+        self.assertEqual((await self.async_client.get('/api/async/areas/missing/events/')).status_code, 404)
+
+
+class FastReadPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Fast \u2028 "path"', slug='fast', description='Ünïcödé 🚀')
+        resources = populate_area(self.area, 12)
+        Resource.objects.filter(pk=resources[0].pk).update(title='Line\u2028sep\u2029 \x01 "quoted" \\ 😀')
+        PDFResource.objects.filter(resource__area=self.area).update(file='blobs/ab/cd/a file.pdf', page_count=3)
+        # A resource whose detail row is missing serializes details as null.
+        Paper.objects.filter(resource=resources[2]).delete()
+        # A book turned into a web resource keeps its Book row, which must
+        # not show up as its details (other books remain in the area).
+        Resource.objects.filter(pk=resources[1].pk).update(resource_type='web')
+        Task.objects.filter(resource=resources[3]).update(is_completed=True, resource=None)
+        WebResource.objects.filter(resource__area=self.area).update(
+            link_status=404, link_checked_at=datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc),
+        )
+
+    def render_both(self, url):
+        with self.settings(FAST_READ_PATH=True):
+            fast = self.client.get(url)
+        area_cache().clear()
+        with self.settings(FAST_READ_PATH=False):
+            reference = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        return fast.content, reference.content
+
+    def test_lists_match_the_serializers_byte_for_byte(self):
+        for url in ['/api/resources/?area=fast&page_size=5', '/api/canvas-items/?area=fast', '/api/resources/?resource_type=pdf']:
+            fast, reference = self.render_both(url)
+            self.assertEqual(fast, reference, url)
+        # Relative file URLs, as on every other endpoint.
+        self.assertIn(b'"file":"/media/blobs/ab/cd/a%20file.pdf"', fast)
+
+    def test_area_detail_matches_the_serializer_byte_for_byte(self):
+        fast, reference = self.render_both('/api/areas/fast/')
+        self.assertEqual(fast, reference)
+
+        serialized = AcademicAreaDetailSerializer(workspace_queryset().get(pk=self.area.pk)).data
+        self.assertEqual(JSONRenderer().render(serialized), FastJSONRenderer().render(area_payload(self.area.id)))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'a\u2028b\u2029c \x00\x1f \t\n "\\/ é 😀',
+            'when': datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2024, 5, 6, 7, 8, 9),
+            'day': datetime(2024, 5, 6).date(),
+            'id': uuid.UUID(int=7),
+            'nested': [{'n': None, 'b': True, 'i': -2 ** 63}],
+            3: 'non-string key',
+            'big': 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        del data[3], data['big']
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # The local web server LinkCheckTests probe.
+    protocol_version = 'HTTP/1.1'
+    PAGE = b'<html><head><title>\n  Links &amp; Health </title></head><body>ok</body></html>'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            self.route()
+        except ConnectionError:
+            # The probe gave up first (timeouts).
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def route(self):
+        if self.path == '/page':
+            if self.headers.get('If-None-Match') == '"v1"':
+                return self.reply(304, headers={'ETag': '"v1"'})
+            return self.reply(200, self.PAGE, {'Content-Type': 'text/html; charset=utf-8', 'ETag': '"v1"'})
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for part in [b'<title>Chun', b'ked</title>']:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(part), part))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if self.path == '/huge-chunk':
+            # Announces a 1 GiB chunk; only the start of it is ever sent.
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.write(b'40000000\r\n<title>Huge</title>' + b' ' * 70000)
+            return
+        if self.path == '/moved':
+            return self.reply(301, headers={'Location': '/page'})
+        if self.path == '/loop':
+            return self.reply(302, headers={'Location': '/loop'})
+        if self.path == '/slow':
+            time.sleep(1)
+            return self.reply(200)
+        if self.path.startswith('/busy/'):
+            time.sleep(0.05)
+            return self.reply(200)
+        self.reply(404)
+
+    def reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(LINK_CHECK_ALLOW_PRIVATE=True)
+class LinkCheckTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests, self.server.active, self.server.peak = [], 0, 0
+
+    def check(self, targets, **kwargs):
+        # The stub server is on loopback.
+        return check_links(targets, allow_private=True, **kwargs)
+
+    def test_non_public_addresses_are_refused(self):
+        [result] = check_links([(self.base + '/page', '', '')])
+        self.assertIsNone(result['status'])
+        self.assertIn('non-public address 127.0.0.1', result['error'])
+        self.assertEqual(self.server.requests, [])
+        for address in ['127.0.0.1', '10.1.2.3', '192.168.0.1', '169.254.169.254', '::1', 'fe80::1', '::ffff:127.0.0.1', '0.0.0.0']:
+            self.assertFalse(_is_public(address), address)
+        for address in ['93.184.216.34', '2606:4700::1111']:
+            self.assertTrue(_is_public(address), address)
+
+    def test_probes_follow_redirects_and_read_titles(self):
+        paths = ['/page', '/moved', '/chunked', '/huge-chunk', '/missing', '/loop', '/slow']
+        results = self.check([(self.base + path, '', '') for path in paths], timeout=0.5)
+        by_path = {result['url'][len(self.base):]: result for result in results}
+        self.assertEqual([result['url'] for result in results], [self.base + path for path in paths])
+
+        self.assertEqual(by_path['/page']['status'], 200)
+        self.assertEqual(by_path['/page']['title'], 'Links & Health')
+        self.assertEqual(by_path['/page']['etag'], '"v1"')
+        self.assertEqual(by_path['/page']['content_type'], 'text/html')
+        self.assertEqual(by_path['/moved']['status'], 200)
+        self.assertEqual(by_path['/moved']['final_url'], self.base + '/page')
+        self.assertEqual(by_path['/chunked']['title'], 'Chunked')
+        self.assertEqual((by_path['/huge-chunk']['status'], by_path['/huge-chunk']['title']), (200, 'Huge'))
+        self.assertEqual(by_path['/missing']['status'], 404)
+        self.assertIsNone(by_path['/loop']['status'])
+        self.assertIn('redirects', by_path['/loop']['error'])
+        self.assertIsNone(by_path['/slow']['status'])
+        self.assertIn('0.5s', by_path['/slow']['error'])
+
+        # Unreachable and unsupported URLs are results too, not exceptions.
+        port = self.server.server_port
+        closed, ftp = self.check([('http://127.0.0.1:1/', '', ''), (f'ftp://127.0.0.1:{port}/', '', '')])
+        self.assertIsNone(closed['status'])
+        self.assertTrue(closed['error'])
+        self.assertIn('scheme', ftp['error'])
+
+    def test_conditional_requests(self):
+        [result] = self.check([(self.base + '/page', '"v1"', '')])
+        self.assertEqual(result['status'], 304)
+        self.assertEqual(self.server.requests, [('/page', '"v1"')])
+
+    def test_concurrency_per_host_is_bounded(self):
+        targets = [(f'{self.base}/busy/{i}', '', '') for i in range(8)]
+        results = self.check(targets, concurrency=8, per_host=2)
+        self.assertEqual({result['status'] for result in results}, {200})
+        self.assertEqual(len(self.server.requests), 8)
+        self.assertLessEqual(self.server.peak, 2)
+
+        # 'localhost' is another host as far as the limit goes.
+        self.setUp()
+        other = self.base.replace('127.0.0.1', 'localhost')
+        targets += [(f'{other}/busy/{i}', '', '') for i in range(8)]
+        self.check(targets, concurrency=8, per_host=2)
+        self.assertLessEqual(self.server.peak, 4)
+
+    def test_command_stores_results_in_the_details(self):
+        area = AcademicArea.objects.create(name='Links', slug='links')
+        web = Resource.objects.create(area=area, title='Web', resource_type='web')
+        WebResource.objects.create(resource=web, url=self.base + '/page')
+        book = Resource.objects.create(area=area, title='Book', resource_type='book')
+        Book.objects.create(resource=book, url=self.base + '/missing')
+        course = Resource.objects.create(area=area, title='Course', resource_type='course')
+        Course.objects.create(resource=course, website=self.base + '/moved')
+        Course.objects.create(resource=Resource.objects.create(area=area, title='No site', resource_type='course'))
+        version = AcademicArea.objects.get(pk=area.pk).version
+
+        out = io.StringIO()
+        call_command('check_links', timeout=2, stdout=out)
+        self.assertIn('Checked 3 links, 1 broken.', out.getvalue())
+        self.assertEqual(LinkCheck.objects.count(), 3)
+        check = LinkCheck.objects.get(url=self.base + '/moved')
+        self.assertEqual((check.status, check.final_url, check.title), (200, self.base + '/page', 'Links & Health'))
+        self.assertGreater(AcademicArea.objects.get(pk=area.pk).version, version)
+        self.assertTrue(ChangeLogEntry.objects.filter(area=area, kind='resource', object_id=book.pk).exists())
+
+        response = APIClient().get('/api/areas/links/')
+        details = {r['title']: r['details'] for r in response.json()['resources']}
+        self.assertEqual(details['Web']['link_status'], 200)
+        self.assertEqual(details['Book']['link_status'], 404)
+        self.assertEqual(details['Course']['link_status'], 200)
+        self.assertIsNotNone(details['Course']['link_checked_at'])
+        self.assertIsNone(details['No site']['link_status'])
+
+        # Fresh links are left alone; stale ones are asked for conditionally
+        # and keep what the last full answer said.
+        self.server.requests = []
+        call_command('check_links', stdout=io.StringIO())
+        self.assertEqual(self.server.requests, [])
+        call_command('check_links', stale_hours=0, stdout=io.StringIO())
+        self.assertIn(('/page', '"v1"'), self.server.requests)
+        check = LinkCheck.objects.get(url=self.base + '/page')
+        self.assertEqual((check.status, check.title, check.etag), (200, 'Links & Health', '"v1"'))
+        self.assertEqual(WebResource.objects.get(pk=web.pk).link_status, 200)
+
+    def test_recurring_job(self):
+        call_command('check_links', every=12, stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('check_links', every=12, stdout=io.StringIO())
+        JobRunner(workers=0).run(once=True)
+        jobs = list(Job.objects.filter(kind='check_links').order_by('id'))
+        self.assertEqual([job.status for job in jobs], ['done', 'pending'])
+        self.assertEqual(jobs[1].payload, {'every_hours': 12})
+        self.assertGreater(jobs[1].run_after, timezone.now() + timedelta(hours=11))
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Algorithms', slug='algorithms')
+        self.other = AcademicArea.objects.create(name='Theory', slug='theory')
+
+    def create(self, area, title, authors='', resource_type='book', **extra):
+        return self.client.post('/api/resources/', {
+            'area': area.pk, 'title': title, 'resource_type': resource_type, 'authors': authors, **extra,
+        }, format='json')
+
+    def test_create_warns_about_near_duplicates(self):
+        first = self.create(self.area, 'Introduction to Algorithms', 'Cormen, Leiserson, Rivest')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()['duplicates'], [])
+
+        second = self.create(self.other, 'Introduction to Algorithms (3rd ed.)', 'T. Cormen; C. Leiserson; R. Rivest')
+        self.assertEqual(second.status_code, 201)
+        [duplicate] = second.json()['duplicates']
+        self.assertEqual(duplicate['id'], first.json()['id'])
+        self.assertEqual(duplicate['area_slug'], 'algorithms')
+        self.assertGreaterEqual(duplicate['similarity'], 0.6)
+
+        unrelated = self.create(self.area, 'Linear Algebra Done Right', 'Axler')
+        self.assertEqual(unrelated.json()['duplicates'], [])
+
+    def test_link_to_existing_in_the_same_area(self):
+        first = self.create(self.area, 'The Art of Computer Programming', 'Knuth').json()
+        count = Resource.objects.count()
+        response = self.create(self.area, 'Art of Computer Programming', 'Donald Knuth', on_duplicate='existing')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], first['id'])
+        self.assertEqual(Resource.objects.count(), count)
+        # A copy in another area is only a warning.
+        response = self.create(self.other, 'Art of Computer Programming', 'Knuth', on_duplicate='existing')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['duplicates'][0]['id'], first['id'])
+
+    def test_index_follows_edits_deletes_and_bulk_imports(self):
+        resource = Resource.objects.create(area=self.area, title='Structure and Interpretation of Computer Programs', resource_type='web')
+        self.assertEqual(FingerprintBand.objects.filter(resource=resource).count(), 20)
+        response = self.client.get('/api/resources/duplicates/', {'title': 'Structure & Interpretation of Computer Programs'})
+        self.assertEqual([d['id'] for d in response.json()['duplicates']], [resource.pk])
+
+        resource.title = 'Concrete Mathematics'
+        resource.save()
+        self.assertEqual(find_duplicates('Structure and Interpretation of Computer Programs'), [])
+        self.assertEqual(find_duplicates('Concrete Mathematics!')[0]['id'], resource.pk)
+
+        response = self.client.post('/api/resources/bulk/?area=theory', [
+            {'title': 'Concrete mathematics', 'resource_type': 'book', 'authors': 'Graham, Knuth, Patashnik'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(f'/api/resources/{resource.pk}/duplicates/')
+        self.assertEqual(len(response.json()['duplicates']), 1)
+
+        resource.delete()
+        self.assertFalse(FingerprintBand.objects.filter(resource_id=resource.pk).exists())
+        self.assertEqual(self.client.get('/api/resources/duplicates/').status_code, 400)
+
+    def test_clusters(self):
+        titles = [
+            (self.area, 'Attention Is All You Need'), (self.other, 'Attention is all you need.'),
+            (self.other, 'attention is ALL you need'), (self.area, 'Deep Learning'),
+            (self.other, 'Deep learning'), (self.area, 'Pattern Recognition and Machine Learning'),
+        ]
+        resources = [Resource.objects.create(area=area, title=title, resource_type='paper') for area, title in titles]
+        ids = [r.pk for r in resources]
+        self.assertEqual(duplicate_clusters(), [ids[:3], ids[3:5]])
+        self.assertEqual(duplicate_clusters(area_id=self.other.pk), [ids[1:3]])
+
+        ResourceFingerprint.objects.all().delete()
+        FingerprintBand.objects.all().delete()
+        rebuild_fingerprints()
+        self.assertEqual(duplicate_clusters(), [ids[:3], ids[3:5]])
+
+        out = io.StringIO()
+        call_command('find_duplicates', stdout=out)
+        self.assertIn('Found 2 groups of duplicates (5 resources).', out.getvalue())
+        self.assertIn('[theory] (paper) Attention is all you need.', out.getvalue())
+
+
+class RelatedResourceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.ml = AcademicArea.objects.create(name='Machine Learning', slug='ml')
+        self.bio = AcademicArea.objects.create(name='Biology', slug='bio')
+        self.history = AcademicArea.objects.create(name='History', slug='history')
+        self.index = RelatedIndex()
+
+    def resource(self, area, title, note=''):
+        resource = Resource.objects.create(area=area, title=title, resource_type='web')
+        if note:
+            Note.objects.create(area=area, resource=resource, content=note)
+        return resource
+
+    def related_ids(self, resource):
+        return [row['id'] for row in self.client.get(f'/api/resources/{resource.pk}/related/').json()['related']]
+
+    def test_neighbours_come_from_other_areas(self):
+        transformers = self.resource(self.ml, 'Protein folding with transformers', 'attention models predict protein structure')
+        alphafold = self.resource(self.bio, 'Protein structure prediction', 'folding of protein chains, attention')
+        same_area = self.resource(self.ml, 'Transformers for protein folding', 'attention everywhere')
+        rome = self.resource(self.history, 'The fall of Rome', 'empire and decline')
+        self.resource(self.history, 'Rome and its empire')
+        self.assertEqual(rebuild_related(self.index), 5)
+
+        self.assertEqual(self.related_ids(transformers), [alphafold.pk])
+        self.assertEqual(set(self.related_ids(alphafold)), {transformers.pk, same_area.pk})
+        self.assertEqual(self.related_ids(rome), [])
+        [row] = self.client.get(f'/api/resources/{transformers.pk}/related/').json()['related']
+        self.assertEqual(row['area_slug'], 'bio')
+        self.assertGreater(row['score'], 0)
+        self.assertEqual(len(self.client.get(f'/api/resources/{alphafold.pk}/related/?limit=1').json()['related']), 1)
+
+    def test_edits_and_deletes_update_the_lists(self):
+        cells = self.resource(self.bio, 'Cell biology', 'membranes and mitochondria')
+        graphs = self.resource(self.ml, 'Graph neural networks', 'message passing on graphs')
+        rebuild_related(self.index)
+        self.assertEqual(self.related_ids(cells), [])
+
+        # A note ties the two together; the writes mark both stale and queue
+        # one update_related job.
+        Note.objects.create(area=self.bio, resource=cells, content='message passing between mitochondria')
+        self.assertEqual(Job.objects.filter(kind='update_related', status='pending').count(), 1)
+        self.assertTrue(StaleRelatedResource.objects.filter(resource_id=cells.pk).exists())
+        self.assertEqual(update_related(self.index), 2)
+        self.assertEqual(self.related_ids(cells), [graphs.pk])
+        self.assertEqual(self.related_ids(graphs), [cells.pk])
+        self.assertFalse(StaleRelatedResource.objects.exists())
+        self.assertEqual(update_related(self.index), 0)
+
+        graphs.delete()
+        # The lists that held it are marked; the rows themselves went with it.
+        self.assertTrue(StaleRelatedResource.objects.filter(resource_id=cells.pk).exists())
+        update_related(self.index)
+        self.assertEqual(self.related_ids(cells), [])
+        self.assertNotIn(graphs.pk, self.index.docs)
+
+    def test_edits_during_an_update_are_not_lost(self):
+        cells = self.resource(self.bio, 'Cell biology', 'membranes')
+        self.resource(self.ml, 'Graph networks', 'message passing')
+        rebuild_related(self.index)
+        Note.objects.create(area=self.bio, resource=cells, content='message passing')
+
+        # An edit lands while the update is counting terms.
+        from .related import count_terms
+        def count_and_edit(resource_ids):
+            count_terms(resource_ids)
+            Note.objects.create(area=self.bio, resource=cells, content='more notes')
+        with mock.patch('api.related.count_terms', count_and_edit):
+            update_related(self.index)
+        self.assertTrue(StaleRelatedResource.objects.filter(resource_id=cells.pk).exists())
+
+        # A failed run leaves its marks for the next one.
+        with mock.patch('api.related.count_terms', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            update_related(self.index)
+        self.assertTrue(StaleRelatedResource.objects.filter(resource_id=cells.pk).exists())
+        update_related(self.index)
+        self.assertFalse(StaleRelatedResource.objects.exists())
+
+    def test_job_runs_the_update(self):
+        first = self.resource(self.ml, 'Sparse attention kernels')
+        second = self.resource(self.bio, 'Sparse kernels for genomics')
+        Job.objects.filter(kind='update_related').update(run_after=timezone.now())
+        JobRunner(workers=0).run(once=True)
+        self.assertEqual(Job.objects.get(kind='update_related').status, 'done')
+        self.assertEqual(related_to(first.pk)[0]['id'], second.pk)
+
+    def test_build_command(self):
+        self.resource(self.ml, 'Kernel methods')
+        self.resource(self.bio, 'Kernel methods in genomics')
+        out = io.StringIO()
+        call_command('build_related', stdout=out)
+        self.assertEqual(RelatedResource.objects.count(), 2)
+
+
+class NoteAutosaveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.area = AcademicArea.objects.create(name='Writing', slug='writing')
+        self.resource = Resource.objects.create(area=self.area, title='Drafts', resource_type='web')
+        self.note = Note.objects.create(area=self.area, resource=self.resource, content='The quick brown fox')
+
+    def upsert(self, **data):
+        return self.client.post('/api/notes/upsert/', data, format='json')
+
+    def test_apply_patches(self):
+        self.assertEqual(apply_patches('The quick brown fox', [
+            {'start': 16, 'end': 19, 'text': 'cat'}, {'start': 4, 'end': 9, 'text': 'slow'},
+        ]), 'The slow brown cat')
+        # Offsets count UTF-16 code units, as in JavaScript: the emoji is two.
+        self.assertEqual(apply_patches('a\U0001F98Ab', [{'start': 3, 'end': 4, 'text': 'c'}]), 'a\U0001F98Ac')
+        for patches in (
+            [{'start': 2, 'end': 3, 'text': 'x'}],  # half the emoji
+            [{'start': 0, 'end': 9, 'text': 'x'}],  # past the end
+            [{'start': 0, 'end': 2, 'text': 'x'}, {'start': 1, 'end': 3, 'text': 'y'}],
+            [{'start': 'a', 'end': 1, 'text': 'x'}],
+            [{'start': 0, 'end': 1, 'text': 5}],
+        ):
+            with self.assertRaises(NoteError):
+                apply_patches('a\U0001F98Ab', patches)
+
+    def test_patches_against_the_current_version(self):
+        with mock.patch('api.notes._saver', NoteSaver(0)):
+            response = self.upsert(id=self.note.pk, version=1, patches=[{'start': 4, 'end': 9, 'text': 'slow'}])
+            self.assertEqual(response.json(), {'id': self.note.pk, 'version': 2, 'saved': True})
+            self.note.refresh_from_db()
+            self.assertEqual((self.note.content, self.note.version), ('The slow brown fox', 2))
+
+            # Another editor still at version 1 is refused and told the state.
+            response = self.upsert(id=self.note.pk, version=1, content='The lazy dog')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual((response.json()['version'], response.json()['content']), (2, 'The slow brown fox'))
+
+            self.assertEqual(self.upsert(id=self.note.pk, version=2, patches=[{'start': 0, 'end': 99, 'text': ''}]).status_code, 400)
+            self.assertEqual(self.upsert(id=self.note.pk, version=2).status_code, 400)
+            self.assertEqual(self.upsert(id=999, version=1, content='x').status_code, 404)
+
+            # Without an id the note is created.
+            response = self.upsert(area=self.area.pk, resource=self.resource.pk, content='New')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual((response.json()['version'], response.json()['saved']), (1, True))
+
+    def test_saves_are_written_and_their_fan_out_coalesced(self):
+        logged = ChangeLogEntry.objects.count()
+        with mock.patch('api.notes._saver', NoteSaver(60)):
+            for version, word in enumerate(['quick!', 'quick!!', 'quick!!!'], start=1):
+                response = self.upsert(id=self.note.pk, version=version, patches=[{'start': 4, 'end': 4 + len(word) - 1, 'text': word}])
+                self.assertEqual(response.json()['version'], version + 1)
+                self.assertEqual(response.json()['saved'], version == 1)
+                # Every save is in the database before it is answered.
+                self.note.refresh_from_db()
+                self.assertEqual(self.note.version, version + 1)
+            self.assertEqual(self.note.content, 'The quick!!! brown fox')
+            self.assertEqual(self.upsert(id=self.note.pk, version=3, content='stale').status_code, 409)
+
+            # One fan-out so far; the rest waits for a single note_saved job.
+            self.assertEqual(ChangeLogEntry.objects.count(), logged + 1)
+            job = Job.objects.get(kind='note_saved')
+            self.assertEqual(job.payload, {'note': self.note.pk})
+            self.assertGreater(job.run_after, timezone.now())
+            search = lambda: self.client.get('/api/search/', {'q': 'quick'}).json()['results'][0]['snippet']
+            self.assertEqual(search(), 'The [quick]! brown fox')
+
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            JobRunner(workers=0).run(once=True)
+            self.assertEqual(Job.objects.get(pk=job.pk).status, 'done')
+            self.assertEqual(ChangeLogEntry.objects.count(), logged + 2)
+            self.assertEqual(search(), 'The [quick]!!! brown fox')
+
+    def test_plain_updates_check_the_version(self):
+        with mock.patch('api.notes._saver', NoteSaver(60)):
+            self.upsert(id=self.note.pk, version=1, content='First')
+            self.upsert(id=self.note.pk, version=2, content='Second')
+            response = self.client.patch(f'/api/notes/{self.note.pk}/', {'content': 'Third', 'version': 2}, format='json')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['content'], 'Second')
+            response = self.client.patch(f'/api/notes/{self.note.pk}/', {'content': 'Third', 'version': 3}, format='json')
+            self.assertEqual((response.json()['content'], response.json()['version']), ('Third', 4))
+            response = self.client.patch(f'/api/notes/{self.note.pk}/', {'content': 'Fourth', 'version': 3}, format='json')
+            self.assertEqual(response.status_code, 409)
+
+            # A pending fan-out of a deleted note does nothing.
+            self.upsert(id=self.note.pk, version=4, content='Gone soon')
+            self.client.delete(f'/api/notes/{self.note.pk}/')
+            Job.objects.filter(kind='note_saved').update(run_after=timezone.now())
+            JobRunner(workers=0).run(once=True)
+            self.assertEqual(Job.objects.get(kind='note_saved').status, 'done')
+
+
+class AreaCloneDeleteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area_cache().clear()
+        self.area = AcademicArea.objects.create(name='Template', slug='template', description='Reading list')
+        self.resources = populate_area(self.area, 10)
+        Note.objects.create(area=self.area, content='Loose note about compilers')
+        # populate_area bulk-inserts; the delete endpoint sizes areas by their stats.
+        refresh_area_stats(self.area.pk)
+        self.other = AcademicArea.objects.create(name='Other', slug='other')
+
+    def search(self, query, area, **params):
+        return self.client.get('/api/search/', {'q': query, 'area': area.pk, **params}).json()['results']
+
+    def test_clone_copies_everything_remapped(self):
+        response = self.client.post('/api/areas/template/clone/', {'slug': 'copy', 'name': 'Copy'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['counts'], {
+            'resource': 10, 'canvas_item': 10, 'connection': 9, 'note': 11, 'task': 10,
+        })
+        copy = AcademicArea.objects.get(slug='copy')
+        self.assertEqual((copy.name, copy.description), ('Copy', 'Reading list'))
+
+        source = self.client.get('/api/areas/template/').json()
+        cloned = self.client.get('/api/areas/copy/').json()
+        self.assertEqual(cloned['name'], 'Copy')
+        copied_ids = {r['id'] for r in cloned['resources']}
+        self.assertFalse(copied_ids & {r.pk for r in self.resources})
+        self.assertEqual(
+            sorted((r['title'], r['resource_type'], str(r['details'])) for r in cloned['resources']),
+            sorted((r['title'], r['resource_type'], str(r['details'])) for r in source['resources']),
+        )
+        for connection_row in cloned['connections']:
+            self.assertTrue({connection_row['source'], connection_row['target']} <= copied_ids)
+        self.assertTrue(all(n['resource'] in copied_ids for n in cloned['notes'] if n['resource']))
+        self.assertEqual(AreaStats.objects.get(area=copy).resource_count, 10)
+
+        # Indexed, and the new resources are queued for related lists.
+        self.assertEqual(len(self.search('compilers', copy)), 1)
+        self.assertEqual(len(self.search('resource', copy, type='resource')), 10)
+        self.assertEqual(set(StaleRelatedResource.objects.values_list('resource_id', flat=True)) & copied_ids, copied_ids)
+
+        # The copy is independent of the original.
+        Resource.objects.filter(area=copy).first().delete()
+        self.assertEqual(Resource.objects.filter(area=self.area).count(), 10)
+
+    def test_clone_refuses_bad_or_taken_slugs(self):
+        for slug in ('template', 'not a slug', ''):
+            response = self.client.post('/api/areas/template/clone/', {'slug': slug}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(AcademicArea.objects.count(), 2)
+
+    def test_delete_removes_every_row(self):
+        clone_area(self.area, 'copy')
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.delete('/api/areas/copy/').status_code, 204)
+        self.assertFalse(AcademicArea.objects.filter(slug='copy').exists())
+
+        # Set-based: the query count does not grow with the area.
+        populate_area(self.area, 100)
+        copy, _ = clone_area(self.area, 'copy')
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.delete('/api/areas/copy/').status_code, 204)
+        self.assertEqual(len(small), len(large))
+
+        self.assertEqual(Resource.objects.exclude(area=self.area).count(), 0)
+        for model in (Course, Book, Paper, WebResource, PDFResource, CanvasItem, Note, Task, ResourceConnection):
+            self.assertEqual(model.objects.filter(
+                **({'area__slug': 'copy'} if hasattr(model, 'area') else {'resource__area__slug': 'copy'})
+            ).count(), 0)
+        self.assertEqual(Resource.objects.count(), 110)
+        self.assertEqual(Note.objects.count(), 111)
+        self.assertEqual(len(self.search('compilers', self.area)), 1)
+        self.assertFalse(AreaStats.objects.filter(area_id=copy.pk).exists())
+
+    def test_delete_handles_rows_of_other_areas(self):
+        target = self.resources[0]
+        kept = Resource.objects.create(area=self.other, title='Kept', resource_type='web')
+        note = Note.objects.create(area=self.other, resource=target, content='Points across areas')
+        link = ResourceConnection.objects.create(area=self.other, source=kept, target=target)
+        ChangeLogEntry.objects.all().delete()
+
+        delete_area(self.area.pk)
+        note.refresh_from_db()
+        self.assertIsNone(note.resource_id)
+        self.assertFalse(ResourceConnection.objects.filter(pk=link.pk).exists())
+        self.assertEqual(
+            set(ChangeLogEntry.objects.values_list('area_id', 'kind', 'object_id', 'deleted')),
+            {(self.other.pk, 'note', note.pk, False), (self.other.pk, 'connection', link.pk, True)},
+        )
+        self.assertEqual(AreaStats.objects.get(area=self.other).connection_count, 0)
+        self.assertEqual(len(self.search('points', self.other)), 1)
+        self.assertIsNone(delete_area(self.area.pk))
+
+    @override_settings(AREA_DELETE_JOB_ROWS=20)
+    def test_big_areas_are_deleted_by_a_job(self):
+        response = self.client.delete('/api/areas/template/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get(pk=response.json()['job']).kind, 'delete_area')
+        # Hidden straight away, gone once the job has run.
+        self.assertEqual(self.client.get('/api/areas/template/').status_code, 404)
+        self.assertNotIn('template', [a['slug'] for a in self.client.get('/api/areas/').json()])
+        self.assertEqual(self.client.post('/api/areas/template/clone/', {'slug': 'copy'}, format='json').status_code, 404)
+        self.assertEqual(self.client.get('/api/areas/template/changes/', {'since': 0}).status_code, 404)
+        JobRunner(workers=0).run(once=True)
+        self.assertEqual(Job.objects.get(pk=response.json()['job']).status, 'done')
+        self.assertFalse(AcademicArea.objects.filter(slug='template').exists())
+        self.assertEqual(Resource.objects.count(), 0)
+
+    def test_commands(self):
+        out = io.StringIO()
+        call_command('clone_area', 'template', 'copy', stdout=out)
+        self.assertIn('10 resources', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('clone_area', 'template', 'copy', stdout=io.StringIO())
+        call_command('delete_area', 'copy', stdout=out)
+        self.assertFalse(AcademicArea.objects.filter(slug='copy').exists())
+        call_command('delete_area', 'template', background=True, stdout=out)
+        self.assertTrue(AcademicArea.objects.get(slug='template').deleting)
@@ -2,13 +2,18 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from .metrics import metrics_view
 from .views import (
     AcademicAreaViewSet,
     ResourceViewSet,
     ResourceConnectionViewSet,
     CanvasItemViewSet,
     TaskViewSet,
-    NoteViewSet
+    NoteViewSet,
+    SearchView,
+    GraphViewSet,
+    UploadViewSet,
 )
 
 # Create a router and register our viewsets with it.
@@ -19,8 +24,17 @@ router.register(r'connections', ResourceConnectionViewSet, basename='resourcecon
 router.register(r'canvas-items', CanvasItemViewSet, basename='canvasitem')
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'notes', NoteViewSet, basename='note')
+router.register(r'graph', GraphViewSet, basename='graph')
+router.register(r'uploads', UploadViewSet, basename='upload')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    # Async read path, see api/async_views.py
+    path('async/areas/<slug:slug>/', async_views.area_detail, name='async-area-detail'),
+    path('async/areas/<slug:slug>/events/', async_views.area_events, name='async-area-events'),
+    path('async/resources/', async_views.resource_list, name='async-resource-list'),
+    path('async/search/', async_views.search, name='async-search'),
+    path('internal/metrics/', metrics_view, name='internal-metrics'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,84 +1,551 @@
 # In backend/api/views.py
 
-from rest_framework import viewsets, status
+import codecs
+import io
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
+from rest_framework import serializers, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import *
 from .serializers import * # Import all serializers from our new file
+from .areas import AreaError, clone_area, delete_or_queue
+from .backup import BackupError, import_area_stream, iter_area_export
+from .cache import area_cache, area_cache_key, area_etag, bump_area_version
+from .duplicates import duplicates_of, find_duplicates
+from .related import related_to, top_k
+from .changes import MAX_LIMIT, ChangesExpired, changes_since, latest_seq_subquery, record_changes
+from .fastpath import CANVAS_ITEM_VALUES, RESOURCE_VALUES, area_payload, canvas_item_payloads, fast_read_path, resource_payloads
+from .loaders import workspace_queryset
+from .notes import NoteConflict, NoteError, note_saver
+from .pagination import IdCursorPagination
+from .ingest import PARSERS, build_resource_detail, guess_format, ingest_resources, parse_json_array
+from .jobs import schedule_upload_expiry
+from .search import get_search_backend
+from .graph import describe_nodes, graph_index
+from .storage import UploadError, ranged_file_response, store_uploaded_file, write_chunk
+
+def get_area(value):
+    # Areas are addressed by id or by slug. Areas waiting for their
+    # delete_area job are gone already.
+    if str(value).isdigit():
+        return get_object_or_404(AcademicArea, pk=value, deleting=False)
+    return get_object_or_404(AcademicArea, slug=value, deleting=False)
+
+# Shared by the list endpoints: ?area=<id or slug> narrows the queryset to one
+# area, which the (area, id) indexes serve together with cursor pagination.
+# query_filters adds per-viewset filters, {param: (lookup, field)}, where the
+# DRF field parses the value; each one has a matching (area, ...) index.
+class AreaFilterMixin:
+    pagination_class = IdCursorPagination
+    query_filters = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        area = self.request.query_params.get('area')
+        if area:
+            if area.isdigit():
+                queryset = queryset.filter(area_id=area)
+            else:
+                queryset = queryset.filter(area__slug=area)
+        for param, (lookup, field) in self.query_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                value = field.run_validation(value)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({param: e.detail})
+            queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    # A write commits together with the area stats and version it moves.
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
 
 class AcademicAreaViewSet(viewsets.ModelViewSet):
-    queryset = AcademicArea.objects.all()
+    queryset = AcademicArea.objects.filter(deleting=False)
     serializer_class = AcademicAreaSerializer
     lookup_field = 'slug'
-    
+
+    def get_queryset(self):
+        # The detail view nests the whole workspace, so load it in bulk.
+        if self.action == 'retrieve':
+            return workspace_queryset().filter(deleting=False)
+        # The stats row comes along in the same query, see api/stats.py.
+        return super().get_queryset().select_related('stats')
+
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = AcademicAreaDetailSerializer(instance)
-        return Response(serializer.data)
+        # One cheap lookup of the area's version decides everything: a matching
+        # If-None-Match gets a 304, a cached payload is served as is, and only
+        # a cache miss loads and serializes the whole workspace.
+        slug = kwargs[self.lookup_field]
+        row = (
+            AcademicArea.objects.filter(slug=slug, deleting=False)
+            .annotate(seq=Coalesce(Subquery(latest_seq_subquery()), 0))
+            .values('id', 'version', 'seq').first()
+        )
+        if row is None:
+            raise Http404
+        etag = area_etag(row['id'], row['version'])
+        # The payload is at least as new as seq, so syncing from it via
+        # changes/ never misses a write (it may replay a few).
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Change-Seq': str(row['seq'])}
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache = area_cache()
+        key = area_cache_key(slug, row['id'], row['version'])
+        data = cache.get(key)
+        if data is None:
+            if fast_read_path(request):
+                data = area_payload(row['id'])
+            else:
+                data = AcademicAreaDetailSerializer(self.get_object()).data
+            cache.set(key, data)
+        return Response(data, headers=headers)
+
+    @action(detail=True)
+    def changes(self, request, slug=None):
+        # GET /api/areas/<slug>/changes/?since=<seq>[&limit=n] -- rows changed
+        # and deleted since seq, see api/changes.py. Page on with the returned
+        # seq while 'more' is true.
+        since = int_param(request, 'since', minimum=0)
+        limit = int_param(request, 'limit', 500, 1, MAX_LIMIT)
+        area = get_object_or_404(AcademicArea, slug=slug, deleting=False)
+        try:
+            return Response(changes_since(area, since, limit))
+        except ChangesExpired as e:
+            return Response({'error': str(e), 'horizon': e.horizon}, status=status.HTTP_410_GONE)
+
+    @action(detail=True)
+    def export(self, request, slug=None):
+        # GET /api/areas/<slug>/export/ streams an NDJSON backup of the area.
+        area = get_object_or_404(AcademicArea, slug=slug, deleting=False)
+        response = StreamingHttpResponse(iter_area_export(area), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{area.slug}.ndjson"'
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        # Set-based, see api/areas.py. A big area is handed to a delete_area
+        # job: 202 with the job id, and the area is gone from the API already.
+        job = delete_or_queue(self.get_object())
+        if job is not None:
+            return Response({'job': job.pk}, status=status.HTTP_202_ACCEPTED)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'])
+    def clone(self, request, slug=None):
+        # POST /api/areas/<slug>/clone/ {"slug": "new-slug", "name": "optional"}
+        # copies the area with everything in it, as a template.
+        new_slug = request.data.get('slug')
+        field = AcademicArea._meta.get_field('slug')
+        try:
+            field.run_validators(new_slug or '')
+        except DjangoValidationError:
+            new_slug = None
+        if not new_slug:
+            return Response({'error': 'Pass a valid slug for the new area.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            area, counts = clone_area(self.get_object(), new_slug, name=request.data.get('name'))
+        except AreaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'slug': area.slug, 'id': area.id, 'counts': counts}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_backup(self, request):
+        # POST /api/areas/import/ with the backup in the 'file' field and an
+        # optional 'slug' / 'name' for the restored area.
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the backup in the file field.'}, status=status.HTTP_400_BAD_REQUEST)
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8')
+        try:
+            area, counts = import_area_stream(lines, slug=request.data.get('slug'), name=request.data.get('name'))
+        except BackupError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'slug': area.slug, 'id': area.id, 'counts': counts}, status=status.HTTP_201_CREATED)
 
 # THIS IS THE CORRECTED PART
-class ResourceViewSet(viewsets.ModelViewSet):
+class ResourceViewSet(AreaFilterMixin, viewsets.ModelViewSet):
     queryset = Resource.objects.all()
     # Use our new, manual ResourceSerializer, NOT the old name.
     serializer_class = ResourceSerializer 
+    query_filters = {'resource_type': ('resource_type', serializers.ChoiceField(Resource.RESOURCE_TYPES))}
+
+    def list(self, request, *args, **kwargs):
+        # Same output as the serializers, built from values(), see api/fastpath.py.
+        if not fast_read_path(request):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()).values(*RESOURCE_VALUES))
+        return self.get_paginated_response(resource_payloads(page))
     
     def create(self, request, *args, **kwargs):
         # 1. Get the data from the frontend request
         data = request.data
         resource_type = data.get('resource_type')
 
-        # 2. Create the base Resource object
-        try:
-            base_resource = Resource.objects.create(
-                area_id=data.get('area'),
-                title=data.get('title'),
-                resource_type=resource_type
-            )
-        except Exception as e:
-            return Response({'error': f'Failed to create base resource: {e}'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 3. Based on the type, create the specific child object
-        if resource_type == 'course':
-            Course.objects.create(
-                resource=base_resource,
-                lecturer=data.get('lecturer', ''),
-                website=data.get('website', '')
-            )
-        elif resource_type == 'book':
-            Book.objects.create(
-                resource=base_resource,
-                authors=data.get('authors', ''),
-                url=data.get('url', '')
-            )
-        elif resource_type == 'paper':
-            Paper.objects.create(
-                resource=base_resource,
-                authors=data.get('authors', ''),
-                publication_year=data.get('publication_year')
-            )
-        elif resource_type == 'web':
-            WebResource.objects.create(
-                resource=base_resource,
-                url=data.get('url', '')
-            )
-        # Add other types (like PDF) here as needed
+        # Near-duplicates anywhere in the library come back as a warning in
+        # 'duplicates'. With on_duplicate=existing, a near-duplicate in the
+        # same area is returned (200) instead of creating another copy.
+        duplicates = find_duplicates(data.get('title') or '', data.get('authors') or '')
+        if data.get('on_duplicate') == 'existing':
+            same_area = [d for d in duplicates if str(d['area']) == str(data.get('area'))]
+            if same_area:
+                existing = Resource.objects.get(pk=same_area[0]['id'])
+                return Response({**self.get_serializer(existing).data, 'duplicates': duplicates})
+
+        # SQLite checks foreign keys at COMMIT, which is outside the try
+        # below, so the area is looked up first, before a PDF is stored for it.
+        area_id = data.get('area')
+        if not str(area_id).isdigit() or not AcademicArea.objects.filter(pk=area_id, deleting=False).exists():
+            return Response({'error': f"Failed to create base resource: no area with id '{area_id}'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # PDFs come either from a finished chunked upload or as a multipart file.
+        stored_file = None
+        if resource_type == 'pdf':
+            try:
+                stored_file = self.get_pdf(data, request.FILES.get('file'))
+            except UploadError as e:
+                return Response({'error': str(e)}, status=e.status)
+
+        # 2. Create the base Resource object and, based on the type, the
+        # specific child object in one transaction.
+        with transaction.atomic():
+            try:
+                base_resource = Resource.objects.create(
+                    area_id=area_id,
+                    title=data.get('title'),
+                    resource_type=resource_type
+                )
+            except Exception as e:
+                return Response({'error': f'Failed to create base resource: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # 3. The child row holds the type-specific fields
+            child = build_resource_detail(base_resource, data)
+            if child is not None:
+                if stored_file is not None:
+                    child.stored_file = stored_file
+                    child.file = stored_file.file.name
+                    child.page_count = stored_file.page_count
+                child.save()
 
         # 4. Serialize the complete, newly created object and send it back
         serializer = self.get_serializer(base_resource)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response({**serializer.data, 'duplicates': duplicates}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, url_path='duplicates', url_name='check-duplicates')
+    def check_duplicates(self, request):
+        # GET /api/resources/duplicates/?title=...&authors=... checks a
+        # resource before it is created (e.g. while the form is filled in).
+        title = request.query_params.get('title', '')
+        if not title.strip():
+            return Response({'error': 'Give a title.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'duplicates': find_duplicates(title, request.query_params.get('authors', ''))})
+
+    @action(detail=True, url_path='duplicates')
+    def duplicates(self, request, pk=None):
+        # GET /api/resources/<id>/duplicates/
+        return Response({'duplicates': duplicates_of(self.get_object())})
+
+    @action(detail=True)
+    def related(self, request, pk=None):
+        # GET /api/resources/<id>/related/?limit=10 -- precomputed suggestions
+        # from other areas, see api/related.py.
+        resource = self.get_object()
+        return Response({'related': related_to(resource.pk, int_param(request, 'limit', top_k(), 1, top_k()))})
+
+    def get_pdf(self, data, upload):
+        if data.get('upload'):
+            try:
+                session = UploadSession.objects.select_related('stored_file').filter(pk=data['upload']).first()
+            except DjangoValidationError:
+                session = None
+            if session is None or session.stored_file is None:
+                raise UploadError('The upload does not exist or is not complete yet.')
+            return session.stored_file
+        if upload is not None:
+            return store_uploaded_file(upload)
+        return None
+
+    @action(detail=True, methods=['get', 'head'])
+    def file(self, request, pk=None):
+        # GET /api/resources/<id>/file/ serves the PDF, with Range support.
+        resource = self.get_object()
+        pdf = PDFResource.objects.select_related('stored_file').filter(resource=resource).first()
+        if pdf is None or pdf.stored_file is None:
+            raise Http404
+        return ranged_file_response(request, pdf.stored_file, f'{resource.title}.pdf')
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # POST /api/resources/bulk/?area=<id or slug>
+        # Either a JSON list of rows, or a multipart upload in the 'file' field
+        # (csv, jsonl, json or bibtex, guessed from the name unless ?format= is
+        # given). A JSON body is read from the stream a row at a time rather
+        # than through request.data, so its size does not matter.
+        if request.content_type.startswith('application/json'):
+            area = get_area(request.query_params.get('area', ''))
+            if request.stream is None:
+                return Response({'error': 'Send a list of rows or upload a file.'}, status=status.HTTP_400_BAD_REQUEST)
+            rows = parse_json_array(codecs.getreader('utf-8-sig')(request.stream))
+        else:
+            area = get_area(request.query_params.get('area') or request.data.get('area', ''))
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Send a list of rows or upload a file.'}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = request.query_params.get('format') or request.data.get('format') or guess_format(upload.name)
+            if fmt not in PARSERS:
+                return Response({'error': f'Unsupported format: {fmt}'}, status=status.HTTP_400_BAD_REQUEST)
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            rows = PARSERS[fmt](stream)
+        report = ingest_resources(rows, area)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
 
 # The rest of the viewsets are standard
-class ResourceConnectionViewSet(viewsets.ModelViewSet):
+class ResourceConnectionViewSet(AreaFilterMixin, viewsets.ModelViewSet):
     queryset = ResourceConnection.objects.all()
     serializer_class = ResourceConnectionSerializer
 
-class CanvasItemViewSet(viewsets.ModelViewSet):
-    queryset = CanvasItem.objects.all()
+class CanvasItemViewSet(AreaFilterMixin, viewsets.ModelViewSet):
+    queryset = CanvasItem.objects.select_related('resource')
     serializer_class = CanvasItemSerializer
 
-class TaskViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        if not fast_read_path(request):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()).values(*CANVAS_ITEM_VALUES))
+        return self.get_paginated_response(canvas_item_payloads(page))
+
+    @action(detail=False, methods=['post'])
+    def positions(self, request):
+        # POST /api/canvas-items/positions/
+        # {"area": 1, "positions": [{"id": 3, "pos_x": 10, "pos_y": 20}, ...]}
+        serializer = CanvasPositionsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        area_id = serializer.validated_data['area']
+        positions = {p['id']: p for p in serializer.validated_data['positions']}
+
+        with transaction.atomic():
+            items = list(CanvasItem.objects.filter(area_id=area_id, id__in=positions).only('id', 'area_id'))
+            unknown = sorted(set(positions) - {item.id for item in items})
+            if unknown:
+                return Response(
+                    {'error': 'Canvas items not found in this area.', 'ids': unknown},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            for item in items:
+                item.pos_x = positions[item.id]['pos_x']
+                item.pos_y = positions[item.id]['pos_y']
+            CanvasItem.objects.bulk_update(items, ['pos_x', 'pos_y'])
+            record_changes(area_id, 'canvas_item', [item.id for item in items])
+            bump_area_version(area_id)
+        return Response({'updated': len(items)})
+
+class TaskViewSet(AreaFilterMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    query_filters = {'is_completed': ('is_completed', serializers.BooleanField())}
     
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(AreaFilterMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
-    serializer_class = NoteSerializer
\ No newline at end of file
+    serializer_class = NoteSerializer
+    query_filters = {'updated_after': ('updated_at__gt', serializers.DateTimeField())}
+
+    @action(detail=False, methods=['post'])
+    def upsert(self, request):
+        # Autosave, see api/notes.py.
+        #   POST /api/notes/upsert/ {"id": 7, "version": 3, "patches": [{"start": 10, "end": 14, "text": "..."}]}
+        #   POST /api/notes/upsert/ {"id": 7, "version": 3, "content": "the whole text"}
+        #   POST /api/notes/upsert/ {"area": 1, "resource": 5, "content": "..."}  -- no id: a new note
+        # Answers {"id", "version", "saved"} once the save is written, saved
+        # being false while its fan-out waits for the note_saved job, or 409
+        # with the current version and content.
+        data = request.data
+        if not isinstance(data, dict):
+            return Response({'error': 'Expected an object.'}, status=status.HTTP_400_BAD_REQUEST)
+        if data.get('id') is None:
+            serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            return Response({**serializer.data, 'saved': True}, status=status.HTTP_201_CREATED)
+
+        patches, content = data.get('patches'), data.get('content')
+        if (patches is None) == (content is None):
+            return Response({'error': 'Send either patches or content.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (isinstance(patches, list) or isinstance(content, str)):
+            return Response({'error': 'patches must be a list, content a string.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            note_id, version = int(data['id']), int(data['version'])
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'id and version must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            _, version, fanned_out = note_saver().save(note_id, version, patches=patches, content=content)
+        except NoteConflict as e:
+            return Response({'error': str(e), 'id': note_id, 'version': e.version, 'content': e.content}, status=e.status)
+        except NoteError as e:
+            return Response({'error': str(e)}, status=e.status)
+        return Response({'id': note_id, 'version': version, 'saved': fanned_out})
+
+    def update(self, request, *args, **kwargs):
+        # A "version" in the body is checked like the upsert's. The check and
+        # the write share one transaction with the row locked (BEGIN
+        # IMMEDIATE on SQLite), so two updates made against the same version
+        # cannot both pass.
+        with transaction.atomic():
+            note = self.get_object()
+            current_version, content = Note.objects.select_for_update().values_list('version', 'content').get(pk=note.pk)
+            version = request.data.get('version') if isinstance(request.data, dict) else None
+            if version is not None and str(version) != str(current_version):
+                e = NoteConflict(note.pk, current_version, content)
+                return Response({'error': str(e), 'id': note.pk, 'version': e.version, 'content': e.content}, status=e.status)
+            return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # The instance was loaded under the lock taken in update().
+        if 'content' in serializer.validated_data:
+            serializer.instance.version += 1
+        super().perform_update(serializer)
+
+class UploadViewSet(viewsets.ViewSet):
+    # Resumable, chunked PDF uploads:
+    #   POST /api/uploads/       {"filename": "paper.pdf", "size": 123456}
+    #   PUT  /api/uploads/<id>/  raw bytes with "Content-Range: bytes 0-8388607/123456"
+    #   GET  /api/uploads/<id>/  how many bytes arrived, to resume after a failure
+    # Once complete the response carries the content hash, and the upload id
+    # can be passed as "upload" when creating a resource of type pdf.
+    lookup_value_regex = '[0-9a-f-]{36}'
+
+    def create(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        schedule_upload_expiry()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        session = get_object_or_404(UploadSession.objects.select_related('stored_file'), pk=pk)
+        return Response(UploadSessionSerializer(session).data)
+
+    def update(self, request, pk=None):
+        session = get_object_or_404(UploadSession, pk=pk)
+        if request.stream is None:
+            return Response({'error': 'The request has no body.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = write_chunk(session, request.headers.get('Content-Range'), request.stream)
+        except UploadError as e:
+            return Response({'error': str(e), 'received': session.received}, status=e.status)
+        return Response(UploadSessionSerializer(session).data)
+
+
+class SearchView(APIView):
+    # GET /api/search/?q=turing&area=<id or slug>&type=resource|note&limit=20
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        area = request.query_params.get('area')
+        kind = request.query_params.get('type')
+        if kind not in (None, 'resource', 'note'):
+            return Response({'error': "type must be 'resource' or 'note'."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = int_param(request, 'limit', 20, 1, 100)
+        area_id = get_area(area).id if area else None
+        results = get_search_backend().search(query, area_id=area_id, kind=kind, limit=limit)
+        return Response({'query': query, 'results': results})
+
+
+def int_param(request, name, default=None, minimum=None, maximum=None):
+    # Reads an integer query parameter, clamped to [minimum, maximum]. Reads
+    # request.GET, so api/async_views.py uses it with plain HttpRequests too.
+    value = request.GET.get(name)
+    if value is None:
+        if default is None:
+            raise serializers.ValidationError({name: 'This parameter is required.'})
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise serializers.ValidationError({name: 'A valid integer is required.'})
+    if minimum is not None:
+        value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+class GraphViewSet(viewsets.ViewSet):
+    # Read-only traversals over ResourceConnection, answered from the
+    # in-memory GraphIndex. Each request costs the index's change check
+    # (two queries, more only if connections changed) and one query to
+    # describe the returned nodes.
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.index = graph_index()
+        self.index.refresh()
+
+    def area_id(self, request):
+        area = request.query_params.get('area')
+        return get_area(area).id if area else None
+
+    def list(self, request):
+        # GET /api/graph/?area=<id or slug>&after=<edge id>&limit=500
+        limit = int_param(request, 'limit', 500, 1, 1000)
+        after = int_param(request, 'after', 0)
+        edges, has_more = self.index.edge_page(after, limit, self.area_id(request))
+        nodes = describe_nodes({e['source'] for e in edges} | {e['target'] for e in edges})
+        return Response({
+            'nodes': list(nodes.values()),
+            'edges': edges,
+            'next': edges[-1]['id'] if has_more else None,
+        })
+
+    @action(detail=False)
+    def neighbourhood(self, request):
+        # GET /api/graph/neighbourhood/?resource=<id>&depth=2
+        resource = int_param(request, 'resource')
+        depth = int_param(request, 'depth', 1, 1, 5)
+        max_nodes = int_param(request, 'limit', 500, 1, 5000)
+        distances, edges, truncated = self.index.neighbourhood(resource, depth, max_nodes)
+        nodes = describe_nodes(distances)
+        if resource not in nodes:
+            raise Http404
+        for node_id, node in nodes.items():
+            node['depth'] = distances[node_id]
+        return Response({'nodes': list(nodes.values()), 'edges': edges, 'truncated': truncated})
+
+    @action(detail=False)
+    def path(self, request):
+        # GET /api/graph/path/?source=<id>&target=<id>
+        source = int_param(request, 'source')
+        target = int_param(request, 'target')
+        max_depth = int_param(request, 'max_depth', 10, 1, 50)
+        path, edges = self.index.shortest_path(source, target, max_depth)
+        if path is None:
+            return Response({'nodes': [], 'edges': [], 'length': None})
+        nodes = describe_nodes(path)
+        return Response({'nodes': [nodes[n] for n in path if n in nodes], 'edges': edges, 'length': len(edges)})
+
+    @action(detail=False)
+    def components(self, request):
+        # GET /api/graph/components/?area=<id or slug>
+        components = self.index.components(self.area_id(request))
+        return Response({
+            'count': len(components),
+            'components': [{'size': len(nodes), 'nodes': nodes} for nodes in components],
+        })
@@ -3,6 +3,13 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, e.g. ``uvicorn backend.asgi:application``. The
+async read endpoints in api/async_views.py (/api/async/...) then run on the
+event loop; the DRF viewsets keep working through Django's sync adapter.
+Live updates (/api/async/areas/<slug>/events/, see api/events.py) need this
+deployment: each open stream is a coroutine rather than a worker thread.
+``manage.py loadtest`` compares this deployment against the WSGI one.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware', # First, so its timings cover everything below
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,13 +78,52 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite, tuned for a multi-threaded server:
+#  - WAL journaling, so readers never wait for the writer and vice versa
+#  - synchronous=NORMAL, which is durable with WAL except for the last
+#    transactions before a power loss
+#  - the file memory-mapped and a 32 MB page cache per connection
+#  - write transactions take the write lock up front (BEGIN IMMEDIATE) and
+#    wait up to `timeout` seconds for it; see api/sqlite.py for the retries
+#  - connections are kept open between requests (CONN_MAX_AGE)
+# Reads go through a second, read-only connection to the same file and
+# writes through the writer; api.routers.ReadWriteRouter picks one.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -32000',
+    'PRAGMA temp_store = MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # journal_mode is a property of the file, the writer sets it.
+            'init_command': '; '.join(SQLITE_PRAGMAS[1:] + ['PRAGMA query_only = ON']),
+            'timeout': 5,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['api.routers.ReadWriteRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,11 +161,120 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files. PDFs are kept content-addressed under MEDIA_ROOT/blobs/.
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+MAX_PDF_UPLOAD_SIZE = 1024 * 1024 * 1024
+# Upload sessions not written to for this many hours are deleted with their
+# partial files by the expire_uploads job.
+UPLOAD_EXPIRY_HOURS = 24
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches
+# Area detail payloads live in their own cache so they can be sized (and
+# evicted) independently; point 'areas' at Redis or Memcached in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'areas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'area-payloads',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 200, 'CULL_FREQUENCY': 4},
+    },
+}
+
+AREA_CACHE_ALIAS = 'areas'
+
+# orjson renders the same bytes as DRF's JSONRenderer when it is installed
+# (api/renderers.py); without it FastJSONRenderer is JSONRenderer.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Build the resource/canvas item lists and the area detail payload straight
+# from values() instead of through the serializers (api/fastpath.py).
+FAST_READ_PATH = True
+
+# Full-text search backend (dotted path). None picks the SQLite FTS5 index on
+# SQLite and api.search.DatabaseSearchBackend on any other database.
+SEARCH_BACKEND = None
+
+# Near-duplicate detection (api/duplicates.py): resources whose titles and
+# authors have an estimated Jaccard similarity of at least this are reported
+# as duplicates on create and by the find_duplicates command.
+DUPLICATE_THRESHOLD = 0.6
+
+# Related-resource suggestions (api/related.py): neighbours kept per resource,
+# and how long the update_related job waits after a write, so that a burst
+# of edits is handled in one run.
+RELATED_TOP_K = 10
+RELATED_UPDATE_DELAY = 30
+
+# Whole-area clone and delete (api/areas.py): deleting an area holding more
+# than AREA_DELETE_JOB_ROWS resources, notes, tasks and connections is left
+# to a delete_area job.
+AREA_DELETE_JOB_ROWS = 10_000
+
+# Note autosave (api/notes.py): every save is written at once, but the
+# fan-out of a note write (search, change log, events, ...) runs at most once
+# per NOTE_SAVE_INTERVAL seconds, the saves in between through a note_saved
+# job. 0 fans out every save straight away.
+NOTE_SAVE_INTERVAL = 2
+
+# Request metrics (api/metrics.py): requests slower than SLOW_REQUEST_MS are
+# logged to 'api.performance' with their slowest SQL; /api/internal/metrics/
+# is only answered for METRICS_ALLOWED_IPS (or with DEBUG on).
+SLOW_REQUEST_MS = 500
+SERVER_TIMING_HEADER = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.performance': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Delta sync (api/changes.py): compact_changes drops change log entries older
+# than this; clients further behind reload the whole area.
+CHANGE_LOG_RETENTION_DAYS = 7
+
+# Live updates over Server-Sent Events (api/events.py). The default broker
+# only reaches clients connected to the same process; see the module for
+# plugging in a shared one. Each client buffers at most EVENT_QUEUE_SIZE
+# events before it is told to resync.
+EVENT_BROKER = 'api.events.LocalBroker'
+EVENT_QUEUE_SIZE = 100
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Link health checks (api/links.py): the check_links job and command probe
+# course, book and web resource URLs last checked more than
+# LINK_CHECK_STALE_HOURS ago, at most LINK_CHECK_CONCURRENCY at a time and
+# LINK_CHECK_PER_HOST per host, giving each LINK_CHECK_TIMEOUT seconds.
+LINK_CHECK_STALE_HOURS = 24
+LINK_CHECK_CONCURRENCY = 20
+LINK_CHECK_PER_HOST = 2
+LINK_CHECK_TIMEOUT = 10
+# Hosts resolving to loopback, private or link-local addresses are refused,
+# so users cannot make the server probe its own network. True allows them.
+LINK_CHECK_ALLOW_PRIVATE = False
+
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'ETag', 'X-Change-Seq']
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000", # The address of our React front-end
 ]
\ No newline at end of file
@@ -10,6 +10,18 @@ function AddResourceModal({ areaId, onClose, onResourceAdded }) {
   const [authors, setAuthors] = useState('');
   const [url, setUrl] = useState('');
   const [error, setError] = useState('');
+  // Near-duplicates the backend already knows about, see api/duplicates.py.
+  const [duplicates, setDuplicates] = useState([]);
+
+  const checkDuplicates = () => {
+    if (!title.trim()) {
+      setDuplicates([]);
+      return;
+    }
+    axios.get('http://127.0.0.1:8000/api/resources/duplicates/', { params: { title, authors } })
+      .then(response => setDuplicates(response.data.duplicates))
+      .catch(() => setDuplicates([]));
+  };
 
   const handleSubmit = (e) => {
     e.preventDefault(); // Prevent default form submission which reloads the page
@@ -48,6 +60,7 @@ function AddResourceModal({ areaId, onClose, onResourceAdded }) {
               type="text"
               value={title}
               onChange={(e) => setTitle(e.target.value)}
+              onBlur={checkDuplicates}
               required
             />
           </div>
@@ -67,6 +80,7 @@ function AddResourceModal({ areaId, onClose, onResourceAdded }) {
               type="text"
               value={authors}
               onChange={(e) => setAuthors(e.target.value)}
+              onBlur={checkDuplicates}
               placeholder="e.g., Smith, J., Doe, A."
             />
           </div>
@@ -79,6 +93,21 @@ function AddResourceModal({ areaId, onClose, onResourceAdded }) {
               placeholder="https://example.com"
             />
           </div>
+          {duplicates.length > 0 && (
+            <div className="duplicate-warning">
+              <p>This looks like a resource you already have:</p>
+              <ul>
+                {duplicates.map(d => (
+                  <li key={d.id}>
+                    {d.title} ({d.resource_type}, {String(d.area) === String(areaId) ? 'this area' : d.area_slug})
+                  </li>
+                ))}
+              </ul>
+              {duplicates.some(d => String(d.area) === String(areaId)) && (
+                <button type="button" onClick={onClose}>Keep the existing one</button>
+              )}
+            </div>
+          )}
           {error && <p className="error-message">{error}</p>}
           <div className="form-actions">
             <button type="submit">Add Resource</button>
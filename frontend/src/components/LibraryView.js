@@ -37,6 +37,13 @@ function LibraryView() {
           <li key={area.id}>
             {/* This Link now uses the area's slug for the URL */}
             <Link to={`/${area.slug}`}>{area.name}</Link>
+            {/* Counts come with the area list, no extra requests per area */}
+            {area.stats && (
+              <small>
+                {' '}{area.stats.resource_count} resources · {area.stats.note_count} notes ·{' '}
+                {area.stats.open_task_count}/{area.stats.task_count} tasks open
+              </small>
+            )}
           </li>
         ))}
       </ul>
@@ -1,36 +1,117 @@
 // In frontend/src/components/NoteEditor.js
 
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import ReactMarkdown from 'react-markdown';
 import SimpleMDE from "react-simplemde-editor";
 import "easymde/dist/easymde.min.css";
 
+const UPSERT_URL = 'http://127.0.0.1:8000/api/notes/upsert/';
+// Typing pauses shorter than this are saved together.
+const AUTOSAVE_DELAY_MS = 1000;
+
+const isHighSurrogate = code => code >= 0xd800 && code <= 0xdbff;
+
+// The one replacement that turns `before` into `after`: what lies between
+// their common prefix and suffix. Indices are UTF-16 code units, as the
+// backend expects, and never split a surrogate pair.
+function diffPatch(before, after) {
+  let start = 0;
+  while (start < before.length && start < after.length && before[start] === after[start]) start++;
+  if (start > 0 && isHighSurrogate(before.charCodeAt(start - 1))) start--;
+  let end = 0;
+  while (
+    end < before.length - start && end < after.length - start &&
+    before[before.length - 1 - end] === after[after.length - 1 - end]
+  ) end++;
+  if (end > 0 && isHighSurrogate(before.charCodeAt(before.length - 1 - end))) end--;
+  return { start, end: before.length - end, text: after.slice(start, after.length - end) };
+}
+
 function NoteEditor({ resource, areaId, onNoteAdded }) {
   const [newNoteContent, setNewNoteContent] = useState("");
   const [isEditing, setIsEditing] = useState(false);
+  const [status, setStatus] = useState('');
+  const [conflict, setConflict] = useState(null);
+  // One object per draft: what the server has of it (the note once
+  // created, its version and text) and the save in flight.
+  const newDraft = () => ({ note: null, version: null, content: '', saving: Promise.resolve() });
+  const draft = useRef(newDraft());
 
-  const handleAddNote = () => {
-    // Prepare the data to be sent to the API
-    const payload = {
-      content: newNoteContent,
-      area: areaId,
-      resource: resource.id, // Link this note to the specific resource
-    };
+  // Sends the editor's text: the first save creates the note, later ones
+  // only the change since the last saved version. Saves go one at a time,
+  // each against the version the previous one produced.
+  const save = (content) => {
+    const current = draft.current;
+    current.saving = current.saving.then(() => {
+      if (current.note && content === current.content) return undefined;
+      const payload = current.note
+        ? { id: current.note.id, version: current.version, patches: [diffPatch(current.content, content)] }
+        : { content, area: areaId, resource: resource.id };
+      setStatus('Saving...');
+      return axios.post(UPSERT_URL, payload)
+        .then(response => {
+          current.note = current.note || response.data;
+          current.version = response.data.version;
+          current.content = content;
+          setStatus('Saved');
+        })
+        .catch(err => {
+          if (err.response && err.response.status === 409) {
+            // Changed elsewhere: nothing is overwritten, the user decides.
+            setConflict(err.response.data);
+            setStatus('');
+          } else {
+            console.error("Failed to save note:", err);
+            setStatus('Not saved');
+          }
+        });
+    });
+    return current.saving;
+  };
+
+  useEffect(() => {
+    if (!isEditing || conflict || !newNoteContent) return undefined;
+    const timer = setTimeout(() => save(newNoteContent), AUTOSAVE_DELAY_MS);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [newNoteContent, isEditing, conflict]);
 
-    // Send a POST request to our 'notes' API endpoint
-    axios.post('http://127.0.0.1:8000/api/notes/', payload)
-      .then(response => {
-        // Call the function passed down from the parent to update the UI
-        onNoteAdded(response.data);
-        // Reset the editor
-        setNewNoteContent("");
-        setIsEditing(false);
-      })
-      .catch(err => {
-        console.error("Failed to add note:", err);
+  const reset = () => {
+    draft.current = newDraft();
+    setNewNoteContent("");
+    setIsEditing(false);
+    setStatus('');
+    setConflict(null);
+  };
+
+  const handleAddNote = () => {
+    const current = draft.current;
+    save(newNoteContent).then(() => {
+      if (!current.note || current.content !== newNoteContent) {
         alert("Error: Could not save the note.");
-      });
+        return;
+      }
+      // Call the function passed down from the parent to update the UI
+      onNoteAdded({ ...current.note, content: current.content, version: current.version });
+      reset();
+    });
+  };
+
+  const handleCancel = () => {
+    // An autosaved draft goes again, once its saves are through.
+    const current = draft.current;
+    current.saving
+      .then(() => current.note && axios.delete(`http://127.0.0.1:8000/api/notes/${current.note.id}/`))
+      .catch(err => console.error("Failed to discard the note:", err));
+    reset();
+  };
+
+  const loadLatest = () => {
+    draft.current.version = conflict.version;
+    draft.current.content = conflict.content;
+    setNewNoteContent(conflict.content);
+    setConflict(null);
   };
 
   return (
@@ -57,8 +138,16 @@ function NoteEditor({ resource, areaId, onNoteAdded }) {
         ) : (
           <div>
             <SimpleMDE value={newNoteContent} onChange={setNewNoteContent} />
-            <button onClick={handleAddNote}>Save Note</button>
-            <button onClick={() => setIsEditing(false)}>Cancel</button>
+            {conflict ? (
+              <p className="error-message">
+                This note was changed elsewhere.{' '}
+                <button onClick={loadLatest}>Load the latest version</button>
+              </p>
+            ) : (
+              status && <p className="note-status">{status}</p>
+            )}
+            <button onClick={handleAddNote} disabled={!!conflict}>Save Note</button>
+            <button onClick={handleCancel}>Cancel</button>
           </div>
         )}
       </div>
@@ -1,14 +1,37 @@
 // In frontend/src/components/ResourceDetail.js
 
-import React from 'react';
+import React, { useEffect, useState } from 'react';
+import axios from 'axios';
 import NoteEditor from './NoteEditor';
 
 function ResourceDetail({ resource, areaId, onNoteAdded }) {
+  // Suggestions from other areas, precomputed by the backend (api/related.py).
+  const [related, setRelated] = useState([]);
+  const resourceId = resource && resource.id;
+
+  useEffect(() => {
+    setRelated([]);
+    if (!resourceId) return;
+    axios.get(`http://127.0.0.1:8000/api/resources/${resourceId}/related/`)
+      .then(response => setRelated(response.data.related))
+      .catch(() => setRelated([]));
+  }, [resourceId]);
+
   // If no resource is selected (e.g., on initial load), show a message
   if (!resource) {
     return <div>Select a resource to view its details.</div>;
   }
 
+  // Filled in by the backend's link checker for courses, books and web resources.
+  const details = resource.details || {};
+  const linkChecked = details.link_checked_at && (
+    <p>
+      <strong>Link:</strong>{' '}
+      {details.link_status == null ? 'unreachable' : details.link_status < 400 ? 'OK' : `broken (${details.link_status})`}
+      {' '}(checked {new Date(details.link_checked_at).toLocaleString()})
+    </p>
+  );
+
   return (
     <div className="resource-detail">
       <h3>{resource.title}</h3>
@@ -16,6 +39,17 @@ function ResourceDetail({ resource, areaId, onNoteAdded }) {
       {resource.authors && <p><strong>Authors:</strong> {resource.authors}</p>}
       {resource.publication_year && <p><strong>Year:</strong> {resource.publication_year}</p>}
       {resource.url && <p><strong>URL:</strong> <a href={resource.url} target="_blank" rel="noopener noreferrer">{resource.url}</a></p>}
+      {linkChecked}
+      {related.length > 0 && (
+        <div className="related-resources">
+          <strong>Related in other areas:</strong>
+          <ul>
+            {related.map(r => (
+              <li key={r.id}>{r.title} ({r.resource_type}, {r.area_slug})</li>
+            ))}
+          </ul>
+        </div>
+      )}
 
       <NoteEditor 
         resource={resource} 
@@ -1,6 +1,6 @@
 // In frontend/src/components/WorkspaceView.js
 
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import axios from 'axios';
 
@@ -69,6 +69,27 @@ const Canvas = ({ nodes, edges, onNodesChange, onEdgesChange, handleNodeDragStop
   );
 };
 
+// --- Delta sync ---
+// Merges a response of /api/areas/<slug>/changes/ into the area payload:
+// changed rows replace (or are added to) their list, deleted ids are dropped.
+const SYNCED_LISTS = ['resources', 'canvas_items', 'connections', 'tasks', 'notes'];
+
+function applyChanges(area, body) {
+  const next = { ...area };
+  SYNCED_LISTS.forEach(key => {
+    const changed = body.changed[key];
+    const deleted = new Set(body.deleted[key]);
+    if (changed.length === 0 && deleted.size === 0) return;
+    const byId = new Map(changed.map(row => [row.id, row]));
+    const rows = area[key]
+      .filter(row => !deleted.has(row.id))
+      .map(row => byId.get(row.id) || row);
+    const known = new Set(rows.map(row => row.id));
+    next[key] = [...rows, ...changed.filter(row => !known.has(row.id))];
+  });
+  return next;
+}
+
 function WorkspaceView() {
   const { areaSlug } = useParams();
   const [area, setArea] = useState(null);
@@ -125,20 +146,23 @@ function WorkspaceView() {
       }).catch(err => console.error("Failed to delete canvas item:", err));
   }, []);
 
-  const handleNodeDragStop = useCallback((event, node) => {
-    if (node.id === 'planner-node') {
-      // For now, we don't save the planner's position.
-      // The local drag will feel smooth because of onNodesChange.
-      return;
-    }
-    const { canvasItemId } = node.data;
-    if (!canvasItemId) return;
-
-    axios.patch(`http://127.0.0.1:8000/api/canvas-items/${canvasItemId}/`, {
-      pos_x: Math.round(node.position.x),
-      pos_y: Math.round(node.position.y),
-    }).catch(err => console.error('Failed to update node position:', err));
-  }, []);
+  const handleNodeDragStop = useCallback((event, node, draggedNodes) => {
+    if (!area) return;
+    // React Flow passes every node of a multi-selection drag, so the whole
+    // move is saved with a single bulk request.
+    // For now, we don't save the planner's position.
+    const positions = (draggedNodes || [node])
+      .filter(n => n.id !== 'planner-node' && n.data.canvasItemId)
+      .map(n => ({
+        id: n.data.canvasItemId,
+        pos_x: Math.round(n.position.x),
+        pos_y: Math.round(n.position.y),
+      }));
+    if (positions.length === 0) return;
+
+    axios.post('http://127.0.0.1:8000/api/canvas-items/positions/', { area: area.id, positions })
+      .catch(err => console.error('Failed to update node positions:', err));
+  }, [area]);
 
   const onResourceDropped = useCallback((droppedItem, position) => {
     setNodes(currentNodes => {
@@ -168,17 +192,74 @@ function WorkspaceView() {
   }, [area, setNodes]);
 
 
-useEffect(() => {
-    const fetchWorkspaceData = async () => {
-      try {
-        const response = await axios.get(`http://127.0.0.1:8000/api/areas/${areaSlug}/`);
-        setArea(response.data); // Set the master data state
-      } catch (err) { setError('Failed to fetch workspace data.'); } 
-      finally { setLoading(false); }
-    };
-    fetchWorkspaceData();
+  // The change log position the loaded area is current to.
+  const changeSeq = useRef(null);
+
+  const fetchWorkspaceData = useCallback(async () => {
+    try {
+      const response = await axios.get(`http://127.0.0.1:8000/api/areas/${areaSlug}/`);
+      changeSeq.current = Number(response.headers['x-change-seq']);
+      setArea(response.data); // Set the master data state
+    } catch (err) { setError('Failed to fetch workspace data.'); } 
+    finally { setLoading(false); }
   }, [areaSlug]);
 
+  // Pulls only what changed since the last load or sync, instead of
+  // re-fetching the whole area.
+  const syncChanges = useCallback(async () => {
+    if (changeSeq.current === null || Number.isNaN(changeSeq.current)) return;
+    try {
+      let more = true;
+      while (more) {
+        const response = await axios.get(
+          `http://127.0.0.1:8000/api/areas/${areaSlug}/changes/`, { params: { since: changeSeq.current } }
+        );
+        const body = response.data;
+        changeSeq.current = body.seq;
+        more = body.more;
+        setArea(currentArea => currentArea && applyChanges(currentArea, body));
+      }
+    } catch (err) {
+      // 410: too far behind, the log was compacted. Start over.
+      if (err.response && err.response.status === 410) fetchWorkspaceData();
+      else console.error('Failed to sync workspace changes:', err);
+    }
+  }, [areaSlug, fetchWorkspaceData]);
+
+  useEffect(() => {
+    changeSeq.current = null;
+    fetchWorkspaceData();
+  }, [fetchWorkspaceData]);
+
+  // Catch up on edits made elsewhere whenever the tab comes back into focus.
+  useEffect(() => {
+    window.addEventListener('focus', syncChanges);
+    return () => window.removeEventListener('focus', syncChanges);
+  }, [syncChanges]);
+
+  // Live updates: the server pushes a hint on every committed write to this
+  // area and we pull the changed rows. Bursts (a drag, a bulk import) are
+  // coalesced into one sync.
+  useEffect(() => {
+    const events = new EventSource(`http://127.0.0.1:8000/api/async/areas/${areaSlug}/events/`);
+    let timer = null;
+    const scheduleSync = () => {
+      if (timer === null) timer = setTimeout(() => { timer = null; syncChanges(); }, 200);
+    };
+    events.addEventListener('change', (event) => {
+      const { seq } = JSON.parse(event.data);
+      // Already covered by an earlier sync otherwise.
+      if (seq === null || changeSeq.current === null || seq > changeSeq.current) scheduleSync();
+    });
+    // Sent on every (re)connect and after the server dropped events for us.
+    events.addEventListener('ready', scheduleSync);
+    events.addEventListener('resync', scheduleSync);
+    return () => {
+      clearTimeout(timer);
+      events.close();
+    };
+  }, [areaSlug, syncChanges]);
+
   // --- UPDATE PLANNER NODE WHEN TASKS CHANGE ---
   // NEW: This second useEffect watches for changes in `area.tasks`
   // and updates the planner node's data to ensure it never has stale data.